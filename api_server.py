@@ -0,0 +1,277 @@
+"""API HTTP local das séries por talhão (aiohttp)
+
+Serve séries NDWI/NDVI/ET, relatórios e listas de cenas dos talhões de um
+GeoJSON/CSV para o painel estático e ferramentas internas:
+
+    python api_server.py talhoes.geojson --port 8080
+
+    GET /fields
+    GET /fields/{field_id}/timeseries?start=&end=&cloud_threshold=&format=json|ndjson|arrow
+    GET /fields/{field_id}/report?start=&end=&cloud_threshold=
+    GET /fields/{field_id}/scenes?start=&end=&cloud_threshold=
+
+Requisições iguais em andamento são unidas em uma só extração no GEE e o
+resultado fica em cache por result_ttl segundos (JobManager); as
+respostas levam ETag e um If-None-Match igual recebe 304. Séries grandes
+são enviadas em blocos como NDJSON ou Arrow (IPC stream).
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+from batch_processor import field_area_km2, field_geometry, load_fields
+from cli import REPORT_COLUMNS, initialize_ee
+from jobs import DONE, JobManager, job_key
+from monitoring import scene_index
+from streaming_stats import iter_chunks
+
+# Linhas por bloco nas respostas em streaming
+STREAM_CHUNK_ROWS = 10_000
+
+MEDIA_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def frame_etag(df):
+    """ETag (hash do conteúdo) de um DataFrame"""
+    digest = hashlib.sha256(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:24]
+
+
+def ndjson_chunks(df, chunk_rows=STREAM_CHUNK_ROWS):
+    """Blocos de linhas JSON (uma linha por registro)"""
+    for chunk in iter_chunks(df, chunk_rows):
+        yield chunk.to_json(orient='records', lines=True).rstrip('\n').encode() + b'\n'
+
+
+def arrow_chunks(df, chunk_rows=STREAM_CHUNK_ROWS):
+    """Blocos de um Arrow IPC stream (schema e um record batch por bloco)"""
+    import pyarrow as pa
+
+    def drain(buffer):
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            yield drain(buffer)
+    # Fim do stream (e o schema, se não houver linhas)
+    yield drain(buffer)
+
+
+def response_format(query_format, accept):
+    """Formato da série: parâmetro format ou cabeçalho Accept (JSON por padrão)"""
+    if query_format:
+        if query_format not in MEDIA_TYPES:
+            raise ValueError(f"Formato desconhecido: {query_format}")
+        return query_format
+    for name, media_type in MEDIA_TYPES.items():
+        if media_type in (accept or ''):
+            return name
+    return 'json'
+
+
+class FieldSeriesService:
+    """Séries por talhão servidas a muitos clientes com uma extração por período
+
+    A série de (talhão, período, limite de nuvens) é extraída uma vez em
+    um job do JobManager: requisições simultâneas aguardam o mesmo job e
+    as seguintes reutilizam o resultado até result_ttl. Relatório e lista
+    de cenas são derivados da mesma série, sem outras consultas ao GEE.
+    """
+
+    def __init__(self, fields, system, processor, max_workers=4, result_ttl=3600):
+        self.fields = {field['field_id']: field for field in fields}
+        self.system = system
+        self.processor = processor
+        self.manager = JobManager(max_workers=max_workers, result_ttl=result_ttl)
+
+    def params(self, query):
+        """(start, end, cloud_threshold) normalizados; período padrão de 90 dias"""
+        end = pd.Timestamp(query.get('end') or date.today() + timedelta(days=1))
+        start = pd.Timestamp(query.get('start') or end - timedelta(days=90))
+        if start >= end:
+            raise ValueError("start deve ser anterior a end")
+        cloud_threshold = float(query.get('cloud_threshold', 20))
+        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'), cloud_threshold
+
+    async def series(self, field_id, start_date, end_date, cloud_threshold=20):
+        """(DataFrame, ETag) da série, unindo requisições iguais"""
+        if field_id not in self.fields:
+            raise KeyError(field_id)
+        job_id = self.manager.submit(self._series_job, field_id, start_date, end_date,
+                                     cloud_threshold,
+                                     key=job_key('series', field_id, start_date, end_date,
+                                                 cloud_threshold))
+        job = self.manager.get(job_id)
+        await asyncio.wrap_future(job.future)
+        if job.status != DONE:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def report(self, field_id, df):
+        report = self.processor.generate_report(df.rename(columns=REPORT_COLUMNS),
+                                                field_area_km2(self.fields[field_id]))
+        report['field_id'] = field_id
+        report['reductions'] = df.attrs.get('reductions', [])
+        return report
+
+    @staticmethod
+    def scenes(df):
+        if df.empty:
+            return []
+        return json.loads(scene_index(df).to_json(orient='records', date_format='iso'))
+
+    def _series_job(self, job, field_id, start_date, end_date, cloud_threshold):
+        roi = field_geometry(self.fields[field_id])
+        collection = self.system.get_satellite_data(roi, start_date, end_date, cloud_threshold)
+        df = self.system.extract_time_series(collection, roi, start_date, end_date,
+                                             cloud_threshold=cloud_threshold)
+        return df, frame_etag(df)
+
+
+def create_app(service):
+    """Aplicação aiohttp com as rotas da API"""
+    from aiohttp import web
+
+    def json_response(data, etag=None, weak=False):
+        headers = None
+        if etag:
+            headers = {'ETag': f'W/"{etag}"' if weak else f'"{etag}"', 'Cache-Control': 'no-cache'}
+        return web.Response(text=json.dumps(data, ensure_ascii=False, default=str),
+                            content_type='application/json', headers=headers)
+
+    def not_modified(request, etag):
+        return request.headers.get('If-None-Match', '').strip() in (f'"{etag}"', f'W/"{etag}"')
+
+    async def load_series(request):
+        """Série do talhão da rota; erros viram respostas HTTP"""
+        field_id = request.match_info['field_id']
+        try:
+            params = service.params(request.query)
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        try:
+            return field_id, await service.series(field_id, *params)
+        except KeyError:
+            raise web.HTTPNotFound(text=f"Talhão desconhecido: {field_id}")
+        except RuntimeError as e:
+            raise web.HTTPBadGateway(text=f"Erro no Earth Engine: {e}")
+
+    async def health(request):
+        return json_response({'status': 'ok', 'active_jobs': len(service.manager.active_jobs())})
+
+    async def list_fields(request):
+        return json_response([{'field_id': field_id, 'area_km2': field_area_km2(field)}
+                              for field_id, field in service.fields.items()])
+
+    async def timeseries(request):
+        try:
+            fmt = response_format(request.query.get('format'), request.headers.get('Accept'))
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        _, (df, etag) = await load_series(request)
+        etag = f'{etag}-{fmt}'
+        if not_modified(request, etag):
+            return web.Response(status=304, headers={'ETag': f'"{etag}"'})
+        if fmt == 'json':
+            return web.Response(body=df.to_json(orient='records').encode(),
+                                content_type=MEDIA_TYPES['json'],
+                                headers={'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+
+        if fmt == 'arrow':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise web.HTTPNotAcceptable(text="O formato arrow requer pyarrow no servidor")
+            chunks = arrow_chunks(df)
+        else:
+            chunks = ndjson_chunks(df)
+        response = web.StreamResponse(headers={'Content-Type': MEDIA_TYPES[fmt],
+                                               'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        for chunk in chunks:
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def report(request):
+        field_id, (df, etag) = await load_series(request)
+        # Fraca: o relatório traz a data da análise, o restante segue a série
+        etag = f'{etag}-report'
+        if not_modified(request, etag):
+            return web.Response(status=304, headers={'ETag': f'W/"{etag}"'})
+        return json_response(service.report(field_id, df), etag, weak=True)
+
+    async def scenes(request):
+        _, (df, etag) = await load_series(request)
+        etag = f'{etag}-scenes'
+        if not_modified(request, etag):
+            return web.Response(status=304, headers={'ETag': f'"{etag}"'})
+        return json_response(service.scenes(df), etag)
+
+    async def allow_cors(request, response):
+        # O painel estático (index.html) pode estar em outra origem
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Expose-Headers'] = 'ETag'
+
+    app = web.Application()
+    app.on_response_prepare.append(allow_cors)
+    app.add_routes([
+        web.get('/health', health),
+        web.get('/fields', list_fields),
+        web.get('/fields/{field_id}/timeseries', timeseries),
+        web.get('/fields/{field_id}/report', report),
+        web.get('/fields/{field_id}/scenes', scenes),
+    ])
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('fields',
+                        help='talhões em GeoJSON (FeatureCollection) ou CSV (field_id, lat, lon)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=4, help='extrações simultâneas no GEE')
+    parser.add_argument('--result-ttl', type=float, default=3600,
+                        help='segundos que uma série extraída é reaproveitada')
+    parser.add_argument('--cache', action='store_true', help='usar o cache em disco das séries')
+    parser.add_argument('--catalog', action='store_true',
+                        help='selecionar cenas pelo catálogo (nuvem sobre a ROI)')
+    parser.add_argument('--service-account', help='JSON da service account do GEE')
+    args = parser.parse_args(argv)
+
+    from aiohttp import web
+    from data_processor import SatelliteDataProcessor
+    from monitoring import EVETMonitoringSystem, open_cache
+    from scene_catalog import SceneCatalog
+
+    initialize_ee(args.service_account)
+    system = EVETMonitoringSystem(cache=open_cache() if args.cache else None,
+                                  catalog=SceneCatalog() if args.catalog else None)
+    service = FieldSeriesService(load_fields(args.fields), system,
+                                 SatelliteDataProcessor(initialize=False),
+                                 max_workers=args.workers, result_ttl=args.result_ttl)
+    web.run_app(create_app(service), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
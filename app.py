@@ -2,6 +2,7 @@
 import streamlit as st
 import ee
 import geemap.foliumap as geemap
+import folium
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -12,6 +13,35 @@ import requests
 import json
 from io import BytesIO
 import base64
+import time
+import os
+
+from monitoring import EVETMonitoringSystem, open_cache, scene_index, TIME_SERIES_COLUMNS
+from ts_store import TimeSeriesStore
+from scene_catalog import SceneCatalog
+from streaming_stats import StreamingStats
+from charts import (POINT_BUDGET, WEBGL_THRESHOLD, downsample_indices, ols_fit,
+                    sample_indices)
+from instrumentation import Tracer
+from jobs import JobManager, job_key, DONE, ERROR
+from map_layers import MAP_ID_TTL, MapLayerCache, TileProxy, TileStore, tile_url_format
+
+# Intervalo (s) entre reexecuções da página enquanto há job em andamento
+JOB_POLL_INTERVAL = 1.0
+
+# Séries do gráfico temporal: (coluna, nome, cor, divisor de escala)
+TIME_SERIES_TRACES = [
+    ('NDWI', 'NDWI', 'blue', 1),
+    ('NDVI', 'NDVI', 'green', 1),
+    ('ET_diaria', 'ET (mm/dia ÷ 10)', 'red', 10),
+]
+
+# Camadas da aba de mapas: (banda, nome, parâmetros de visualização)
+INDEX_LAYERS = [
+    ('NDWI', 'NDWI', {'min': -0.5, 'max': 0.5, 'palette': ['red', 'yellow', 'green', 'blue']}),
+    ('NDVI', 'NDVI', {'min': -0.2, 'max': 0.8, 'palette': ['brown', 'yellow', 'green', 'darkgreen']}),
+    ('ET_daily', 'ET Diária (mm)', {'min': 0, 'max': 8, 'palette': ['white', 'lightblue', 'blue', 'darkblue']}),
+]
 
 # Configuração da página Streamlit
 st.set_page_config(
@@ -53,115 +83,122 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class EVETMonitoringSystem:
-  def initialize_ee(self):
-    """Inicializa o Google Earth Engine"""
+# Recursos e dados cacheados: o Streamlit reexecuta o script a cada interação,
+# então inicialização do GEE, ROI, mapas e séries são reaproveitados entre reruns
+
+@st.cache_resource(show_spinner=False)
+def initialize_ee():
+    """Inicializa o Google Earth Engine uma vez por processo (Secrets do Streamlit)"""
     try:
-        # NOVO CÓDIGO - Usando Streamlit Secrets
-        import json
-        sa_info = json.loads(st.secrets["GCP_SERVICE_ACCOUNT_JSON"])
-        credentials = ee.ServiceAccountCredentials(sa_info["client_email"], json.dumps(sa_info))
-        ee.Initialize(credentials)
+        EVETMonitoringSystem().initialize_ee(st.secrets["GCP_SERVICE_ACCOUNT_JSON"])
     except KeyError:
         st.error("❌ Credenciais GEE não encontradas. Configure os Secrets do Streamlit.")
         st.stop()
     except Exception as e:
-    st.error(f"Erro GEE completo: {e}")
-    st.stop()
-
-    def calculate_ndwi(self, image):
-        """Calcula o NDWI (Normalized Difference Water Index)"""
-        # NDWI = (GREEN - NIR) / (GREEN + NIR)
-        green = image.select('B3')  # Banda verde Sentinel-2
-        nir = image.select('B8')    # Banda NIR Sentinel-2
-        ndwi = green.subtract(nir).divide(green.add(nir)).rename('NDWI')
-        return image.addBands(ndwi)
-
-    def calculate_ndvi(self, image):
-        """Calcula o NDVI (Normalized Difference Vegetation Index)"""
-        # NDVI = (NIR - RED) / (NIR + RED)
-        nir = image.select('B8')    # Banda NIR
-        red = image.select('B4')    # Banda vermelha
-        ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
-        return image.addBands(ndvi)
-
-    def estimate_evapotranspiration(self, image, ndwi, ndvi, temp=None):
-        """Estima evapotranspiração baseada em NDWI, NDVI e outros parâmetros"""
-        # Modelo simplificado de ET baseado em índices espectrais
-        # ET = f(NDVI, NDWI, temperatura, radiação)
-
-        # Fator de vegetação baseado em NDVI
-        vegetation_factor = ndvi.multiply(1.2).add(0.1)
-
-        # Fator de água baseado em NDWI
-        water_factor = ndwi.multiply(0.8).add(1.0)
-
-        # ET simplificada (mm/dia)
-        et_simple = vegetation_factor.multiply(water_factor).multiply(3.5).rename('ET_daily')
-
-        return image.addBands([et_simple, vegetation_factor.rename('VEG_FACTOR'), 
-                              water_factor.rename('WATER_FACTOR')])
-
-    def get_satellite_data(self, roi, start_date, end_date):
-        """Obtém dados de satélite Sentinel-2"""
-        collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                     .filterBounds(roi)
-                     .filterDate(start_date, end_date)
-                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                     .sort('system:time_start'))
-
-        def process_image(image):
-            # Máscara de nuvens
-            cloud_mask = image.select('QA60').bitwiseAnd(1024).eq(0).And(
-                        image.select('QA60').bitwiseAnd(2048).eq(0))
-
-            # Aplicar máscara e calcular índices
-            masked = image.updateMask(cloud_mask)
-            with_ndwi = self.calculate_ndwi(masked)
-            with_ndvi = self.calculate_ndvi(with_ndwi)
-            with_et = self.estimate_evapotranspiration(with_ndvi, 
-                                                     with_ndvi.select('NDWI'), 
-                                                     with_ndvi.select('NDVI'))
-
-            return with_et
-
-        processed_collection = collection.map(process_image)
-        return processed_collection
-
-    def create_time_series(self, collection, roi):
-        """Cria série temporal dos índices"""
-        def extract_values(image):
-            stats = image.select(['NDWI', 'NDVI', 'ET_daily']).reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=roi,
-                scale=30,
-                maxPixels=1e9
-            )
-            return ee.Feature(None, stats.set('date', image.date().format('YYYY-MM-dd')))
-
-        time_series = collection.map(extract_values)
-        return time_series
-
-    def download_time_series_data(self, time_series):
-        """Baixa dados da série temporal"""
-        try:
-            data = time_series.getInfo()
-            records = []
-
-            for feature in data['features']:
-                props = feature['properties']
-                if all(k in props for k in ['date', 'NDWI', 'NDVI', 'ET_daily']):
-                    records.append({
-                        'Data': props['date'],
-                        'NDWI': props['NDWI'],
-                        'NDVI': props['NDVI'],
-                        'ET_diaria': props['ET_daily']
-                    })
-
-            return pd.DataFrame(records)
-        except Exception as e:
-            st.error(f"Erro ao baixar dados: {e}")
-            return pd.DataFrame()
+        st.error(f"Erro GEE completo: {e}")
+        st.stop()
+    return True
+
+@st.cache_resource(show_spinner=False)
+def get_time_series_cache():
+    """Cache em disco das séries, compartilhado por todas as sessões"""
+    return open_cache()
+
+@st.cache_resource(show_spinner=False)
+def get_time_series_store():
+    """Armazenamento colunar das séries processadas (histórico por talhão)"""
+    return TimeSeriesStore()
+
+@st.cache_resource(show_spinner=False)
+def get_scene_catalog():
+    """Catálogo SQLite das cenas por região (nuvem sobre a ROI)"""
+    return SceneCatalog()
+
+def field_key(lat, lon, buffer_km):
+    """Id do talhão no armazenamento: ponto central e raio"""
+    return f"{lat:.5f}_{lon:.5f}_{buffer_km}km"
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_roi(lat, lon, buffer_km):
+    """ROI circular em torno do ponto"""
+    return ee.Geometry.Point([lon, lat]).buffer(buffer_km * 1000)
+
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    """Pool de jobs compartilhado por todas as sessões (deduplica requisições iguais)"""
+    return JobManager(max_workers=4)
+
+def time_series_job(job, cache, store, catalog, lat, lon, buffer_km, start_date, end_date,
+                    trace=False):
+    """Job em segundo plano: série temporal por janelas, com resultados parciais
+
+    A série final é acrescentada ao armazenamento colunar do talhão. Com
+    catálogo, só as cenas limpas sobre a ROI são reduzidas.
+    """
+    job.tracer = Tracer(enabled=trace)
+    system = EVETMonitoringSystem(cache=cache, tracer=job.tracer, catalog=catalog)
+    roi = ee.Geometry.Point([lon, lat]).buffer(buffer_km * 1000)
+    df = system.extract_time_series_progressive(roi, start_date, end_date, progress=job.report)
+    if store is not None and not df.empty:
+        store.append(field_key(lat, lon, buffer_km),
+                     df.rename(columns={v: k for k, v in TIME_SERIES_COLUMNS.items()}))
+    return df
+
+@st.cache_data(max_entries=16, ttl=MAP_ID_TTL, show_spinner=False)
+def roi_tile_url(lat, lon, buffer_km):
+    """URL de tiles do contorno da ROI (o getMapId é a parte cara do mapa da área)"""
+    outline = ee.Image().paint(ee.FeatureCollection([ee.Feature(get_roi(lat, lon, buffer_km))]), 0, 2)
+    return tile_url_format(outline.getMapId({'palette': ['red']}))
+
+def build_area_map(lat, lon, buffer_km):
+    """Mapa da área de estudo, criado a cada execução (o objeto Map é mutável)"""
+    m = geemap.Map(center=[lat, lon], zoom=12)
+    m.add_tile_layer(roi_tile_url(lat, lon, buffer_km), name='Área de Estudo',
+                     attribution='Google Earth Engine')
+    m.add_basemap('SATELLITE')
+    return m
+
+@st.cache_resource(show_spinner=False)
+def get_map_layer_cache():
+    """Cache de map IDs das camadas (tiles em disco com EVET_TILE_PROXY=1)"""
+    proxy = TileProxy(TileStore()) if os.environ.get('EVET_TILE_PROXY') else None
+    return MapLayerCache(tile_proxy=proxy)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def trendline(x, y):
+    """Reta OLS calculada uma vez por conjunto de pontos (NumPy)"""
+    return ols_fit(x, y)
+
+def scatter_with_trendline(df, x, y, title):
+    """Dispersão amostrada (WebGL acima do limiar) com a reta OLS de todos os pontos"""
+    idx = sample_indices(len(df), POINT_BUDGET)
+    trace = go.Scattergl if len(idx) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure(trace(x=df[x].to_numpy()[idx], y=df[y].to_numpy()[idx],
+                          mode='markers', name='Observações'))
+
+    fit = trendline(df[x].to_numpy(dtype='float64'), df[y].to_numpy(dtype='float64'))
+    if fit is not None:
+        ends = np.array([fit['x_min'], fit['x_max']])
+        fig.add_trace(go.Scatter(x=ends, y=fit['slope'] * ends + fit['intercept'], mode='lines',
+                                 name=f"OLS (R² = {fit['r2']:.3f})"))
+    fig.update_layout(title=title, xaxis_title=x, yaxis_title=y)
+    return fig
+
+def render_diagnostics(tracer, label="🔍 Diagnóstico de desempenho"):
+    """Painel de diagnóstico com o trace informado"""
+    with st.expander(label, expanded=True):
+        col1, col2 = st.columns(2)
+        col1.metric("Requisições ao GEE", tracer.round_trips)
+        col2.metric("Payload recebido", f"{tracer.payload_bytes / 1024:.1f} KB")
+
+        summary = pd.DataFrame(tracer.summary())
+        if not summary.empty:
+            st.dataframe(summary, use_container_width=True)
+
+        st.download_button("📥 Trace (JSON)", json.dumps(tracer.to_dict(), default=str),
+                           file_name="trace.json", mime="application/json", key=f"{label}_json")
+        st.download_button("📥 Trace (Chrome/Perfetto)", json.dumps(tracer.to_chrome_trace(), default=str),
+                           file_name="trace_chrome.json", mime="application/json", key=f"{label}_chrome")
 
 def main():
     # Título principal
@@ -187,9 +224,41 @@ def main():
 
         # Botão para processar
         process_button = st.button("🚀 Processar Dados", type="primary")
-
-    # Inicializar sistema
-    system = EVETMonitoringSystem()
+        clear_cache_button = st.button("🗑️ Limpar cache")
+        use_catalog = st.checkbox("☁️ Selecionar cenas pela nuvem sobre a área", value=True)
+        show_diagnostics = st.checkbox("🔍 Diagnóstico de desempenho", value=False)
+
+    # Inicializar sistema (instrumentação no-op se o diagnóstico estiver desligado)
+    initialize_ee()
+    tracer = Tracer(enabled=show_diagnostics)
+    system = EVETMonitoringSystem(cache=get_time_series_cache(), tracer=tracer)
+    manager = get_job_manager()
+    if clear_cache_button:
+        system.cache.invalidate()
+        # Só os jobs desta sessão; outras sessões podem estar acompanhando os seus
+        manager.clear(st.session_state.pop('job_ids', []))
+        st.session_state.pop('job_id', None)
+        st.session_state.pop('df', None)
+
+    # Processamento em segundo plano: requisições iguais reutilizam o mesmo job
+    if process_button:
+        params = (lat, lon, buffer_size, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        catalog = get_scene_catalog() if use_catalog else None
+        st.session_state['job_id'] = manager.submit(time_series_job, system.cache,
+                                                    get_time_series_store(), catalog, *params,
+                                                    trace=show_diagnostics,
+                                                    key=job_key('time_series', *params, use_catalog))
+        st.session_state.setdefault('job_ids', []).append(st.session_state['job_id'])
+        st.session_state.pop('df', None)
+
+    job = manager.get(st.session_state.get('job_id'))
+    if job is not None:
+        # Resultado final ou parcial (o DataFrame do job é compartilhado entre sessões)
+        df = job.result if job.status == DONE else job.partial_result()
+        if df is not None and not df.empty:
+            df = df.copy()
+            df['Data'] = pd.to_datetime(df['Data'])
+            st.session_state['df'] = df.sort_values('Data')
 
     # Tabs principais
     tab1, tab2, tab3, tab4 = st.tabs(["📍 Área de Estudo", "📈 Análise Temporal", 
@@ -199,17 +268,14 @@ def main():
         st.markdown('<h2 class="sub-header">Definição da Área de Estudo</h2>', 
                    unsafe_allow_html=True)
 
-        # Criar ROI
-        roi = ee.Geometry.Point([lon, lat]).buffer(buffer_size * 1000)
-
         # Mapa interativo
-        m = geemap.Map(center=[lat, lon], zoom=12)
-        m.addLayer(roi, {'color': 'red'}, 'Área de Estudo')
-        m.add_basemap('SATELLITE')
+        with tracer.span('geemap_setup', tab='area'):
+            m = build_area_map(lat, lon, buffer_size)
 
         col1, col2 = st.columns([3, 1])
         with col1:
-            m.to_streamlit(height=500)
+            with tracer.span('map_render', tab='area'):
+                m.to_streamlit(height=500)
 
         with col2:
             st.markdown("### 📍 Informações da Área")
@@ -222,34 +288,15 @@ def main():
         st.markdown('<h2 class="sub-header">Análise da Série Temporal</h2>', 
                    unsafe_allow_html=True)
 
-        if process_button:
-            with st.spinner("Processando dados de satélite..."):
-                try:
-                    # Obter dados
-                    collection = system.get_satellite_data(roi, 
-                                                         start_date.strftime('%Y-%m-%d'),
-                                                         end_date.strftime('%Y-%m-%d'))
-
-                    # Criar série temporal
-                    time_series = system.create_time_series(collection, roi)
-
-                    # Baixar dados
-                    df = system.download_time_series_data(time_series)
-
-                    if not df.empty:
-                        # Converter data
-                        df['Data'] = pd.to_datetime(df['Data'])
-                        df = df.sort_values('Data')
-
-                        # Armazenar no session state
-                        st.session_state['df'] = df
-
-                        st.success(f"✅ Processados {len(df)} pontos de dados!")
-                    else:
-                        st.warning("Nenhum dado encontrado para o período selecionado.")
-
-                except Exception as e:
-                    st.error(f"Erro no processamento: {e}")
+        if job is not None:
+            if not job.finished:
+                st.progress(job.progress, text=f"Processando dados de satélite... {job.message}")
+            elif job.status == ERROR:
+                st.error(f"Erro no processamento: {job.error}")
+            elif 'df' in st.session_state:
+                st.success(f"✅ Processados {len(st.session_state['df'])} pontos de dados!")
+            else:
+                st.warning("Nenhum dado encontrado para o período selecionado.")
 
         # Mostrar gráficos se dados disponíveis
         if 'df' in st.session_state:
@@ -277,72 +324,79 @@ def main():
                 st.metric("Pontos de Dados", len(df))
                 st.markdown('</div>', unsafe_allow_html=True)
 
-            # Gráfico de série temporal
-            fig = go.Figure()
+            with tracer.span('plotly_render', points=len(df)):
+                # Gráfico de série temporal (cada série reduzida ao orçamento de pontos)
+                fig = go.Figure()
 
-            fig.add_trace(go.Scatter(x=df['Data'], y=df['NDWI'], 
-                                   name='NDWI', line=dict(color='blue')))
-            fig.add_trace(go.Scatter(x=df['Data'], y=df['NDVI'], 
-                                   name='NDVI', line=dict(color='green')))
-            fig.add_trace(go.Scatter(x=df['Data'], y=df['ET_diaria']/10, 
-                                   name='ET (mm/dia ÷ 10)', line=dict(color='red')))
+                dates = df['Data'].to_numpy()
+                for column, name, color, scale in TIME_SERIES_TRACES:
+                    values = df[column].to_numpy(dtype='float64') / scale
+                    idx = downsample_indices(dates, values)
+                    trace = go.Scattergl if len(idx) > WEBGL_THRESHOLD else go.Scatter
+                    fig.add_trace(trace(x=dates[idx], y=values[idx],
+                                        name=name, line=dict(color=color)))
 
-            fig.update_layout(title="Série Temporal - NDWI, NDVI e Evapotranspiração",
-                            xaxis_title="Data",
-                            yaxis_title="Valor do Índice",
-                            height=500)
+                fig.update_layout(title="Série Temporal - NDWI, NDVI e Evapotranspiração",
+                                xaxis_title="Data",
+                                yaxis_title="Valor do Índice",
+                                height=500)
 
-            st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(fig, use_container_width=True)
 
-            # Correlação entre índices
-            col1, col2 = st.columns(2)
+                # Correlação entre índices
+                col1, col2 = st.columns(2)
 
-            with col1:
-                fig_corr = px.scatter(df, x='NDWI', y='ET_diaria', 
-                                    title="Correlação NDWI vs ET",
-                                    trendline="ols")
-                st.plotly_chart(fig_corr, use_container_width=True)
+                with col1:
+                    fig_corr = scatter_with_trendline(df, 'NDWI', 'ET_diaria',
+                                                      "Correlação NDWI vs ET")
+                    st.plotly_chart(fig_corr, use_container_width=True)
 
-            with col2:
-                fig_corr2 = px.scatter(df, x='NDVI', y='ET_diaria', 
-                                     title="Correlação NDVI vs ET",
-                                     trendline="ols")
-                st.plotly_chart(fig_corr2, use_container_width=True)
+                with col2:
+                    fig_corr2 = scatter_with_trendline(df, 'NDVI', 'ET_diaria',
+                                                       "Correlação NDVI vs ET")
+                    st.plotly_chart(fig_corr2, use_container_width=True)
 
     with tab3:
         st.markdown('<h2 class="sub-header">Mapas de Índices Espectrais</h2>', 
                    unsafe_allow_html=True)
 
         if 'df' in st.session_state and not st.session_state['df'].empty:
-            # Seletor de data para visualização
-            dates_available = pd.to_datetime(st.session_state['df']['Data']).dt.date.unique()
-            selected_date = st.selectbox("Selecione uma data para visualização:", 
-                                       dates_available)
+            # Seletor de cena (índice da série: a mesma imagem usada no gráfico)
+            scenes = scene_index(st.session_state['df']).set_index('scene_id')
 
-            if selected_date:
-                # Criar mapa com índices
-                map_viz = geemap.Map(center=[lat, lon], zoom=11)
+            def scene_label(scene_id):
+                scene = scenes.loc[scene_id]
+                cloud = f" — {scene['cloud_pct']:.1f}% nuvens" if 'cloud_pct' in scenes.columns else ''
+                return f"{scene['Data']} ({scene_id}){cloud}"
 
-                # Obter imagem da data selecionada
-                target_date = selected_date.strftime('%Y-%m-%d')
-                next_date = (selected_date + timedelta(days=1)).strftime('%Y-%m-%d')
+            selected_scene = st.selectbox("Selecione uma cena para visualização:",
+                                          scenes.index, format_func=scene_label)
 
+            if selected_scene:
                 try:
-                    collection = system.get_satellite_data(roi, target_date, next_date)
-                    image = collection.first()
-
-                    # Parâmetros de visualização
-                    ndwi_params = {'min': -0.5, 'max': 0.5, 'palette': ['red', 'yellow', 'green', 'blue']}
-                    ndvi_params = {'min': -0.2, 'max': 0.8, 'palette': ['brown', 'yellow', 'green', 'darkgreen']}
-                    et_params = {'min': 0, 'max': 8, 'palette': ['white', 'lightblue', 'blue', 'darkblue']}
-
-                    # Adicionar camadas
-                    map_viz.addLayer(image.select('NDWI'), ndwi_params, 'NDWI')
-                    map_viz.addLayer(image.select('NDVI'), ndvi_params, 'NDVI')
-                    map_viz.addLayer(image.select('ET_daily'), et_params, 'ET Diária (mm)')
-                    map_viz.addLayer(roi, {'color': 'red'}, 'ROI')
-
-                    map_viz.to_streamlit(height=600)
+                    # Criar mapa com índices (map IDs reaproveitados por cena/banda/visualização)
+                    map_viz = geemap.Map(center=[lat, lon], zoom=11)
+                    layer_cache = get_map_layer_cache()
+                    with tracer.span('map_layers', category='ee', layers=len(INDEX_LAYERS)):
+                        for band, name, vis_params in INDEX_LAYERS:
+                            url = layer_cache.get(selected_scene, band, vis_params,
+                                                  lambda: system.load_scene(selected_scene))
+                            map_viz.add_tile_layer(url, name=name, attribution='Google Earth Engine')
+
+                    # ROI e footprint da cena desenhados no cliente, sem getMapId
+                    folium.Circle([lat, lon], radius=buffer_size * 1000, color='red',
+                                  fill=False, tooltip='ROI').add_to(map_viz)
+                    footprint = scenes['footprint'].get(selected_scene) if 'footprint' in scenes.columns else None
+                    if isinstance(footprint, str):
+                        footprint = json.loads(footprint)
+                        if footprint['type'] == 'LinearRing':
+                            footprint = {'type': 'Polygon', 'coordinates': [footprint['coordinates']]}
+                        folium.GeoJson(footprint, name='Footprint da cena',
+                                       style_function=lambda _: {'color': 'orange', 'fill': False}
+                                       ).add_to(map_viz)
+
+                    with tracer.span('map_render', tab='maps'):
+                        map_viz.to_streamlit(height=600)
 
                 except Exception as e:
                     st.error(f"Erro ao criar mapa: {e}")
@@ -356,16 +410,20 @@ def main():
         if 'df' in st.session_state and not st.session_state['df'].empty:
             df = st.session_state['df']
 
-            # Estatísticas descritivas
+            # Estatísticas e correlações em uma única passada pelos dados
+            stats = StreamingStats.from_chunks(df, ['NDWI', 'NDVI', 'ET_diaria'])
+            means = stats.mean()
+
             st.subheader("📊 Estatísticas Descritivas")
-            stats = df[['NDWI', 'NDVI', 'ET_diaria']].describe()
-            st.dataframe(stats)
+            # Quartis exatos sobre as colunas exibidas (não saem da passada única)
+            quartiles = df[stats.columns].quantile([0.25, 0.5, 0.75])
+            st.dataframe(stats.describe(quartiles))
 
             # Análise de tendências
             st.subheader("📈 Análise de Tendências")
 
             # Calcular correlações
-            corr_matrix = df[['NDWI', 'NDVI', 'ET_diaria']].corr()
+            corr_matrix = stats.corr()
             fig_heatmap = px.imshow(corr_matrix, 
                                   title="Matriz de Correlação",
                                   aspect="auto",
@@ -386,9 +444,9 @@ def main():
             # Resumo executivo
             st.subheader("📋 Resumo Executivo")
 
-            avg_et = df['ET_diaria'].mean()
-            avg_ndwi = df['NDWI'].mean()
-            avg_ndvi = df['NDVI'].mean()
+            avg_et = means['ET_diaria']
+            avg_ndwi = means['NDWI']
+            avg_ndvi = means['NDVI']
 
             st.markdown(f"""
             **Período de Análise:** {start_date} a {end_date}
@@ -406,5 +464,31 @@ def main():
         else:
             st.info("Execute o processamento de dados primeiro para gerar relatórios.")
 
+        # Histórico armazenado: consulta sem reprocessar no GEE
+        store = get_time_series_store()
+        stored_fields = store.fields()
+        if stored_fields:
+            current_field = field_key(lat, lon, buffer_size)
+            with st.expander("🗄️ Histórico armazenado"):
+                selected_fields = st.multiselect("Talhões", stored_fields,
+                                                 default=[current_field] if current_field in stored_fields else None)
+                if selected_fields:
+                    history = store.query(selected_fields, start_date, end_date)
+                    st.dataframe(history, use_container_width=True)
+                    st.download_button("📥 Baixar histórico como CSV", history.to_csv(index=False),
+                                       file_name="historico_talhoes.csv", mime="text/csv")
+                if st.button("🧹 Compactar armazenamento"):
+                    st.success(f"{store.compact()} partições compactadas")
+
+    if show_diagnostics:
+        render_diagnostics(tracer)
+        if job is not None and job.tracer is not None:
+            render_diagnostics(job.tracer, "🔍 Diagnóstico do processamento")
+
+    # Enquanto o job roda, a página é reexecutada para exibir o progresso
+    if job is not None and not job.finished:
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
 if __name__ == "__main__":
     main()
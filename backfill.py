@@ -0,0 +1,261 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import ee
+import pandas as pd
+
+from batch_processor import is_rate_limit_error
+from data_processor import is_limit_error
+from ts_cache import missing_intervals
+
+DEFAULT_BACKFILL_DIR = 'data/backfill'
+
+# Janelas que terminam nos últimos SETTLE_DAYS dias ainda podem ganhar ou
+# perder cenas: são consultadas a cada execução e não viram checkpoint
+SETTLE_DAYS = 5
+
+
+class AdaptiveChunker:
+    """Tamanho das janelas (dias) ajustado pelo tempo de resposta do GEE
+
+    Respostas bem abaixo de target_seconds dobram a janela; respostas
+    lentas a reduzem proporcionalmente e erros de limite a cortam pela
+    metade, sempre entre min_days e max_days.
+    """
+
+    def __init__(self, initial_days=90, min_days=7, max_days=730, target_seconds=30.0):
+        self.min_days = min_days
+        self.max_days = max_days
+        self.target_seconds = target_seconds
+        self.days = min(max(initial_days, min_days), max_days)
+        self._lock = threading.Lock()
+
+    def record(self, days, seconds):
+        """Registra uma janela concluída (dias consultados e duração)"""
+        with self._lock:
+            if seconds < self.target_seconds / 2:
+                proposed = days * 2
+            elif seconds > self.target_seconds:
+                proposed = int(days * self.target_seconds / seconds)
+            else:
+                proposed = days
+            self.days = min(max(proposed, self.min_days), self.max_days)
+
+    def failed(self, days):
+        """Registra uma janela recusada por limite de payload/tempo"""
+        with self._lock:
+            self.days = min(max(days // 2, self.min_days), self.days)
+
+
+def chunk_path(checkpoint_dir, start_date, end_date):
+    return os.path.join(checkpoint_dir, f'chunk_{start_date}_{end_date}.csv')
+
+
+def completed_chunks(checkpoint_dir):
+    """Intervalos [início, fim) já gravados como checkpoint"""
+    intervals = []
+    if os.path.isdir(checkpoint_dir):
+        for name in os.listdir(checkpoint_dir):
+            if name.startswith('chunk_') and name.endswith('.csv'):
+                start_date, end_date = name[len('chunk_'):-len('.csv')].split('_')
+                intervals.append((start_date, end_date))
+    return sorted(intervals)
+
+
+def write_partitioned(df, dataset_dir, date_column='date'):
+    """Grava o DataFrame como dataset Parquet particionado por ano
+
+    O dataset é escrito em um diretório temporário e trocado ao final,
+    para que leitores nunca vejam uma versão incompleta.
+    """
+    df = df.copy()
+    df['year'] = pd.to_datetime(df[date_column]).dt.year
+    parent = os.path.dirname(os.path.abspath(dataset_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+    try:
+        df.to_parquet(tmp_dir, partition_cols=['year'], index=False)
+        if os.path.exists(dataset_dir):
+            shutil.rmtree(dataset_dir)
+        os.replace(tmp_dir, dataset_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+class Backfill:
+    """Extração histórica longa em janelas adaptativas, com retomada
+
+    fetch(início, fim) retorna o DataFrame de uma janela. Cada janela
+    concluída é gravada em checkpoint_dir (CSV atômico); uma execução
+    interrompida consulta apenas os trechos ainda sem checkpoint. Janelas
+    recusadas por limite do GEE são divididas ao meio e reagendadas.
+    O trecho dos últimos settle_days dias fica só em memória (recent) e
+    é consultado de novo a cada execução.
+    """
+
+    def __init__(self, fetch, output_dir, chunker=None, max_workers=2, max_retries=3,
+                 base_delay=2.0, progress=None, settle_days=SETTLE_DAYS):
+        self.fetch = fetch
+        self.output_dir = output_dir
+        self.checkpoint_dir = os.path.join(output_dir, 'checkpoints')
+        self.chunker = chunker or AdaptiveChunker()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.progress = progress or self._print_progress
+        self.settle_days = settle_days
+        # Janelas recentes da última execução: (início, fim) -> DataFrame
+        self.recent = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def run(self, start_date, end_date):
+        """Consulta os trechos sem checkpoint; retorna a lista de janelas com erro"""
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        settled = self.settled_date()
+        self.recent = {}
+        # Checkpoints de janelas não assentadas (versões anteriores) seriam
+        # dados como definitivos depois de settle_days: são descartados
+        for chunk_start, chunk_end in completed_chunks(self.checkpoint_dir):
+            if chunk_end > settled:
+                os.remove(chunk_path(self.checkpoint_dir, chunk_start, chunk_end))
+        # Trechos pendentes, divididos em janelas conforme o tamanho atual;
+        # nenhuma janela atravessa a data de assentamento
+        pending = []
+        for interval_start, interval_end in missing_intervals(self._settled_chunks(settled),
+                                                              start_date, end_date):
+            if interval_start < settled < interval_end:
+                pending += [(interval_start, settled), (settled, interval_end)]
+            else:
+                pending.append((interval_start, interval_end))
+        total_days = max((pd.Timestamp(end_date) - pd.Timestamp(start_date)).days, 1)
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                while pending and len(running) < self.max_workers:
+                    window = self._next_window(pending)
+                    running[executor.submit(self._run_window, *window)] = window
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    window_start, window_end = running.pop(future)
+                    try:
+                        future.result()
+                    except ee.EEException as e:
+                        days = (pd.Timestamp(window_end) - pd.Timestamp(window_start)).days
+                        if is_limit_error(e) and days > self.chunker.min_days:
+                            self.chunker.failed(days)
+                            pending.insert(0, (window_start, window_end))
+                            continue
+                        failures.append((window_start, window_end))
+                        self._log_error(window_start, window_end, e)
+                    except Exception as e:
+                        failures.append((window_start, window_end))
+                        self._log_error(window_start, window_end, e)
+
+                    covered = sum((pd.Timestamp(end) - pd.Timestamp(start)).days
+                                  for start, end in missing_intervals(pending + list(running.values()),
+                                                                      start_date, end_date))
+                    self.progress(covered / total_days, window_start, window_end,
+                                  self.chunker.days)
+
+        return failures
+
+    def load(self, start_date=None, end_date=None):
+        """Concatena os checkpoints e as janelas recentes (opcionalmente restritos ao período)"""
+        def in_period(chunk_start, chunk_end):
+            return not ((start_date and chunk_end <= start_date)
+                        or (end_date and chunk_start >= end_date))
+
+        frames = []
+        for chunk_start, chunk_end in self._settled_chunks(self.settled_date()):
+            if not in_period(chunk_start, chunk_end):
+                continue
+            try:
+                frames.append(pd.read_csv(chunk_path(self.checkpoint_dir, chunk_start, chunk_end),
+                                          dtype={'scene_id': str}))
+            except pd.errors.EmptyDataError:
+                continue
+        with self._lock:
+            frames += [df for (chunk_start, chunk_end), df in sorted(self.recent.items())
+                       if in_period(chunk_start, chunk_end)]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        if 'scene_id' in df.columns:
+            df = df.drop_duplicates('scene_id', keep='last')
+        return df.sort_values('date', kind='stable').reset_index(drop=True)
+
+    def write_dataset(self, df=None, dataset_dir=None):
+        """Grava o resultado montado como Parquet particionado por ano"""
+        df = self.load() if df is None else df
+        dataset_dir = dataset_dir or os.path.join(self.output_dir, 'dataset')
+        write_partitioned(df, dataset_dir)
+        return dataset_dir
+
+    def settled_date(self):
+        """Data a partir da qual as janelas ainda não viram checkpoint"""
+        return (datetime.now().date() - timedelta(days=self.settle_days)).strftime('%Y-%m-%d')
+
+    def _settled_chunks(self, settled):
+        """Checkpoints de janelas que terminam até a data de assentamento"""
+        return [(chunk_start, chunk_end) for chunk_start, chunk_end
+                in completed_chunks(self.checkpoint_dir) if chunk_end <= settled]
+
+    def _next_window(self, pending):
+        """Retira de pending a próxima janela com o tamanho atual do chunker"""
+        start_date, end_date = pending.pop(0)
+        window_end = min(pd.Timestamp(start_date) + timedelta(days=self.chunker.days),
+                         pd.Timestamp(end_date)).strftime('%Y-%m-%d')
+        if window_end < end_date:
+            pending.insert(0, (window_end, end_date))
+        return start_date, window_end
+
+    def _run_window(self, window_start, window_end):
+        days = (pd.Timestamp(window_end) - pd.Timestamp(window_start)).days
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                df = self.fetch(window_start, window_end)
+            except ee.EEException as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = self.base_delay * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay / 2))
+                continue
+            self.chunker.record(days, time.perf_counter() - started)
+            if window_end <= self.settled_date():
+                self._write_chunk(window_start, window_end, df)
+            else:
+                with self._lock:
+                    self.recent[(window_start, window_end)] = df
+            return df
+
+    def _write_chunk(self, window_start, window_end, df):
+        """Grava o checkpoint da janela de forma atômica"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_path, chunk_path(self.checkpoint_dir, window_start, window_end))
+
+    def _log_error(self, window_start, window_end, error):
+        with self._lock:
+            with open(os.path.join(self.output_dir, 'errors.jsonl'), 'a') as f:
+                f.write(json.dumps({'start': window_start, 'end': window_end, 'error': str(error),
+                                    'time': time.strftime('%Y-%m-%d %H:%M:%S')}) + '\n')
+
+    @staticmethod
+    def _print_progress(fraction, window_start, window_end, chunk_days):
+        print(f"[{fraction:.0%}] {window_start} a {window_end} (janela atual: {chunk_days} dias)")
@@ -0,0 +1,277 @@
+import csv
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import ee
+import pandas as pd
+
+from data_processor import REDUCTIONS_ATTR, split_date_range
+from reduction_plan import ReductionPlan
+
+# Mensagens do GEE que indicam limite de taxa/concorrência (vale tentar de novo)
+EE_RATE_LIMIT_ERRORS = (
+    'too many concurrent',
+    'too many requests',
+    'rate limit',
+    'quota',
+    'http 429',
+    'service unavailable',
+)
+
+DEFAULT_BUFFER_M = 1000
+EARTH_RADIUS_KM = 6371.0088
+
+
+def is_rate_limit_error(error):
+    """Verifica se o erro do GEE foi causado por limite de taxa"""
+    # Status HTTP quando disponível (googleapiclient.errors.HttpError)
+    if getattr(getattr(error, 'resp', None), 'status', None) == 429:
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in EE_RATE_LIMIT_ERRORS)
+
+
+def load_fields(path):
+    """Carrega talhões de um GeoJSON (FeatureCollection) ou CSV
+
+    GeoJSON: o id vem de properties.field_id/id/name; pontos usam
+    properties.buffer_m. CSV: colunas field_id, lat, lon e buffer_m opcional.
+    Retorna uma lista de dicts {'field_id', 'geometry', 'buffer_m'}.
+    """
+    fields = []
+    if path.lower().endswith(('.geojson', '.json')):
+        with open(path) as f:
+            data = json.load(f)
+        features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+        for i, feature in enumerate(features):
+            props = feature.get('properties') or {}
+            field_id = props.get('field_id', props.get('id', props.get('name', feature.get('id', i))))
+            fields.append({
+                'field_id': str(field_id),
+                'geometry': feature['geometry'],
+                'buffer_m': float(props.get('buffer_m', DEFAULT_BUFFER_M))
+            })
+    else:
+        with open(path, newline='') as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                fields.append({
+                    'field_id': str(row.get('field_id') or i),
+                    'geometry': {'type': 'Point',
+                                 'coordinates': [float(row['lon']), float(row['lat'])]},
+                    'buffer_m': float(row.get('buffer_m') or DEFAULT_BUFFER_M)
+                })
+    return fields
+
+
+def field_geometry(field):
+    """Converte a geometria de um talhão em ee.Geometry"""
+    geometry = ee.Geometry(field['geometry'])
+    if field['geometry']['type'] == 'Point':
+        geometry = geometry.buffer(field['buffer_m'])
+    return geometry
+
+
+def field_area_km2(field):
+    """Área aproximada do talhão em km², calculada no cliente
+
+    Pontos usam o círculo de raio buffer_m; polígonos, a fórmula do
+    laço em projeção equiretangular local (adequada a talhões).
+    """
+    geometry = field['geometry']
+    if geometry['type'] == 'Point':
+        return math.pi * (field['buffer_m'] / 1000) ** 2
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+
+    def ring_area(ring):
+        lat0 = math.radians(sum(lat for _, lat in ring) / len(ring))
+        xs = [math.radians(lon) * math.cos(lat0) * EARTH_RADIUS_KM for lon, _ in ring]
+        ys = [math.radians(lat) * EARTH_RADIUS_KM for _, lat in ring]
+        return abs(sum(xs[i] * ys[i + 1] - xs[i + 1] * ys[i] for i in range(len(ring) - 1))) / 2
+
+    return sum(ring_area(rings[0]) - sum(ring_area(hole) for hole in rings[1:])
+               for rings in polygons)
+
+
+def safe_field_id(field_id):
+    """Id do talhão utilizável como nome de arquivo"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(field_id))
+
+
+class BatchProcessor:
+    """Extração de séries temporais de muitos talhões em paralelo
+
+    Os resultados de cada talhão são gravados em disco assim que ficam
+    prontos (um CSV por talhão em output_dir; a configuração de redução
+    usada vai em reductions.jsonl). Talhões já gravados são
+    ignorados, de modo que uma execução interrompida pode ser retomada.
+    """
+
+    def __init__(self, processor, output_dir, max_workers=4, max_retries=5,
+                 base_delay=2.0, bands=('NDWI', 'NDVI', 'NDMI'), scale=None,
+                 progress=None, store=None, plan=None):
+        self.processor = processor
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.bands = list(bands)
+        # scale/tileScale do modo reduce_regions; sem scale, pela área do grupo
+        self.plan = plan or ReductionPlan(scale=scale)
+        self.progress = progress or self._print_progress
+        # Armazenamento colunar (ts_store.TimeSeriesStore) que recebe cada talhão
+        self.store = store
+        self._lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def run(self, fields, start_date, end_date, mode='threads', fields_per_request=50,
+            chunk_days=None):
+        """Processa todos os talhões e retorna {field_id: status}
+
+        mode='threads': um talhão por requisição, em um pool limitado.
+        mode='reduce_regions': grupos de fields_per_request talhões reduzidos
+        juntos com reduceRegions (uma requisição por grupo).
+        """
+        pending = [field for field in fields if not self.is_done(field['field_id'])]
+        status = {field['field_id']: 'skipped' for field in fields if self.is_done(field['field_id'])}
+        total = len(fields)
+        done = len(status)
+
+        if mode == 'threads':
+            tasks = [([field], self._process_field) for field in pending]
+        elif mode == 'reduce_regions':
+            tasks = [(pending[i:i + fields_per_request], self._process_group)
+                     for i in range(0, len(pending), fields_per_request)]
+        else:
+            raise ValueError(f"Modo desconhecido: {mode}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._with_backoff, function, group, start_date, end_date, chunk_days): group
+                for group, function in tasks
+            }
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    future.result()
+                    outcome = 'ok'
+                except Exception as e:
+                    outcome = 'error'
+                    for field in group:
+                        self._log_error(field['field_id'], e)
+
+                for field in group:
+                    done += 1
+                    status[field['field_id']] = outcome
+                    self.progress(done, total, field['field_id'], outcome)
+
+        return status
+
+    def is_done(self, field_id):
+        """Verifica se o talhão já foi gravado em disco"""
+        return os.path.exists(self.result_path(field_id))
+
+    def result_path(self, field_id):
+        return os.path.join(self.output_dir, f'{safe_field_id(field_id)}.csv')
+
+    def load_results(self):
+        """Concatena os resultados gravados em um único DataFrame"""
+        frames = []
+        for name in sorted(os.listdir(self.output_dir)):
+            if name.endswith('.csv'):
+                frames.append(pd.read_csv(os.path.join(self.output_dir, name), dtype={'field_id': str}))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _with_backoff(self, function, group, start_date, end_date, chunk_days):
+        """Executa com nova tentativa exponencial em erros de limite de taxa"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return function(group, start_date, end_date, chunk_days)
+            except ee.EEException as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = self.base_delay * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay / 2))
+
+    def _process_field(self, group, start_date, end_date, chunk_days):
+        field = group[0]
+        roi = field_geometry(field)
+        collection = self.processor.get_sentinel2_data(roi, start_date, end_date)
+        df = self.processor.export_time_series(collection, roi, start_date, end_date,
+                                               bands=self.bands, chunk_days=chunk_days)
+        self._write_result(field['field_id'], df)
+
+    def _process_group(self, group, start_date, end_date, chunk_days):
+        features = ee.FeatureCollection([
+            ee.Feature(field_geometry(field), {'field_id': field['field_id']})
+            for field in group
+        ])
+        bounds = features.geometry()
+        collection = self.processor.get_sentinel2_data(bounds, start_date, end_date).select(self.bands)
+        scale = self.plan.scale_for(bounds)
+
+        def reduce_image(image):
+            stats = image.reduceRegions(collection=features, reducer=ee.Reducer.mean(),
+                                        scale=scale, tileScale=self.plan.tile_scale)
+            return stats.map(lambda f: f.set({
+                'date': image.date().format('YYYY-MM-dd'),
+                'scene_id': image.get('system:index')
+            }))
+
+        columns = ['field_id', 'date', 'scene_id'] + self.bands
+        windows = split_date_range(start_date, end_date, chunk_days) if chunk_days else [(start_date, end_date)]
+        frames = []
+        reductions = []
+        for window_start, window_end in windows:
+            table = (collection.filterDate(window_start, window_end)
+                     .map(reduce_image).flatten()
+                     .filter(ee.Filter.notNull(self.bands)))
+            # Payload colunar: uma lista por propriedade em vez de um Feature por linha;
+            # a escala efetiva vai uma vez por requisição
+            request = {column: table.aggregate_array(column) for column in columns}
+            request['scale'] = scale
+            payload = self.processor.tracer.get_info(ee.Dictionary(request), 'reduce_regions')
+            frames.append(pd.DataFrame({column: payload[column] for column in columns}))
+            reductions.append({**self.plan.describe(payload['scale']),
+                               'start': window_start, 'end': window_end})
+
+        df = pd.concat(frames, ignore_index=True)
+        for field in group:
+            rows = df[df['field_id'] == field['field_id']].drop(columns='field_id')
+            rows = rows.reset_index(drop=True)
+            rows.attrs[REDUCTIONS_ATTR] = reductions
+            self._write_result(field['field_id'], rows)
+
+    def _write_result(self, field_id, df):
+        """Grava o resultado do talhão de forma atômica"""
+        df = df.copy()
+        df.insert(0, 'field_id', field_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', newline='') as f:
+            df.to_csv(f, index=False)
+        os.replace(tmp_path, self.result_path(field_id))
+        if self.store is not None:
+            self.store.append(field_id, df.drop(columns='field_id'))
+        reductions = df.attrs.get(REDUCTIONS_ATTR)
+        if reductions:
+            # Configuração de redução uma vez por talhão, fora das linhas do CSV
+            with self._lock:
+                with open(os.path.join(self.output_dir, 'reductions.jsonl'), 'a') as f:
+                    f.write(json.dumps({'field_id': field_id, 'reductions': reductions},
+                                       default=str) + '\n')
+
+    def _log_error(self, field_id, error):
+        with self._lock:
+            with open(os.path.join(self.output_dir, 'errors.jsonl'), 'a') as f:
+                f.write(json.dumps({'field_id': field_id, 'error': str(error),
+                                    'time': time.strftime('%Y-%m-%d %H:%M:%S')}) + '\n')
+
+    @staticmethod
+    def _print_progress(done, total, field_id, status):
+        print(f"[{done}/{total}] {field_id}: {status}")
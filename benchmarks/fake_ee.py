@@ -0,0 +1,852 @@
+"""Substituto local do módulo ``ee`` para benchmarks
+
+Implementa o subconjunto da API do Earth Engine usado por data_processor,
+monitoring e batch_processor. Os objetos são avaliados preguiçosamente em
+getInfo(), que gera payloads JSON no formato do GEE com coleções
+sintéticas de tamanho configurável, simula a latência do servidor e
+contabiliza idas ao servidor, bytes de payload e reduções.
+
+Uso: instalar em sys.modules['ee'] antes de importar os módulos do projeto.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+_config = {
+    'n_scenes': 100,
+    'start': '2023-01-01',
+    'end': '2024-01-01',
+    'latency_base': 0.05,            # s por ida ao servidor
+    'latency_per_kb': 0.0002,        # s por KB de resposta
+    'latency_per_reduction': 0.0005,  # s por redução executada no servidor
+    'max_payload_bytes': 10 * 1024 ** 2,
+    'max_elements': 5000,
+    'masked_fraction': 0.05,
+    'seed': 42,
+}
+DEFAULT_CONFIG = dict(_config)
+
+S2_BANDS = ['B1', 'B2', 'B3', 'B4', 'B5', 'B6', 'B7', 'B8', 'B8A', 'B9', 'B11', 'B12', 'QA60']
+LANDSAT_BANDS = ['SR_B1', 'SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7', 'ST_B10', 'QA_PIXEL']
+
+# Faixas plausíveis dos valores sintéticos por banda
+VALUE_RANGES = {
+    'NDWI': (-0.5, 0.3),
+    'NDVI': (0.1, 0.85),
+    'NDMI': (-0.2, 0.5),
+    'ET_daily': (1.0, 6.5),
+    'ET_DAILY': (1.0, 6.5),
+}
+
+
+class EEException(Exception):
+    pass
+
+
+class _Stats:
+    """Contadores de idas ao servidor, bytes de payload e reduções"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.round_trips = 0
+        self.payload_bytes = 0
+        self.reductions = 0
+        self.simulated_latency = 0.0
+
+    def as_dict(self):
+        return {'round_trips': self.round_trips, 'payload_bytes': self.payload_bytes,
+                'reductions': self.reductions, 'simulated_latency_s': round(self.simulated_latency, 6)}
+
+
+stats = _Stats()
+_catalogs = {}
+
+
+def configure(**options):
+    """Altera a configuração da coleção sintética e da latência simulada"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"Opções desconhecidas: {sorted(unknown)}")
+    _config.update(options)
+    _catalogs.clear()
+
+
+def reset(**options):
+    """Volta à configuração padrão (mais as opções dadas) e zera os contadores"""
+    _config.clear()
+    _config.update(DEFAULT_CONFIG)
+    configure(**options)
+    stats.reset()
+
+
+def Initialize(*args, **kwargs):
+    pass
+
+
+def Authenticate(*args, **kwargs):
+    pass
+
+
+def ServiceAccountCredentials(*args, **kwargs):
+    return None
+
+
+def _catalog(collection_id):
+    """Cenas sintéticas de uma coleção, espaçadas uniformemente no período"""
+    if collection_id not in _catalogs:
+        rng = random.Random(f"{_config['seed']}-{collection_id}")
+        start = datetime.fromisoformat(_config['start']).replace(tzinfo=timezone.utc)
+        end = datetime.fromisoformat(_config['end']).replace(tzinfo=timezone.utc)
+        n = _config['n_scenes']
+        step = (end - start) / max(n, 1)
+        landsat = 'LANDSAT' in collection_id
+        platform = collection_id.split('/')[1] if landsat else None
+        scenes = []
+        for i in range(n):
+            moment = start + step * i + timedelta(hours=13, minutes=rng.randint(0, 30))
+            stamp = moment.strftime('%Y%m%dT%H%M%S')
+            index = f'{platform}_217069_{moment:%Y%m%d}_{i:05d}' if landsat else f'{stamp}_{stamp}_T24L{i:05d}'
+            cloud = round(rng.uniform(0, 19.9), 4)
+            scenes.append({
+                'system:index': index,
+                'system:time_start': int(moment.timestamp() * 1000),
+                'CLOUDY_PIXEL_PERCENTAGE': cloud,
+                'CLOUD_COVER': cloud,
+                'SPACECRAFT_NAME': 'LANDSAT_8' if landsat else 'Sentinel-2A',
+                'system:footprint': {'type': 'LinearRing', 'coordinates': [
+                    [-41.0, -11.8], [-40.0, -11.8], [-40.0, -10.8], [-41.0, -10.8], [-41.0, -11.8]]},
+                '_bands': LANDSAT_BANDS if landsat else S2_BANDS,
+                '_collection': collection_id,
+            })
+        _catalogs[collection_id] = scenes
+    return _catalogs[collection_id]
+
+
+def _synthetic_value(scene, band, region_key):
+    """Valor médio determinístico para (cena, banda, região); None = mascarado"""
+    digest = hashlib.md5(f"{scene['system:index']}|{band}|{region_key}".encode()).digest()
+    if int.from_bytes(digest[:4], 'big') / 2 ** 32 < _config['masked_fraction']:
+        return None
+    low, high = VALUE_RANGES.get(band, (0.0, 1.0))
+    return low + (high - low) * int.from_bytes(digest[4:12], 'big') / 2 ** 64
+
+
+def _memoized(obj, env, compute):
+    """Avalia cada subexpressão uma vez por requisição, como o servidor do GEE"""
+    memo = env.setdefault('_memo', {})
+    key = (id(obj), id(env.get('scene')), id(env.get('feature')))
+    if key not in memo:
+        # Guarda os objetos da chave para que seus ids não sejam reutilizados
+        memo[key] = (obj, env.get('scene'), env.get('feature'), compute())
+    return memo[key][-1]
+
+
+def _public(properties):
+    return {k: v for k, v in properties.items() if not k.startswith('_')}
+
+
+def _evaluate(value, env):
+    """Avalia um valor (objeto simulado ou literal) no ambiente atual"""
+    if isinstance(value, ComputedObject):
+        return value._evaluate(env)
+    if isinstance(value, dict):
+        return {k: _evaluate(v, env) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_evaluate(v, env) for v in value]
+    return value
+
+
+class ComputedObject:
+    """Base dos objetos simulados: avaliação preguiçosa em getInfo()"""
+
+    def _evaluate(self, env):
+        raise NotImplementedError
+
+    def getInfo(self):
+        reductions_before = stats.reductions
+        value = self._evaluate({'_memo': {}})
+        payload = json.dumps(value)
+        size = len(payload.encode())
+
+        latency = (_config['latency_base']
+                   + _config['latency_per_kb'] * size / 1024
+                   + _config['latency_per_reduction'] * (stats.reductions - reductions_before))
+        stats.round_trips += 1
+        stats.payload_bytes += size
+        stats.simulated_latency += latency
+        if latency > 0:
+            time.sleep(latency)
+
+        if size > _config['max_payload_bytes']:
+            raise EEException('Response size exceeds limit of %d bytes.' % _config['max_payload_bytes'])
+        return json.loads(payload)
+
+    def serialize(self):
+        return json.dumps(self._describe(), sort_keys=True, default=str)
+
+    def _describe(self):
+        return [type(self).__name__, id(self)]
+
+
+class Number(ComputedObject):
+    def __init__(self, value):
+        self.value = value
+
+    def _evaluate(self, env):
+        return _evaluate(self.value, env)
+
+    def _operation(self, function, *others):
+        return Number(_Lazy(lambda env: function(_evaluate(self.value, env),
+                                                 *[_evaluate(other, env) for other in others])))
+
+    def multiply(self, other):
+        if isinstance(other, Image):
+            return Image._derived(other, other.bands)
+        return self._operation(lambda a, b: a * b, other)
+
+    def add(self, other):
+        return self._operation(lambda a, b: a + b, other)
+
+    def subtract(self, other):
+        return self._operation(lambda a, b: a - b, other)
+
+    def divide(self, other):
+        return self._operation(lambda a, b: a / b, other)
+
+    def max(self, other):
+        return self._operation(max, other)
+
+    def min(self, other):
+        return self._operation(min, other)
+
+    def sqrt(self):
+        return self._operation(math.sqrt)
+
+    def ceil(self):
+        return self._operation(math.ceil)
+
+
+class String(ComputedObject):
+    def __init__(self, value):
+        self.value = value
+
+    def _evaluate(self, env):
+        return _evaluate(self.value, env)
+
+    def cat(self, other):
+        return String(_Lazy(lambda env: f'{self._evaluate(env)}{_evaluate(other, env)}'))
+
+
+class List(ComputedObject):
+    def __init__(self, producer):
+        self.producer = producer
+
+    def _evaluate(self, env):
+        return self.producer(env)
+
+    def get(self, index):
+        return _Lazy(lambda env: self._evaluate(env)[index])
+
+    def map(self, function):
+        # Como no GEE, resultados nulos são descartados
+        def producer(env):
+            results = [_evaluate(function(_Lazy(lambda env, value=value: value)), env)
+                       for value in self._evaluate(env)]
+            return [value for value in results if value is not None]
+        return List(producer)
+
+
+class _Lazy(ComputedObject):
+    def __init__(self, producer):
+        self.producer = producer
+
+    def _evaluate(self, env):
+        return self.producer(env)
+
+
+class Dictionary(ComputedObject):
+    def __init__(self, items=None):
+        self.items = items if items is not None else {}
+
+    def _evaluate(self, env):
+        if callable(self.items):
+            # Uma redução referenciada várias vezes é calculada uma vez por requisição
+            return _memoized(self, env, lambda: self.items(env))
+        return _evaluate(self.items, env)
+
+    def set(self, key, value):
+        base = self
+        return Dictionary(lambda env: {**base._evaluate(env), key: _evaluate(value, env)})
+
+    def get(self, key):
+        return _Lazy(lambda env: self._evaluate(env).get(key))
+
+    def values(self, keys=None):
+        def producer(env):
+            items = self._evaluate(env)
+            if keys is None:
+                return list(items.values())
+            selected = _evaluate(keys, env)
+            missing = [key for key in selected if key not in items]
+            if missing:
+                raise EEException(f'Dictionary.values: Key {missing[0]!r} not found.')
+            return [items[key] for key in selected]
+        return List(producer)
+
+    def keys(self):
+        return List(lambda env: list(self._evaluate(env).keys()))
+
+
+class Reducer:
+    def __init__(self, name):
+        self.name = name
+
+    @staticmethod
+    def mean():
+        return Reducer('mean')
+
+    @staticmethod
+    def median():
+        return Reducer('median')
+
+    @staticmethod
+    def stdDev():
+        return Reducer('stdDev')
+
+    @staticmethod
+    def percentile(percentiles):
+        return Reducer('percentile')
+
+    @staticmethod
+    def count():
+        return Reducer('count')
+
+
+class Geometry(ComputedObject):
+    def __init__(self, geojson=None, key=None):
+        self.geojson = geojson
+        self.key = key or json.dumps(geojson, sort_keys=True)
+
+    @staticmethod
+    def Point(coords, proj=None):
+        return Geometry({'type': 'Point', 'coordinates': list(coords)})
+
+    @staticmethod
+    def Rectangle(coords, proj=None, geodesic=None):
+        x0, y0, x1, y1 = coords
+        return Geometry({'type': 'Polygon',
+                         'coordinates': [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]})
+
+    @staticmethod
+    def Polygon(coords, proj=None, geodesic=None):
+        return Geometry({'type': 'Polygon', 'coordinates': coords})
+
+    def buffer(self, distance, maxError=None):
+        return Geometry(self.geojson, key=f'{self.key}|buffer={distance}')
+
+    def bounds(self, maxError=None):
+        return Geometry(self.geojson, key=f'{self.key}|bounds')
+
+    def area(self, maxError=None):
+        return Number(1e6)
+
+    def _evaluate(self, env):
+        return self.geojson
+
+    def _describe(self):
+        return ['Geometry', self.key]
+
+
+class Filter:
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    @staticmethod
+    def lt(name, value):
+        return Filter(lambda props: props.get(name) is not None and props[name] < value)
+
+    @staticmethod
+    def gt(name, value):
+        return Filter(lambda props: props.get(name) is not None and props[name] > value)
+
+    @staticmethod
+    def eq(name, value):
+        return Filter(lambda props: props.get(name) == value)
+
+    @staticmethod
+    def inList(name, values):
+        allowed = set(_evaluate(values, {}))
+        return Filter(lambda props: props.get(name) in allowed)
+
+    @staticmethod
+    def notNull(names):
+        return Filter(lambda props: all(props.get(name) is not None for name in names))
+
+    @staticmethod
+    def date(start, end=None):
+        start_ms, end_ms = _date_range(start, end)
+        return Filter(lambda props: start_ms <= props.get('system:time_start', -1) < end_ms)
+
+    @staticmethod
+    def And(*filters):
+        return Filter(lambda props: all(f.predicate(props) for f in filters))
+
+    @staticmethod
+    def Or(*filters):
+        return Filter(lambda props: any(f.predicate(props) for f in filters))
+
+
+def _date_range(start, end):
+    def to_ms(value):
+        moment = datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() * 1000)
+
+    start_ms = to_ms(start)
+    end_ms = to_ms(end) if end is not None else start_ms + 86400000
+    return start_ms, end_ms
+
+
+class Date(ComputedObject):
+    def __init__(self, value):
+        self.value = value
+
+    def _evaluate(self, env):
+        if isinstance(self.value, Image):
+            scene = self.value._scene(env)
+            if 'system:time_start' not in scene:
+                raise EEException("Image.date: Image is missing the 'system:time_start' property.")
+            return scene['system:time_start']
+        return _date_range(self.value, None)[0]
+
+    def format(self, pattern=None):
+        date = self
+
+        def producer(env):
+            moment = datetime.fromtimestamp(date._evaluate(env) / 1000, tz=timezone.utc)
+            return moment.strftime('%Y-%m-%d')
+
+        return _Lazy(producer)
+
+    def millis(self):
+        return _Lazy(self._evaluate)
+
+
+class _TileFetcher:
+    def __init__(self, url_format):
+        self.url_format = url_format
+
+
+class Image(ComputedObject):
+    """Imagem simulada: rastreia apenas os nomes das bandas e a cena de origem"""
+
+    def __init__(self, source=None, bands=None, scene=None, stacked=None, scene_source=None,
+                 overrides=None, dropped=False, copied=None):
+        if isinstance(source, str):
+            collection_id, _, index = source.rpartition('/')
+            matches = [s for s in _catalog(collection_id) if s['system:index'] == index]
+            if not matches:
+                raise EEException(f"Image.load: Image asset '{source}' not found.")
+            scene = matches[0]
+            bands = list(scene['_bands'])
+        elif isinstance(source, Image):
+            bands, scene, stacked = source.bands, source.scene_, source.stacked
+            scene_source, overrides = source.scene_source, source.overrides
+            dropped, copied = source.dropped, source.copied
+        elif isinstance(source, (int, float)):
+            bands = ['constant']
+        self.bands = list(bands or [])
+        self.scene_ = scene
+        self.stacked = stacked
+        # Cena resolvida na avaliação (first(), composições) e propriedades de set()
+        self.scene_source = scene_source
+        self.overrides = overrides or {}
+        # Como no GEE, a álgebra de imagens descarta as propriedades da cena
+        # (exceto system:index); copyProperties() as traz de volta
+        self.dropped = dropped
+        self.copied = list(copied or [])
+
+    @staticmethod
+    def _derived(image, bands, overrides=None, copied=None):
+        return Image(bands=bands, scene=image.scene_, stacked=image.stacked,
+                     scene_source=image.scene_source,
+                     overrides={**image.overrides, **(overrides or {})},
+                     dropped=image.dropped, copied=image.copied + list(copied or []))
+
+    def _computed(self, *args, **kwargs):
+        """Resultado de álgebra de imagens: mesmas bandas, sem propriedades"""
+        return Image(bands=self.bands, scene=self.scene_, stacked=self.stacked,
+                     scene_source=self.scene_source, dropped=True)
+
+    def _scene(self, env):
+        if self.scene_ is not None:
+            scene = self.scene_
+        elif self.scene_source is not None:
+            scene = self.scene_source(env)
+        elif 'scene' in env:
+            scene = env['scene']
+        else:
+            raise EEException('Image: cena indefinida fora de map().')
+        if self.dropped:
+            scene = {k: v for k, v in scene.items() if k.startswith('_') or k == 'system:index'}
+        for source, names in self.copied:
+            source_scene = source._scene(env)
+            names = names if names is not None else [k for k in _public(source_scene)
+                                                     if not k.startswith('system:')]
+            scene = {**scene, **{name: source_scene[name] for name in names if name in source_scene}}
+        if self.overrides:
+            scene = {**scene, **_evaluate(self.overrides, env)}
+        return scene
+
+    def _evaluate(self, env):
+        scene = self._scene(env)
+        return {'type': 'Image',
+                'bands': [{'id': band, 'data_type': {'type': 'PixelType', 'precision': 'float'},
+                           'crs': 'EPSG:32724', 'crs_transform': [10, 0, 499980, 0, -10, 8900020]}
+                          for band in self.bands],
+                'id': f"{scene['_collection']}/{scene['system:index']}",
+                'properties': _public(scene)}
+
+    def _describe(self):
+        return ['Image', self.bands, self.scene_ and self.scene_['system:index']]
+
+    # Seleção e renomeação
+    def select(self, selectors, names=None):
+        selectors = [selectors] if isinstance(selectors, str) else list(selectors)
+        bands = [band for band in self.bands
+                 if any(re.fullmatch(pattern, band) for pattern in selectors)]
+        if not bands:
+            raise EEException(f"Image.select: Pattern '{selectors[0]}' did not match any bands.")
+        return Image._derived(self, names or bands)
+
+    def rename(self, *names):
+        names = list(names[0]) if len(names) == 1 and not isinstance(names[0], str) else list(names)
+        return Image._derived(self, names)
+
+    def addBands(self, images, names=None, overwrite=False):
+        images = images if isinstance(images, (list, tuple)) else [images]
+        bands = list(self.bands)
+        for image in images:
+            for band in image.bands:
+                if band in bands:
+                    bands.remove(band)
+                bands.append(band)
+        return Image._derived(self, bands)
+
+    def normalizedDifference(self, bandNames=None):
+        return Image._computed(self).rename('nd')
+
+    def _same_bands(self, *args, **kwargs):
+        return Image._derived(self, self.bands)
+
+    multiply = add = subtract = divide = pow = _computed
+    bitwiseAnd = eq = neq = lt = gt = And = Or = Not = _computed
+    updateMask = unmask = clip = reproject = float = toFloat = _same_bands
+
+    @staticmethod
+    def constant(value):
+        return Image(bands=['constant'])
+
+    def expression(self, expression, mapping=None):
+        return Image._computed(self).rename('constant')
+
+    def set(self, *args):
+        updates = args[0] if len(args) == 1 and isinstance(args[0], dict) else dict(zip(args[::2], args[1::2]))
+        return Image._derived(self, self.bands, updates)
+
+    def copyProperties(self, source=None, properties=None, exclude=None):
+        if source is None:
+            return Image._derived(self, self.bands)
+        return Image._derived(self, self.bands, copied=[(source, properties)])
+
+    def get(self, name):
+        return _Lazy(lambda env: self._scene(env).get(name))
+
+    def date(self):
+        return Date(self)
+
+    def id(self):
+        return _Lazy(lambda env: self._scene(env)['system:index'])
+
+    def bandNames(self):
+        return List(lambda env: list(self.bands))
+
+    def projection(self):
+        return None
+
+    def getMapId(self, vis_params=None):
+        stats.round_trips += 1
+        token = hashlib.md5(f'{self.serialize()}|{vis_params}'.encode()).hexdigest()
+        url = f'https://earthengine.googleapis.com/v1/projects/fake/maps/{token}/tiles/{{z}}/{{x}}/{{y}}'
+        return {'mapid': token, 'token': '', 'tile_fetcher': _TileFetcher(url), 'image': self}
+
+    # Reduções
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, maxPixels=None,
+                     bestEffort=None, tileScale=None, crs=None):
+        image = self
+        region_key = geometry.key if isinstance(geometry, Geometry) else str(geometry)
+
+        def producer(env):
+            stats.reductions += 1
+            if image.stacked is not None:
+                values = {}
+                for scene in image.stacked._scenes(env):
+                    for band in image.stacked.bands:
+                        values[f"{scene['system:index']}_{band}"] = _synthetic_value(scene, band, region_key)
+                return values
+            scene = image._scene(env)
+            return {band: _synthetic_value(scene, band, region_key) for band in image.bands}
+
+        return Dictionary(producer)
+
+    def reduceRegions(self, collection, reducer=None, scale=None, tileScale=None, crs=None):
+        return FeatureCollection(_source=_ReduceRegions(self, collection))
+
+    def sampleRectangle(self, region=None, defaultValue=None, properties=None):
+        raise EEException('sampleRectangle não é suportado pelo backend simulado.')
+
+
+class Feature(ComputedObject):
+    def __init__(self, geometry=None, properties=None, _template=False):
+        self.geometry_ = geometry
+        self.properties = properties if properties is not None else {}
+        self.template = _template
+
+    def _props(self, env):
+        if self.template:
+            return dict(env['feature'])
+        return _evaluate(self.properties, env) or {}
+
+    def _evaluate(self, env):
+        return {'type': 'Feature', 'geometry': _evaluate(self.geometry_, env),
+                'id': '0', 'properties': self._props(env)}
+
+    def set(self, *args):
+        updates = args[0] if len(args) == 1 and isinstance(args[0], dict) else dict(zip(args[::2], args[1::2]))
+        base = self
+
+        def producer(env):
+            return {**base._props(env), **_evaluate(updates, env)}
+
+        return Feature(self.geometry_, Dictionary(producer))
+
+    def get(self, name):
+        return _Lazy(lambda env: self._props(env).get(name))
+
+    def geometry(self):
+        return self.geometry_
+
+
+class _ReduceRegions:
+    """Resultado simulado de image.reduceRegions(features)"""
+
+    def __init__(self, image, features):
+        self.image = image
+        self.features = features
+
+    def rows(self, env):
+        scene = self.image._scene(env)
+        rows = []
+        for props in self.features._rows(env):
+            stats.reductions += 1
+            region_key = props.get('field_id', json.dumps(props, sort_keys=True, default=str))
+            rows.append({**props, **{band: _synthetic_value(scene, band, region_key)
+                                     for band in self.image.bands}})
+        return rows
+
+
+class FeatureCollection(ComputedObject):
+    def __init__(self, features=None, _source=None, _rows=None):
+        if isinstance(features, (list, tuple)):
+            literal = list(features)
+            self._source = lambda env: [f._props(env) for f in literal]
+        elif _source is not None:
+            self._source = _source.rows if hasattr(_source, 'rows') else _source
+        elif _rows is not None:
+            self._source = _rows
+        else:
+            self._source = lambda env: []
+
+    def _rows(self, env):
+        return _memoized(self, env, lambda: self._source(env))
+
+    def _evaluate(self, env):
+        rows = self._rows(env)
+        if len(rows) > _config['max_elements']:
+            raise EEException(f"Collection query aborted after accumulating over "
+                              f"{_config['max_elements']} elements.")
+        return {'type': 'FeatureCollection', 'columns': {},
+                'features': [{'type': 'Feature', 'geometry': None, 'id': str(i), 'properties': row}
+                             for i, row in enumerate(rows)]}
+
+    def map(self, function):
+        result = function(Feature(_template=True))
+        base = self
+
+        def rows(env):
+            return [result._props({**env, 'feature': row}) for row in base._rows(env)]
+
+        return FeatureCollection(_rows=rows)
+
+    def filter(self, filter_):
+        base = self
+        return FeatureCollection(_rows=lambda env: [r for r in base._rows(env) if filter_.predicate(r)])
+
+    def flatten(self):
+        return self
+
+    def aggregate_array(self, name):
+        return List(lambda env: [row[name] for row in self._rows(env) if row.get(name) is not None])
+
+    def size(self):
+        return _Lazy(lambda env: len(self._rows(env)))
+
+    def geometry(self, maxError=None):
+        return Geometry(None, key=f'fc-{id(self)}')
+
+    def first(self):
+        return Feature(None, Dictionary(lambda env: self._rows(env)[0]))
+
+
+class ImageCollection(ComputedObject):
+    def __init__(self, collection_id=None, _scenes=None, bands=None, template=None):
+        self.collection_id = collection_id
+        if _scenes is None:
+            catalog = _catalog(collection_id)
+            _scenes = lambda env: list(catalog)
+            bands = list(catalog[0]['_bands']) if catalog else []
+        self._scene_source = _scenes
+        self.bands = list(bands or [])
+        self.template = template
+
+    def _scenes(self, env):
+        return _memoized(self, env, lambda: self._scene_source(env))
+
+    def _derived(self, scenes=None, bands=None, template='keep'):
+        return ImageCollection(self.collection_id, scenes or self._scene_source,
+                               self.bands if bands is None else bands,
+                               self.template if template == 'keep' else template)
+
+    def _evaluate(self, env):
+        scenes = self._scenes(env)
+        if len(scenes) > _config['max_elements']:
+            raise EEException(f"Collection query aborted after accumulating over "
+                              f"{_config['max_elements']} elements.")
+        return {'type': 'ImageCollection', 'bands': [],
+                'features': [Image(bands=self.bands, scene=s)._evaluate(env) for s in scenes]}
+
+    # Filtros
+    def filterBounds(self, geometry):
+        return self._derived()
+
+    def filterDate(self, start, end=None):
+        start_ms, end_ms = _date_range(start, end)
+        base = self
+        return self._derived(lambda env: [s for s in base._scenes(env)
+                                          if start_ms <= s.get('system:time_start', -1) < end_ms])
+
+    def filter(self, filter_):
+        base = self
+        return self._derived(lambda env: [s for s in base._scenes(env) if filter_.predicate(s)])
+
+    def sort(self, prop, ascending=True):
+        base = self
+        return self._derived(lambda env: sorted(base._scenes(env), key=lambda s: s.get(prop),
+                                                reverse=not ascending))
+
+    def limit(self, n, prop=None, ascending=True):
+        base = self
+        return self._derived(lambda env: base._scenes(env)[:n])
+
+    def merge(self, other):
+        base = self
+        return self._derived(lambda env: sorted(base._scenes(env) + other._scenes(env),
+                                                key=lambda s: s['system:time_start']))
+
+    # Mapeamento
+    def map(self, function):
+        result = function(Image(bands=self.bands))
+        base = self
+        if isinstance(result, Image):
+            if not (result.overrides or result.dropped or result.copied):
+                return self._derived(bands=result.bands)
+            # Propriedades definidas com set()/copyProperties() ou descartadas pela álgebra
+            return self._derived(lambda env: [result._scene({**env, 'scene': scene})
+                                              for scene in base._scenes(env)], bands=result.bands)
+
+        if isinstance(result, Feature):
+            def rows(env):
+                return [result._props({**env, 'scene': scene}) for scene in base._scenes(env)]
+        else:
+            def rows(env):
+                collected = []
+                for scene in base._scenes(env):
+                    collected.extend(result._rows({**env, 'scene': scene}))
+                return collected
+        return FeatureCollection(_rows=rows)
+
+    def select(self, selectors, names=None):
+        template = Image(bands=self.bands).select(selectors, names)
+        return self._derived(bands=template.bands)
+
+    def toBands(self):
+        return Image(bands=[], stacked=self)
+
+    def first(self):
+        base = self
+
+        def first_scene(env):
+            scenes = base._scenes(env)
+            if not scenes:
+                raise EEException('Collection.first: empty collection.')
+            return scenes[0]
+
+        return Image(bands=self.bands, scene_source=first_scene)
+
+    def median(self):
+        """Composição: a cena de referência é a primeira da coleção"""
+        base = self
+
+        def composite_scene(env):
+            scenes = base._scenes(env)
+            if scenes:
+                return scenes[0]
+            return {'system:index': 'empty', 'system:time_start': 0,
+                    '_collection': base.collection_id, '_bands': base.bands}
+
+        return Image(bands=self.bands, scene_source=composite_scene)
+
+    def qualityMosaic(self, band):
+        if band not in self.bands:
+            raise EEException(f"Image.select: Pattern '{band}' did not match any bands.")
+        return self.median()
+
+    mean = mosaic = median
+
+    @staticmethod
+    def fromImages(images):
+        images = list(images)
+        return ImageCollection(None, _scenes=lambda env: [image._scene(env) for image in images],
+                               bands=images[0].bands if images else [])
+
+    def aggregate_array(self, name):
+        return List(lambda env: [s[name] for s in self._scenes(env) if s.get(name) is not None])
+
+    def size(self):
+        return _Lazy(lambda env: len(self._scenes(env)))
+
+    def _describe(self):
+        return ['ImageCollection', self.collection_id, self.bands]
+
+
+class data:
+    """Stub de ee.data (sem chamadas de rede)"""
+
+    @staticmethod
+    def getInfo(asset_id):
+        return None
@@ -0,0 +1,240 @@
+"""Benchmarks do pipeline com backend Earth Engine simulado
+
+Mede, por etapa, tempo de parede, idas ao servidor, bytes de payload e
+memória de pico (tracemalloc) para coleções de N cenas e lotes de M ROIs,
+sem credenciais do GEE. O resultado é gravado em JSON para comparação
+entre commits:
+
+    python benchmarks/run_benchmarks.py --scenes 10 100 1000 --rois 1 100 1000 -o atual.json
+    python benchmarks/run_benchmarks.py --compare base.json atual.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(1, os.path.dirname(BENCHMARK_DIR))
+
+import fake_ee
+
+# O backend simulado precisa estar registrado antes dos módulos do projeto
+sys.modules['ee'] = fake_ee
+
+from batch_processor import BatchProcessor  # noqa: E402
+from data_processor import SatelliteDataProcessor  # noqa: E402
+from monitoring import EVETMonitoringSystem  # noqa: E402
+from scene_catalog import SceneCatalog  # noqa: E402
+
+START_DATE = '2023-01-01'
+END_DATE = '2024-01-01'
+METRICS = ('wall_s', 'round_trips', 'payload_bytes', 'peak_memory_bytes')
+
+
+def measure(stage, function, **params):
+    """Executa uma etapa e retorna (resultado, registro de métricas)"""
+    fake_ee.stats.reset()
+    tracemalloc.start()
+    started = time.perf_counter()
+    error = None
+    try:
+        result = function()
+    except Exception as e:
+        result, error = None, f'{type(e).__name__}: {e}'
+    wall = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    record = {'stage': stage, **params, 'wall_s': round(wall, 6),
+              'peak_memory_bytes': peak, **fake_ee.stats.as_dict()}
+    if error:
+        record['error'] = error
+    elif hasattr(result, 'shape'):
+        # Linhas devolvidas: uma etapa rápida e vazia não passa por sucesso
+        record['rows'] = len(result)
+    return result, record
+
+
+def make_fields(n_rois):
+    """Talhões sintéticos distribuídos em uma grade ao redor da área de estudo"""
+    side = max(int(n_rois ** 0.5), 1)
+    return [{'field_id': f'F{i:05d}',
+             'geometry': {'type': 'Point', 'coordinates': [-40.2 + 0.01 * (i % side),
+                                                           -11.1 + 0.01 * (i // side)]},
+             'buffer_m': 500}
+            for i in range(n_rois)]
+
+
+def scene_benchmarks(n_scenes):
+    """Etapas de uma ROI sobre coleções de n_scenes cenas"""
+    fake_ee.configure(n_scenes=n_scenes, start=START_DATE, end=END_DATE)
+    params = {'scenes': n_scenes, 'rois': 1}
+    roi = fake_ee.Geometry.Point([-40.1667, -11.0833]).buffer(1000)
+    system = EVETMonitoringSystem()
+    processor = SatelliteDataProcessor()
+    records = []
+
+    collection, record = measure('get_satellite_data', lambda: system.get_satellite_data(
+        roi, START_DATE, END_DATE), **params)
+    records.append(record)
+
+    time_series, record = measure('create_time_series', lambda: system.create_time_series(
+        collection, roi), **params)
+    records.append(record)
+
+    _, record = measure('download_time_series_data', lambda: system.download_time_series_data(
+        time_series), **params)
+    records.append(record)
+
+    df, record = measure('extract_time_series', lambda: system.extract_time_series(
+        collection, roi, START_DATE, END_DATE), **params)
+    records.append(record)
+
+    with tempfile.TemporaryDirectory() as catalog_dir:
+        # Primeira execução: sincroniza o catálogo e reduz só as cenas limpas sobre a ROI
+        catalog_system = EVETMonitoringSystem(
+            catalog=SceneCatalog(os.path.join(catalog_dir, 'scenes.sqlite')))
+        _, record = measure('extract_time_series_catalog', lambda: catalog_system.extract_time_series(
+            catalog_system.get_satellite_data(roi, START_DATE, END_DATE), roi, START_DATE, END_DATE),
+            **params)
+        records.append(record)
+
+    s2, record = measure('get_sentinel2_data', lambda: processor.get_sentinel2_data(
+        roi, START_DATE, END_DATE), **params)
+    records.append(record)
+
+    for batched in (False, True):
+        stage = 'export_time_series_batched' if batched else 'export_time_series_legacy'
+        exported, record = measure(stage, lambda: processor.export_time_series(
+            s2, roi, START_DATE, END_DATE, bands=('NDWI', 'NDVI', 'NDMI'), batched=batched), **params)
+        records.append(record)
+
+    _, record = measure('export_time_series_monthly', lambda: processor.export_time_series(
+        s2, roi, START_DATE, END_DATE, bands=('NDWI', 'NDVI', 'NDMI'), composite='monthly',
+        gap_fill='linear'), **params)
+    records.append(record)
+
+    _, record = measure('export_time_series_harmonized', lambda: processor.export_harmonized_time_series(
+        roi, START_DATE, END_DATE), **params)
+    records.append(record)
+
+    if exported is not None and not exported.empty:
+        _, record = measure('generate_report', lambda: processor.generate_report(
+            exported, roi_area_km2=3.14), **params)
+        records.append(record)
+    return records
+
+
+def roi_benchmarks(n_rois, n_scenes, max_workers):
+    """Extração de n_rois talhões pelo BatchProcessor, nos dois modos"""
+    fake_ee.configure(n_scenes=n_scenes, start=START_DATE, end=END_DATE)
+    params = {'scenes': n_scenes, 'rois': n_rois}
+    processor = SatelliteDataProcessor()
+    fields = make_fields(n_rois)
+    records = []
+    for mode in ('threads', 'reduce_regions'):
+        with tempfile.TemporaryDirectory() as output_dir:
+            batch = BatchProcessor(processor, output_dir, max_workers=max_workers,
+                                   progress=lambda *args: None)
+            _, record = measure(f'batch_{mode}', lambda: batch.run(
+                fields, START_DATE, END_DATE, mode=mode), **params)
+            record['rows'] = len(batch.load_results())
+            records.append(record)
+    return records
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, current_path, threshold=0.10):
+    """Compara dois resultados; retorna o número de regressões acima do limiar"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+
+    def index(results):
+        return {(r['stage'], r['scenes'], r['rois']): r for r in results['results']}
+
+    old, new = index(baseline), index(current)
+    regressions = 0
+    print(f"{'etapa':32} {'cenas':>6} {'rois':>6} " + ' '.join(f'{m:>22}' for m in METRICS))
+    for key in sorted(set(old) & set(new)):
+        cells = []
+        for metric in METRICS:
+            before, after = old[key].get(metric), new[key].get(metric)
+            if not before:
+                cells.append(f'{after!s:>22}')
+                continue
+            change = (after - before) / before
+            flag = ' !' if change > threshold and metric != 'wall_s' else '  '
+            regressions += flag == ' !'
+            cells.append(f'{after:>12.6g} ({change:+6.1%}){flag}')
+        print(f'{key[0]:32} {key[1]:>6} {key[2]:>6} ' + ' '.join(cells))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rois', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--roi-scenes', type=int, default=10,
+                        help='cenas por coleção nos benchmarks de múltiplas ROIs')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='multiplicador da latência simulada (0 desativa)')
+    parser.add_argument('-o', '--output', default='benchmark_results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'ATUAL'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare) else 0
+
+    latency = {name: fake_ee._config[name] * args.latency_scale
+               for name in ('latency_base', 'latency_per_kb', 'latency_per_reduction')}
+    fake_ee.configure(**latency)
+
+    results = []
+    for n_scenes in args.scenes:
+        print(f"Cenas: {n_scenes}")
+        results.extend(scene_benchmarks(n_scenes))
+    for n_rois in args.rois:
+        print(f"ROIs: {n_rois}")
+        results.extend(roi_benchmarks(n_rois, args.roi_scenes, args.workers))
+
+    output = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency': latency,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+
+    for record in results:
+        print(f"{record['stage']:32} cenas={record['scenes']:<5} rois={record['rois']:<5} "
+              f"{record['wall_s']:9.3f}s {record['round_trips']:5d} req "
+              f"{record['payload_bytes']:>10d} B {record['peak_memory_bytes']:>11d} B"
+              + (f"  ERRO: {record['error']}" if 'error' in record else ''))
+    print(f"Resultados gravados em {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import numpy as np
+
+# Pontos por série enviados ao navegador (ordem da largura do gráfico em pixels)
+POINT_BUDGET = 2000
+# A partir deste número de pontos os traços usam WebGL (Scattergl)
+WEBGL_THRESHOLD = 1000
+
+
+def _as_float(x):
+    """Eixo x numérico (datas viram nanossegundos)"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype('int64').astype('float64')
+    return x.astype('float64')
+
+
+def lttb_indices(x, y, n_out):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets
+
+    Mantém o primeiro e o último ponto e, em cada balde, o ponto que forma
+    o maior triângulo com o ponto escolhido no balde anterior e a média do
+    balde seguinte, preservando a forma visual da série.
+    """
+    x = _as_float(x)
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """Envelope mínimo/máximo: os extremos de cada balde, na ordem original"""
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    starts = edges[:-1]
+    low = np.minimum.reduceat(y, starts)
+    high = np.maximum.reduceat(y, starts)
+
+    # Posição do primeiro mínimo/máximo de cada balde
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    positions = np.arange(n)
+    first_low = np.full(n_buckets, n)
+    first_high = np.full(n_buckets, n)
+    np.minimum.at(first_low, bucket[y == low[bucket]], positions[y == low[bucket]])
+    np.minimum.at(first_high, bucket[y == high[bucket]], positions[y == high[bucket]])
+    return np.unique(np.concatenate([first_low, first_high, [0, n - 1]]))
+
+
+def downsample_indices(x, y, budget=POINT_BUDGET, method='lttb'):
+    """Índices das linhas a desenhar (NaN descartados), no máximo ~budget
+
+    Os extremos globais (pico e vale) são sempre mantidos.
+    """
+    y = np.asarray(y, dtype='float64')
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= budget:
+        return valid
+
+    values = y[valid]
+    if method == 'lttb':
+        chosen = lttb_indices(np.asarray(x)[valid], values, budget)
+    elif method == 'minmax':
+        chosen = minmax_indices(values, budget // 2)
+    else:
+        raise ValueError(f"Método de redução desconhecido: {method}")
+    extremes = [int(np.argmin(values)), int(np.argmax(values))]
+    return valid[np.unique(np.concatenate([chosen, extremes]))]
+
+
+def ols_fit(x, y):
+    """Reta de mínimos quadrados y = slope * x + intercept (NaN descartados)"""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    if len(x) < 2 or np.ptp(x) == 0:
+        return None
+
+    x_mean, y_mean = x.mean(), y.mean()
+    dx, dy = x - x_mean, y - y_mean
+    slope = (dx @ dy) / (dx @ dx)
+    intercept = y_mean - slope * x_mean
+    residual = dy - slope * dx
+    total = dy @ dy
+    r2 = 1.0 - (residual @ residual) / total if total > 0 else np.nan
+    return {'slope': float(slope), 'intercept': float(intercept), 'r2': float(r2),
+            'n': int(len(x)), 'x_min': float(x.min()), 'x_max': float(x.max())}
+
+
+def sample_indices(n, budget, seed=0):
+    """Amostra determinística (ordenada) para gráficos de dispersão"""
+    if n <= budget:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, budget, replace=False))
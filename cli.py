@@ -0,0 +1,155 @@
+"""Processamento em lote sem interface (cron, workers)
+
+Executa get_satellite_data → série temporal → generate_report para cada
+talhão de um GeoJSON/CSV e grava a série (Parquet ou JSON) e o relatório
+(JSON) por talhão, além de um summary.json com o estado de cada um:
+
+    python cli.py process talhoes.geojson --start 2023-01-01 --end 2024-01-01 -o saida/
+
+ee, numpy e pandas só são importados quando um comando é executado, para
+que a inicialização (e --help) leve milissegundos.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
+# Colunas da série (nomes da interface) → nomes esperados por generate_report
+REPORT_COLUMNS = {'Data': 'date', 'ET_diaria': 'ET_DAILY'}
+
+
+def initialize_ee(service_account=None):
+    """Inicializa o GEE com o arquivo de service account ou GCP_SERVICE_ACCOUNT_JSON"""
+    from monitoring import EVETMonitoringSystem, open_cache
+
+    service_account_json = os.environ.get('GCP_SERVICE_ACCOUNT_JSON')
+    if service_account:
+        with open(service_account) as f:
+            service_account_json = f.read()
+    EVETMonitoringSystem().initialize_ee(service_account_json)
+
+
+def write_json(path, data):
+    """Grava JSON de forma atômica (arquivo temporário + rename)"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def process_field(field, system, processor, args):
+    """Série e relatório de um talhão; retorna o número de linhas"""
+    from batch_processor import field_area_km2, field_geometry, safe_field_id
+
+    roi = field_geometry(field)
+    collection = system.get_satellite_data(roi, args.start, args.end, args.cloud_threshold)
+    df = system.extract_time_series(collection, roi, args.start, args.end,
+                                    chunk_days=args.chunk_days,
+                                    cloud_threshold=args.cloud_threshold)
+    df.insert(0, 'field_id', field['field_id'])
+
+    base = os.path.join(args.output, safe_field_id(field['field_id']))
+    if args.format == 'parquet':
+        tmp_path = f'{base}.parquet.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, f'{base}.parquet')
+    else:
+        write_json(f'{base}.json', df.to_dict(orient='records'))
+
+    report = processor.generate_report(df.rename(columns=REPORT_COLUMNS), field_area_km2(field))
+    report['field_id'] = field['field_id']
+    # Configurações de redução usadas (uma por requisição ao GEE)
+    report['reductions'] = df.attrs.get('reductions', [])
+    write_json(f'{base}.report.json', report)
+    return len(df)
+
+
+def process(args):
+    """Comando process: todos os talhões, em paralelo, retomável"""
+    from batch_processor import load_fields, safe_field_id
+    from data_processor import SatelliteDataProcessor
+    from monitoring import EVETMonitoringSystem
+    from instrumentation import NULL_TRACER, Tracer
+    from scene_catalog import SceneCatalog
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("O formato parquet requer pyarrow; instale-o ou use --format json")
+            return 2
+
+    initialize_ee(args.service_account)
+    os.makedirs(args.output, exist_ok=True)
+    fields = load_fields(args.fields)
+    tracer = Tracer() if args.trace else NULL_TRACER
+    system = EVETMonitoringSystem(cache=open_cache() if args.cache else None, tracer=tracer,
+                                  catalog=SceneCatalog() if args.catalog else None)
+    processor = SatelliteDataProcessor(tracer=tracer, initialize=False)
+
+    def is_done(field):
+        report_path = os.path.join(args.output, f"{safe_field_id(field['field_id'])}.report.json")
+        return not args.force and os.path.exists(report_path)
+
+    summary = {field['field_id']: {'status': 'skipped'} for field in fields if is_done(field)}
+    pending = [field for field in fields if not is_done(field)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(process_field, field, system, processor, args): field
+                   for field in pending}
+        for future in as_completed(futures):
+            field_id = futures[future]['field_id']
+            try:
+                summary[field_id] = {'status': 'ok', 'rows': future.result()}
+            except Exception as e:
+                summary[field_id] = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+            print(f"[{len(summary)}/{len(fields)}] {field_id}: {summary[field_id]['status']}")
+
+    write_json(os.path.join(args.output, 'summary.json'), {
+        'start': args.start,
+        'end': args.end,
+        'cloud_threshold': args.cloud_threshold,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'round_trips': tracer.round_trips if args.trace else None,
+        'fields': summary,
+    })
+    errors = sum(entry['status'] == 'error' for entry in summary.values())
+    print(f"Concluído: {len(summary) - errors} talhão(ões) ok, {errors} com erro")
+    return 1 if errors else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    today = date.today()
+    run = commands.add_parser('process', help='série temporal e relatório por talhão')
+    run.add_argument('fields',
+                     help='talhões em GeoJSON (FeatureCollection) ou CSV (field_id, lat, lon)')
+    run.add_argument('--start', default=(today - timedelta(days=90)).isoformat())
+    run.add_argument('--end', default=(today + timedelta(days=1)).isoformat())
+    run.add_argument('-o', '--output', default='output')
+    run.add_argument('--format', choices=('parquet', 'json'), default='parquet')
+    run.add_argument('--cloud-threshold', type=float, default=20)
+    run.add_argument('--chunk-days', type=int, default=None)
+    run.add_argument('--workers', type=int, default=4)
+    run.add_argument('--cache', action='store_true', help='usar o cache em disco das séries')
+    run.add_argument('--catalog', action='store_true',
+                     help='selecionar cenas pelo catálogo (nuvem sobre a ROI)')
+    run.add_argument('--service-account', help='JSON da service account do GEE')
+    run.add_argument('--force', action='store_true', help='reprocessar talhões já gravados')
+    run.add_argument('--trace', action='store_true', help='registrar idas ao GEE no summary.json')
+    run.set_defaults(handler=process)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
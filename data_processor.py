@@ -5,11 +5,282 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 
+from ts_cache import TimeSeriesCache, pipeline_version
+from instrumentation import NULL_TRACER
+from streaming_stats import StreamingStats, iter_chunks
+from reduction_plan import ReductionPlan, is_pixel_error
+
+# Mensagens do GEE que indicam limite de payload, memória ou tempo excedido
+# (limites de concorrência ficam com a nova tentativa com espera, não com a divisão)
+EE_LIMIT_ERRORS = (
+    'payload size',
+    'response size',
+    'too many pixels',
+    'memory limit',
+    'timed out',
+    'accumulating over',
+)
+
+# Nomes comuns das bandas na coleção harmonizada Sentinel-2 + Landsat
+HARMONIZED_BANDS = ['BLUE', 'GREEN', 'RED', 'NIR', 'SWIR1', 'SWIR2']
+S2_HARMONIZED_BANDS = ['B2', 'B3', 'B4', 'B8A', 'B11', 'B12']
+LANDSAT_HARMONIZED_BANDS = ['SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7']
+
+# Ajuste espectral MSI -> OLI do HLS (Claverie et al., 2018): OLI = slope * MSI + offset
+S2_TO_OLI_SLOPES = [0.9778, 1.0053, 0.9765, 0.9983, 0.9987, 1.003]
+S2_TO_OLI_OFFSETS = [-0.004, -0.0009, 0.0009, -0.0001, -0.0011, -0.0012]
+
+# Chave de DataFrame.attrs com as configurações de redução usadas (uma
+# entrada por requisição, não uma coluna repetida em cada linha)
+REDUCTIONS_ATTR = 'reductions'
+
+LANDSAT_COLLECTIONS = {
+    'L8': 'LANDSAT/LC08/C02/T1_L2',
+    'L9': 'LANDSAT/LC09/C02/T1_L2',
+}
+
+
+def is_limit_error(error):
+    """Verifica se o erro do GEE foi causado por limite de payload/tempo"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in EE_LIMIT_ERRORS)
+
+
+def collect_reductions(frames):
+    """Configurações de redução registradas em uma lista de DataFrames"""
+    return [entry for frame in frames for entry in frame.attrs.get(REDUCTIONS_ATTR, [])]
+
+
+def extraction_version(*functions, **params):
+    """Versão do pipeline: funções informadas + extração e redução padrão
+
+    Inclui o código de reduce_collection/extract_time_series_batched e de
+    ReductionPlan e os parâmetros do plano padrão (escala mínima, pixels
+    alvo, tileScale), de modo que mudar a redução também invalida o cache.
+    """
+    plan = ReductionPlan()
+    return pipeline_version(*functions, reduce_collection, extract_time_series_batched,
+                            ReductionPlan, plan=plan.describe(), min_scale=plan.min_scale,
+                            **params)
+
+
+def split_date_range(start_date, end_date, chunk_days):
+    """Divide o período [start_date, end_date) em janelas de chunk_days dias"""
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    windows = []
+    while start < end:
+        window_end = min(start + timedelta(days=chunk_days), end)
+        windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        start = window_end
+    return windows
+
+
+def reduce_collection(collection, roi, bands, scale=None, max_pixels=1e9, properties=None,
+                      tracer=None, plan=None):
+    """Reduz toda a coleção em uma única requisição ao servidor
+
+    A coleção é convertida em uma imagem multibanda (toBands) e reduzida
+    com um único reduceRegion. Cada banda volta como um vetor na ordem
+    das cenas, junto com datas e IDs na mesma requisição, sem um Feature
+    por imagem nem as chaves de toBands no payload.
+
+    properties: {propriedade da imagem: coluna} com metadados por cena
+    (presentes em todas as cenas) lidos na mesma requisição; geometrias
+    (ex.: system:footprint) são gravadas como GeoJSON em texto.
+
+    plan (ReductionPlan) define scale/tileScale/bestEffort; sem plan, a
+    escala é scale ou, se None, escolhida pela área da ROI. Em erro de
+    memória/pixels a redução é repetida no nível seguinte do plano. A
+    configuração usada fica em df.attrs['reductions'].
+    """
+    tracer = tracer or NULL_TRACER
+    properties = properties or {}
+    plan = plan or ReductionPlan(scale=scale, max_pixels=max_pixels)
+    subset = collection.select(list(bands))
+
+    while True:
+        scale = plan.scale_for(roi)
+        means = ee.Dictionary(subset.toBands().reduceRegion(
+            reducer=ee.Reducer.mean(), **plan.reduce_region_args(roi, scale)))
+        index = subset.aggregate_array('system:index')
+        request = {
+            'index': index,
+            'time': subset.aggregate_array('system:time_start'),
+            # Escala efetiva (calculada no servidor quando adaptativa)
+            'scale': scale
+        }
+        # toBands nomeia as bandas como "<system:index>_<banda>"; as chaves
+        # são montadas no servidor e só os valores voltam
+        for i, band in enumerate(bands):
+            request[f'band_{i}'] = means.values(index.map(_band_key(band)))
+        for i, name in enumerate(properties):
+            request[f'property_{i}'] = collection.aggregate_array(name)
+        try:
+            payload = tracer.get_info(ee.Dictionary(request), 'reduce_collection')
+            break
+        except ee.EEException as e:
+            coarser = plan.coarser() if is_pixel_error(e) else None
+            if coarser is None:
+                raise
+            tracer.event('reduction_retry', error=str(e), **coarser.describe())
+            plan = coarser
+
+    scene_ids = np.asarray(payload['index'], dtype=object)
+    times = np.asarray(payload['time'], dtype='int64')
+
+    columns = {
+        'date': pd.to_datetime(times, unit='ms').strftime('%Y-%m-%d'),
+        'scene_id': scene_ids
+    }
+    for i, band in enumerate(bands):
+        columns[band] = np.array(payload[f'band_{i}'], dtype='float64')
+    for i, column in enumerate(properties.values()):
+        columns[column] = [json.dumps(value) if isinstance(value, (dict, list)) else value
+                           for value in payload[f'property_{i}']]
+
+    with tracer.span('build_dataframe', rows=len(scene_ids)):
+        df = pd.DataFrame(columns).dropna(subset=list(bands)).reset_index(drop=True)
+    df.attrs[REDUCTIONS_ATTR] = [plan.describe(payload['scale'])]
+    return df
+
+
+def _band_key(band):
+    """Função (para ee.List.map) que monta a chave toBands de uma banda"""
+    suffix = f'_{band}'
+    return lambda scene_id: ee.String(scene_id).cat(suffix)
+
+
+def extract_time_series_batched(collection, roi, bands, start_date=None, end_date=None,
+                                scale=None, max_pixels=1e9, chunk_days=None, properties=None,
+                                tracer=None, plan=None):
+    """Extrai série temporal em modo batch, com fallback por janelas de datas
+
+    Se chunk_days for informado, o período é dividido em janelas fixas.
+    Quando o GEE recusa a requisição por limite de payload, memória ou
+    tempo, a janela é dividida ao meio até caber nos limites.
+    """
+    empty = pd.DataFrame(columns=['date', 'scene_id'] + list(bands) + list((properties or {}).values()))
+
+    def extract_window(window_start, window_end):
+        window = collection.filterDate(window_start, window_end)
+        try:
+            df = reduce_collection(window, roi, bands, scale, max_pixels,
+                                   properties=properties, tracer=tracer, plan=plan)
+            for entry in df.attrs[REDUCTIONS_ATTR]:
+                entry.update(start=window_start, end=window_end)
+            return [df]
+        except ee.EEException as e:
+            days = (pd.Timestamp(window_end) - pd.Timestamp(window_start)).days
+            if not is_limit_error(e) or days <= 1:
+                raise
+            middle = (pd.Timestamp(window_start) + timedelta(days=days // 2)).strftime('%Y-%m-%d')
+            return extract_window(window_start, middle) + extract_window(middle, window_end)
+
+    if start_date is None or end_date is None:
+        frames = [reduce_collection(collection, roi, bands, scale, max_pixels,
+                                    properties=properties, tracer=tracer, plan=plan)]
+    else:
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        if chunk_days:
+            windows = split_date_range(start_date, end_date, chunk_days)
+        else:
+            windows = [(start_date, end_date)]
+
+        frames = []
+        for window_start, window_end in windows:
+            frames.extend(extract_window(window_start, window_end))
+
+    reductions = collect_reductions(frames)
+    frames = [frame for frame in frames if not frame.empty]
+    df = pd.concat(frames, ignore_index=True) if frames else empty
+    df.attrs[REDUCTIONS_ATTR] = reductions
+    return df
+
+
+def composite_periods(start_date, end_date, period='monthly'):
+    """Períodos regulares [início, fim) de composição: weekly, 10day ou monthly
+
+    'weekly' conta 7 dias a partir de start_date; '10day' usa decêndios do
+    calendário (dias 1-10, 11-20 e 21 ao fim do mês); 'monthly' usa meses
+    do calendário. Os períodos das pontas são cortados ao intervalo.
+    """
+    start = pd.Timestamp(start_date)
+    end = pd.Timestamp(end_date)
+    if period == 'weekly':
+        return split_date_range(start, end, 7)
+    if period == '10day':
+        boundaries = [day for day in pd.date_range(start.replace(day=1), end, freq='D')
+                      if day.day in (1, 11, 21)]
+    elif period == 'monthly':
+        boundaries = list(pd.date_range(start.replace(day=1), end, freq='MS'))
+    else:
+        raise ValueError(f"Período de composição desconhecido: {period}")
+
+    edges = sorted({start, end} | {day for day in boundaries if start < day < end})
+    return [(a.strftime('%Y-%m-%d'), b.strftime('%Y-%m-%d')) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def is_full_period(window_start, window_end, period='monthly'):
+    """Verifica se o período de composite_periods não foi cortado nas pontas"""
+    start = pd.Timestamp(window_start)
+    end = pd.Timestamp(window_end)
+    if period == 'weekly':
+        return (end - start).days == 7
+    natural = composite_periods(start.replace(day=1), end + pd.offsets.MonthBegin(1), period)
+    return (start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) in natural
+
+
+def fill_gaps(df, period_starts, bands, method='linear', harmonics=2, date_column='date'):
+    """Preenche os períodos sem composição (ou com valores mascarados)
+
+    Reindexa a série para todos os períodos e estima os valores ausentes
+    por interpolação linear ou por regressão harmônica (tendência linear +
+    harmonics pares seno/cosseno anuais, mínimos quadrados). A coluna
+    'filled' indica as linhas estimadas.
+    """
+    axis = pd.DataFrame({date_column: list(period_starts)})
+    result = axis.merge(df, on=date_column, how='left')
+    days = (pd.to_datetime(result[date_column]) - pd.Timestamp(period_starts[0])).dt.days.to_numpy(dtype=float)
+    missing = result[list(bands)].isna().any(axis=1).to_numpy()
+
+    for band in bands:
+        values = result[band].to_numpy(dtype=float)
+        valid = np.isfinite(values)
+        if valid.sum() < 2:
+            continue
+        n_params = 2 + 2 * harmonics
+        if method == 'harmonic' and valid.sum() > n_params:
+            omega = 2 * np.pi * days / 365.25
+            design = np.column_stack([np.ones_like(days), days] +
+                                     [f(k * omega) for k in range(1, harmonics + 1) for f in (np.cos, np.sin)])
+            coefficients = np.linalg.lstsq(design[valid], values[valid], rcond=None)[0]
+            estimate = design @ coefficients
+        elif method in ('linear', 'harmonic'):
+            estimate = np.interp(days, days[valid], values[valid])
+        else:
+            raise ValueError(f"Método de preenchimento desconhecido: {method}")
+        result[band] = np.where(valid, values, estimate)
+
+    result['filled'] = missing
+    return result
+
+
 class SatelliteDataProcessor:
     """Classe para processamento avançado de dados de satélite"""
 
-    def __init__(self):
-        self.initialize_earth_engine()
+    def __init__(self, cache=None, tracer=None, catalog=None, initialize=True):
+        # Cache em disco das séries extraídas (TimeSeriesCache); None desativa
+        self.cache = cache
+        # Instrumentação (instrumentation.Tracer); o padrão é no-op
+        self.tracer = tracer or NULL_TRACER
+        # Catálogo de cenas (scene_catalog.SceneCatalog): com ele, as cenas são
+        # escolhidas pela nuvem sobre a ROI e carregadas por ID
+        self.catalog = catalog
+        # initialize=False quando o GEE já foi inicializado (ex.: service account)
+        if initialize:
+            self.initialize_earth_engine()
 
     def initialize_earth_engine(self):
         """Inicializa o Google Earth Engine com autenticação"""
@@ -21,12 +292,16 @@ class SatelliteDataProcessor:
         except Exception as e:
             print(f"Erro ao inicializar GEE: {e}")
 
-    def get_landsat_data(self, roi, start_date, end_date):
+    def get_landsat_data(self, roi, start_date, end_date, cloud_threshold=20):
         """Obtém dados do Landsat 8/9"""
-        collection = (ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-                     .filterBounds(roi)
-                     .filterDate(start_date, end_date)
-                     .filter(ee.Filter.lt('CLOUD_COVER', 20)))
+        if self.catalog is not None:
+            collection = self.catalog.clear_collection(roi, start_date, end_date, cloud_threshold,
+                                                       LANDSAT_COLLECTIONS['L8'], tracer=self.tracer)
+        else:
+            collection = (ee.ImageCollection(LANDSAT_COLLECTIONS['L8'])
+                         .filterBounds(roi)
+                         .filterDate(start_date, end_date)
+                         .filter(ee.Filter.lt('CLOUD_COVER', cloud_threshold)))
 
         def process_landsat(image):
             # Aplicar fatores de escala
@@ -39,16 +314,23 @@ class SatelliteDataProcessor:
             # Calcular NDVI (NIR = B5, Red = B4)
             ndvi = optical_bands.normalizedDifference(['SR_B5', 'SR_B4']).rename('NDVI')
 
-            return optical_bands.addBands([thermal_bands, ndwi, ndvi])
+            # A álgebra de imagens descarta as propriedades: data e nuvens vêm da cena
+            return ee.Image(optical_bands.addBands([thermal_bands, ndwi, ndvi])
+                            .copyProperties(image, ['system:time_start', 'CLOUD_COVER']))
 
         return collection.map(process_landsat)
 
-    def get_sentinel2_data(self, roi, start_date, end_date):
+    def get_sentinel2_data(self, roi, start_date, end_date, cloud_threshold=20):
         """Obtém dados do Sentinel-2"""
-        collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                     .filterBounds(roi)
-                     .filterDate(start_date, end_date)
-                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)))
+        if self.catalog is not None:
+            collection = self.catalog.clear_collection(roi, start_date, end_date, cloud_threshold,
+                                                       'COPERNICUS/S2_SR_HARMONIZED',
+                                                       tracer=self.tracer)
+        else:
+            collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+                         .filterBounds(roi)
+                         .filterDate(start_date, end_date)
+                         .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_threshold)))
 
         def process_sentinel2(image):
             # Máscara de nuvens usando QA60
@@ -67,10 +349,62 @@ class SatelliteDataProcessor:
             # Calcular NDMI (NIR = B8, SWIR = B11)
             ndmi = masked.normalizedDifference(['B8', 'B11']).rename('NDMI')
 
-            return masked.addBands([ndwi, ndvi, ndmi])
+            # A álgebra de imagens descarta as propriedades: data e nuvens vêm da cena
+            return ee.Image(masked.addBands([ndwi, ndvi, ndmi])
+                            .copyProperties(image, ['system:time_start', 'CLOUDY_PIXEL_PERCENTAGE']))
 
         return collection.map(process_sentinel2)
 
+    def get_harmonized_data(self, roi, start_date, end_date, cloud_threshold=20):
+        """Obtém Sentinel-2 + Landsat 8/9 harmonizados em uma única coleção
+
+        As bandas recebem nomes comuns (HARMONIZED_BANDS) e a reflectância
+        do Sentinel-2 é ajustada à do OLI antes do cálculo de NDWI/NDVI/NDMI.
+        Cada imagem leva a propriedade SENSOR (S2, L8 ou L9).
+        """
+        def add_indices(image, source, sensor):
+            ndwi = image.normalizedDifference(['GREEN', 'NIR']).rename('NDWI')
+            ndvi = image.normalizedDifference(['NIR', 'RED']).rename('NDVI')
+            ndmi = image.normalizedDifference(['NIR', 'SWIR1']).rename('NDMI')
+            harmonized = image.addBands([ndwi, ndvi, ndmi])
+            return ee.Image(harmonized.copyProperties(source, ['system:time_start'])).set('SENSOR', sensor)
+
+        def harmonize_sentinel2(image):
+            qa = image.select('QA60')
+            cloud_mask = qa.bitwiseAnd(1024).eq(0).And(qa.bitwiseAnd(2048).eq(0))
+
+            # NIR estreito (B8A), mais próximo da banda 5 do OLI que a B8
+            reflectance = (image.select(S2_HARMONIZED_BANDS, HARMONIZED_BANDS)
+                           .multiply(0.0001)
+                           .multiply(ee.Image.constant(S2_TO_OLI_SLOPES))
+                           .add(ee.Image.constant(S2_TO_OLI_OFFSETS))
+                           .updateMask(cloud_mask))
+            return add_indices(reflectance, image, 'S2')
+
+        def harmonize_landsat(image, sensor):
+            # QA_PIXEL: bits 1 (nuvem dilatada), 3 (nuvem) e 4 (sombra)
+            cloud_mask = image.select('QA_PIXEL').bitwiseAnd(0b11010).eq(0)
+            reflectance = (image.select(LANDSAT_HARMONIZED_BANDS, HARMONIZED_BANDS)
+                           .multiply(0.0000275).add(-0.2)
+                           .updateMask(cloud_mask))
+            return add_indices(reflectance, image, sensor)
+
+        collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+                     .filterBounds(roi)
+                     .filterDate(start_date, end_date)
+                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_threshold))
+                     .map(harmonize_sentinel2))
+
+        for sensor, collection_id in LANDSAT_COLLECTIONS.items():
+            landsat = (ee.ImageCollection(collection_id)
+                      .filterBounds(roi)
+                      .filterDate(start_date, end_date)
+                      .filter(ee.Filter.lt('CLOUD_COVER', cloud_threshold))
+                      .map(lambda image, sensor=sensor: harmonize_landsat(image, sensor)))
+            collection = collection.merge(landsat)
+
+        return collection.sort('system:time_start')
+
     def calculate_evapotranspiration_sebal(self, image, roi):
         """Implementa modelo SEBAL simplificado para ET"""
 
@@ -106,10 +440,10 @@ class SatelliteDataProcessor:
 
         # Fluxo de calor sensível (H) - método simplificado
         # dT = diferença de temperatura
+        # Percentil por amostragem: bestEffort evita falha em ROIs grandes
         dt = lst.subtract(lst.reduceRegion(
             reducer=ee.Reducer.percentile([10]),
-            geometry=roi,
-            scale=30
+            **ReductionPlan(min_scale=30, best_effort=True).reduce_region_args(roi)
         ).values().get(0))
 
         # Resistência aerodinâmica (simplificada)
@@ -130,71 +464,226 @@ class SatelliteDataProcessor:
 
         return image.addBands([albedo, rn, g, h, et_inst, et_daily])
 
-    def export_time_series(self, collection, roi, start_date, end_date):
-        """Exporta série temporal para análise"""
+    def formula_version(self):
+        """Versão das fórmulas, máscaras de nuvem e redução usada para invalidar o cache"""
+        return extraction_version(self.get_sentinel2_data,
+                                  self.get_landsat_data,
+                                  self.get_harmonized_data,
+                                  self.calculate_evapotranspiration_sebal)
+
+    def time_series_cache_key(self, roi, sensor, bands=('NDWI', 'NDVI', 'ET_DAILY'),
+                              cloud_threshold=20):
+        """Chave do cache para a série de uma ROI/sensor"""
+        if self.catalog is not None:
+            # Com o catálogo o limite de nuvens vale para a ROI: outra seleção de cenas
+            sensor = f'{sensor}+catalog'
+        return self.cache.make_key(roi, sensor, cloud_threshold,
+                                   self.formula_version(), list(bands))
+
+    def composite_collection(self, collection, start_date, end_date, period='monthly',
+                             method='median', bands=None, quality_band='NDVI'):
+        """Composições temporais regulares calculadas no servidor
+
+        Cada período (composite_periods) vira uma imagem: mediana das cenas
+        ou qualityMosaic (pixel de maior quality_band). As imagens recebem
+        system:index/system:time_start do início do período e n_scenes;
+        períodos sem cenas são descartados.
+        """
+        if bands is not None:
+            selected = list(bands)
+            # qualityMosaic precisa da banda de qualidade mesmo fora das bandas pedidas
+            if method == 'quality' and quality_band not in selected:
+                selected.append(quality_band)
+            collection = collection.select(selected)
+
+        images = []
+        for window_start, window_end in composite_periods(start_date, end_date, period):
+            window = collection.filterDate(window_start, window_end)
+            if method == 'median':
+                composite = window.median()
+            elif method == 'quality':
+                composite = window.qualityMosaic(quality_band)
+            else:
+                raise ValueError(f"Método de composição desconhecido: {method}")
+            images.append(composite.set({
+                'system:index': window_start,
+                'system:time_start': ee.Date(window_start).millis(),
+                'n_scenes': window.size()
+            }))
+
+        return ee.ImageCollection.fromImages(images).filter(ee.Filter.gt('n_scenes', 0))
+
+    def export_time_series(self, collection, roi, start_date, end_date,
+                           bands=('NDWI', 'NDVI', 'ET_DAILY'), batched=True, chunk_days=None,
+                           cache_key=None, composite=None, composite_method='median',
+                           gap_fill=None, properties=None):
+        """Exporta série temporal para análise
+
+        Com cache configurado e cache_key informada, apenas as datas ainda
+        não armazenadas em disco são consultadas no GEE.
+
+        composite ('weekly', '10day' ou 'monthly') reduz composições do
+        período em vez das cenas (uma linha por período, com n_scenes);
+        gap_fill ('linear' ou 'harmonic') preenche os períodos vazios.
+        Nesse modo o cache guarda só os períodos inteiros (os das pontas,
+        cortados ao intervalo, são sempre consultados) e cada janela
+        ausente é ampliada até o início do seu período, para que uma
+        composição nunca seja gravada a partir de parte das cenas.
+
+        properties: {propriedade da imagem: coluna} lidas junto com as
+        bandas no modo batch (ex.: {'SENSOR': 'sensor'}).
+        """
+
+        if composite:
+            start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+            end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+            periods = composite_periods(start_date, end_date, composite)
+
+            def fetch_composites(window_start, window_end):
+                # Composições cujo período toca a janela, sempre com o período inteiro
+                first = max([a for a, _ in periods if a <= window_start] or [window_start])
+                return extract_time_series_batched(composites, roi, list(bands),
+                                                   start_date=first, end_date=window_end,
+                                                   chunk_days=chunk_days,
+                                                   properties={'n_scenes': 'n_scenes'},
+                                                   tracer=self.tracer)
+
+            with self.tracer.span('export_time_series', composite=composite):
+                composites = self.composite_collection(collection, start_date, end_date,
+                                                       composite, composite_method, bands)
+                full = [period for period in periods if is_full_period(*period, composite)]
+                if self.cache is not None and cache_key is not None and full:
+                    # Períodos semanais contam a partir de start_date
+                    anchor = f':{start_date}' if composite == 'weekly' else ''
+                    key = f'{cache_key}:{composite}:{composite_method}{anchor}'
+                    frames = []
+                    if start_date < full[0][0]:
+                        frames.append(fetch_composites(start_date, full[0][0]))
+                    frames.append(self.cache.get_or_fetch(key, full[0][0], full[-1][1],
+                                                          fetch_composites,
+                                                          formula_version=self.formula_version()))
+                    if full[-1][1] < end_date:
+                        frames.append(fetch_composites(full[-1][1], end_date))
+                    reductions = collect_reductions(frames)
+                    df = pd.concat([frame for frame in frames if not frame.empty] or frames[:1],
+                                   ignore_index=True)
+                    df.attrs[REDUCTIONS_ATTR] = reductions
+                else:
+                    df = fetch_composites(start_date, end_date)
+                if gap_fill:
+                    df = fill_gaps(df.drop(columns='scene_id'), [a for a, _ in periods],
+                                   list(bands), gap_fill)
+                return df
+
+        if batched:
+            def fetch(window_start, window_end):
+                return extract_time_series_batched(collection, roi, list(bands),
+                                                   start_date=window_start,
+                                                   end_date=window_end,
+                                                   chunk_days=chunk_days,
+                                                   properties=properties,
+                                                   tracer=self.tracer)
+
+            with self.tracer.span('export_time_series', batched=True):
+                if self.cache is not None and cache_key is not None:
+                    return self.cache.get_or_fetch(cache_key, start_date, end_date, fetch,
+                                                   formula_version=self.formula_version())
+                return fetch(start_date, end_date)
+
+        plan = ReductionPlan()
+        scale = plan.scale_for(roi)
 
         def extract_values(image):
             # Reduzir região para obter valores médios
-            stats = image.select(['NDWI', 'NDVI', 'ET_DAILY']).reduceRegion(
+            stats = image.select(list(bands)).reduceRegion(
                 reducer=ee.Reducer.mean(),
-                geometry=roi,
-                scale=30,
-                maxPixels=1e9
+                **plan.reduce_region_args(roi, scale)
             )
 
-            # Adicionar data
+            # Adicionar data e escala usada
             date = image.date().format('YYYY-MM-dd')
-            return ee.Feature(None, stats.set('date', date))
+            return ee.Feature(None, stats.set('date', date).set('scale', scale))
 
         # Mapear sobre a coleção
         time_series = collection.map(extract_values)
 
         # Converter para lista
-        ts_list = time_series.getInfo()
+        ts_list = self.tracer.get_info(time_series, 'export_time_series')
 
         # Converter para DataFrame
-        data = []
-        for feature in ts_list['features']:
-            props = feature['properties']
-            if all(key in props for key in ['date', 'NDWI', 'NDVI']):
-                data.append(props)
-
-        return pd.DataFrame(data)
+        with self.tracer.span('build_dataframe', rows=len(ts_list['features'])):
+            data = []
+            for feature in ts_list['features']:
+                props = feature['properties']
+                if all(key in props for key in ['date', 'NDWI', 'NDVI']):
+                    data.append(props)
+
+            return pd.DataFrame(data)
+
+    def export_harmonized_time_series(self, roi, start_date, end_date,
+                                      bands=('NDWI', 'NDVI', 'NDMI'), cloud_threshold=20,
+                                      chunk_days=None):
+        """Série única Sentinel-2 + Landsat em uma só extração, com coluna sensor"""
+        collection = self.get_harmonized_data(roi, start_date, end_date, cloud_threshold)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.time_series_cache_key(roi, 'harmonized', bands, cloud_threshold)
+        return self.export_time_series(collection, roi, start_date, end_date, bands=bands,
+                                       chunk_days=chunk_days, cache_key=cache_key,
+                                       properties={'SENSOR': 'sensor'})
 
     def generate_report(self, df, roi_area_km2):
-        """Gera relatório automatizado"""
+        """Gera relatório automatizado
+
+        df pode ser um DataFrame ou um iterável de DataFrames (blocos, ex.:
+        consultas por talhão); as estatísticas saem de uma única passada.
+        """
+        columns = None
+        stats = None
+        first_date = last_date = None
+        for chunk in iter_chunks(df) if isinstance(df, pd.DataFrame) else df:
+            if columns is None:
+                columns = [c for c in ('NDWI', 'NDVI', 'ET_DAILY') if c in chunk.columns]
+                stats = StreamingStats(columns)
+            stats.update(chunk)
+            if len(chunk):
+                dates = chunk['date']
+                first_date = min(first_date, dates.min()) if first_date is not None else dates.min()
+                last_date = max(last_date, dates.max()) if last_date is not None else dates.max()
+        stats = stats or StreamingStats(['NDWI', 'NDVI'])
+        mean, minimum, maximum, std = stats.mean(), stats.min(), stats.max(), stats.std()
 
         report = {
             "data_analise": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             "area_estudo_km2": roi_area_km2,
             "periodo_analise": {
-                "inicio": df['date'].min(),
-                "fim": df['date'].max(),
-                "total_dias": len(df)
+                "inicio": first_date,
+                "fim": last_date,
+                "total_dias": stats.rows
             },
             "estatisticas": {
                 "ndwi": {
-                    "media": float(df['NDWI'].mean()),
-                    "minimo": float(df['NDWI'].min()),
-                    "maximo": float(df['NDWI'].max()),
-                    "desvio_padrao": float(df['NDWI'].std())
+                    "media": float(mean['NDWI']),
+                    "minimo": float(minimum['NDWI']),
+                    "maximo": float(maximum['NDWI']),
+                    "desvio_padrao": float(std['NDWI'])
                 },
                 "ndvi": {
-                    "media": float(df['NDVI'].mean()),
-                    "minimo": float(df['NDVI'].min()),
-                    "maximo": float(df['NDVI'].max()),
-                    "desvio_padrao": float(df['NDVI'].std())
+                    "media": float(mean['NDVI']),
+                    "minimo": float(minimum['NDVI']),
+                    "maximo": float(maximum['NDVI']),
+                    "desvio_padrao": float(std['NDVI'])
                 }
             }
         }
 
         # Adicionar ET se disponível
-        if 'ET_DAILY' in df.columns:
+        if 'ET_DAILY' in stats.columns:
             report["estatisticas"]["evapotranspiracao"] = {
-                "media_mm_dia": float(df['ET_DAILY'].mean()),
-                "total_mm_periodo": float(df['ET_DAILY'].sum()),
-                "minimo": float(df['ET_DAILY'].min()),
-                "maximo": float(df['ET_DAILY'].max())
+                "media_mm_dia": float(mean['ET_DAILY']),
+                "total_mm_periodo": float(stats.sum()['ET_DAILY']),
+                "minimo": float(minimum['ET_DAILY']),
+                "maximo": float(maximum['ET_DAILY'])
             }
 
         return report
@@ -202,7 +691,7 @@ class SatelliteDataProcessor:
 # Exemplo de uso
 if __name__ == "__main__":
     # Inicializar processador
-    processor = SatelliteDataProcessor()
+    processor = SatelliteDataProcessor(cache=TimeSeriesCache())
 
     # Definir área de interesse (exemplo: Kennedy, Bahia)
     roi = ee.Geometry.Rectangle([-40.2, -11.1, -40.1, -11.0])
@@ -215,7 +704,10 @@ if __name__ == "__main__":
     s2_collection = processor.get_sentinel2_data(roi, start_date, end_date)
 
     # Exportar série temporal
-    df = processor.export_time_series(s2_collection, roi, start_date, end_date)
+    bands = ('NDWI', 'NDVI', 'NDMI')
+    cache_key = processor.time_series_cache_key(roi, 'S2_SR_HARMONIZED', bands)
+    df = processor.export_time_series(s2_collection, roi, start_date, end_date,
+                                      bands=bands, cache_key=cache_key)
 
     # Gerar relatório
     report = processor.generate_report(df, 100)  # 100 km²
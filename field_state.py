@@ -0,0 +1,55 @@
+import json
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+from ts_cache import load_frame, save_frame
+
+DEFAULT_STATE_DIR = os.path.join('data', 'fields')
+
+
+class FieldStateStore:
+    """Estado de processamento dos talhões monitorados
+
+    Para cada talhão guarda o último system:time_start processado, o
+    conjunto de system:index já reduzidos e as linhas da série acumulada.
+    """
+
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = state_dir
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def load(self, field_id):
+        """Retorna (estado, DataFrame) do talhão; estado vazio se inexistente"""
+        state_path, rows_path = self._paths(field_id)
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return {'field_id': field_id, 'last_time_start': None, 'scene_ids': []}, pd.DataFrame()
+
+        df = load_frame(rows_path)[0] if os.path.exists(rows_path) else pd.DataFrame()
+        return state, df
+
+    def save(self, field_id, state, df):
+        """Grava estado e linhas do talhão (linhas antes do estado)"""
+        state_path, rows_path = self._paths(field_id)
+        save_frame(rows_path, df)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def reset(self, field_id):
+        """Apaga o estado do talhão, forçando reprocessamento completo"""
+        for path in self._paths(field_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _paths(self, field_id):
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(field_id))
+        base = os.path.join(self.state_dir, safe_id)
+        return f'{base}.json', f'{base}.npz'
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Span:
+    """Trecho medido do pipeline (etapa local ou ida ao servidor)"""
+
+    __slots__ = ('name', 'category', 'start', 'duration', 'thread', 'depth', 'attrs')
+
+    def __init__(self, name, category, start, thread, depth, attrs):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = None
+        self.thread = thread
+        self.depth = depth
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {'name': self.name, 'category': self.category, 'start_s': self.start,
+                'duration_s': self.duration, 'thread': self.thread, 'depth': self.depth,
+                **self.attrs}
+
+
+class _NullSpan:
+    """Span do modo desativado: não mede nada"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Instrumentação do pipeline: tempos por etapa e contabilidade do GEE
+
+    span() mede etapas locais; get_info() envolve cada getInfo() e registra
+    a ida ao servidor e o tamanho do payload. Com enabled=False todas as
+    chamadas são no-op (sem medição nem serialização do payload).
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.round_trips = 0
+            self.payload_bytes = 0
+            self._origin = time.perf_counter()
+
+    def span(self, name, category='stage', **attrs):
+        """Context manager que mede um trecho: with tracer.span('nome') as s"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, category, attrs)
+
+    def event(self, name, category='event', **attrs):
+        """Registra um acontecimento pontual (span de duração zero)"""
+        if self.enabled:
+            with self._span(name, category, attrs):
+                pass
+
+    @contextmanager
+    def _span(self, name, category, attrs):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, category, time.perf_counter() - self._origin,
+                    threading.get_ident(), len(stack), attrs)
+        stack.append(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=f'{type(e).__name__}: {e}')
+            raise
+        finally:
+            stack.pop()
+            span.duration = time.perf_counter() - self._origin - span.start
+            with self._lock:
+                self.spans.append(span)
+
+    def get_info(self, obj, name='getInfo'):
+        """Executa obj.getInfo() registrando a ida ao servidor"""
+        if not self.enabled:
+            return obj.getInfo()
+        with self.span(name, category='ee') as span:
+            result = obj.getInfo()
+            size = len(json.dumps(result, default=str))
+            span.set(payload_bytes=size)
+            with self._lock:
+                self.round_trips += 1
+                self.payload_bytes += size
+        return result
+
+    def summary(self):
+        """Totais por etapa: chamadas, tempo total/máximo e payload"""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            entry = totals.setdefault(span.name, {'name': span.name, 'category': span.category,
+                                                  'calls': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                                  'payload_bytes': 0})
+            entry['calls'] += 1
+            entry['total_s'] += span.duration
+            entry['max_s'] = max(entry['max_s'], span.duration)
+            entry['payload_bytes'] += span.attrs.get('payload_bytes', 0)
+        return sorted(totals.values(), key=lambda entry: entry['total_s'], reverse=True)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {'round_trips': self.round_trips, 'payload_bytes': self.payload_bytes,
+                'summary': self.summary(), 'spans': [span.as_dict() for span in spans]}
+
+    def to_chrome_trace(self):
+        """Eventos no formato Chrome Trace (chrome://tracing, Perfetto)"""
+        with self._lock:
+            spans = list(self.spans)
+        events = [{'name': span.name, 'cat': span.category, 'ph': 'X',
+                   'ts': round(span.start * 1e6), 'dur': round(span.duration * 1e6),
+                   'pid': os.getpid(), 'tid': span.thread, 'args': span.attrs}
+                  for span in spans]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, format='json'):
+        """Grava o trace em JSON ('json') ou Chrome Trace ('chrome')"""
+        data = self.to_chrome_trace() if format == 'chrome' else self.to_dict()
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+
+
+# Tracer desativado usado quando nenhum é configurado
+NULL_TRACER = Tracer(enabled=False)
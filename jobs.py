@@ -0,0 +1,150 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+def job_key(*args, **kwargs):
+    """Chave de deduplicação a partir dos parâmetros da requisição"""
+    payload = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+class Job:
+    """Estado de um job em segundo plano, atualizado pelo worker
+
+    A interface consulta status, progress, message e partial_result()
+    enquanto o job roda; result fica disponível quando status == DONE.
+    """
+
+    def __init__(self, job_id, key):
+        self.id = job_id
+        self.key = key
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Instrumentação opcional definida pela função do job
+        self.tracer = None
+        # Future do worker, para aguardar a conclusão (ex.: asyncio.wrap_future)
+        self.future = None
+        self._partials = []
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, ERROR)
+
+    def report(self, progress, message=None, partial=None):
+        """Chamado pelo worker: progresso (0-1), mensagem e resultado parcial"""
+        with self._lock:
+            self.progress = min(max(float(progress), 0.0), 1.0)
+            if message is not None:
+                self.message = message
+            if partial is not None:
+                self._partials.append(partial)
+
+    def partial_result(self):
+        """Resultados parciais recebidos até agora (DataFrames concatenados)"""
+        with self._lock:
+            frames = [frame for frame in self._partials if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def _finish(self, status, result=None, error=None):
+        with self._lock:
+            self.result = result
+            self.error = error
+            self.progress = 1.0 if status == DONE else self.progress
+            self.finished_at = time.time()
+            self.status = status
+
+
+class JobManager:
+    """Pool de workers para processamento em segundo plano
+
+    Requisições idênticas (mesma chave) enquanto um job está ativo, ou
+    concluído há menos de result_ttl segundos, reutilizam o mesmo job.
+    Jobs com erro não são reaproveitados.
+    """
+
+    def __init__(self, max_workers=4, result_ttl=3600):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, key=None, **kwargs):
+        """Agenda function(job, *args, **kwargs) e retorna o ID do job"""
+        key = key or job_key(function.__qualname__, *args, **kwargs)
+        with self._lock:
+            self._purge()
+            existing = self._jobs.get(self._by_key.get(key))
+            if existing is not None and existing.status != ERROR:
+                return existing.id
+
+            job = Job(uuid.uuid4().hex[:12], key)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            job.future = self._executor.submit(self._run, job, function, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """Job pelo ID (None se desconhecido ou expirado)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def clear(self, job_ids):
+        """Deixa de reaproveitar os jobs concluídos de job_ids (os ativos continuam)
+
+        Os jobs saem só da deduplicação: a próxima requisição igual roda de
+        novo, e quem ainda consulta o mesmo ID (outra sessão que recebeu o
+        job deduplicado) continua a vê-lo até expirar.
+        """
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and job.finished and self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, function, args, kwargs):
+        job.status = RUNNING
+        try:
+            result = function(job, *args, **kwargs)
+        except Exception as e:
+            job._finish(ERROR, error=f'{type(e).__name__}: {e}')
+        else:
+            job._finish(DONE, result=result)
+
+    def _purge(self):
+        now = time.time()
+        expired = [job.id for job in self._jobs.values()
+                   if job.finished and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            self._remove(job_id)
+
+    def _remove(self, job_id):
+        job = self._jobs.pop(job_id)
+        if self._by_key.get(job.key) == job_id:
+            del self._by_key[job.key]
@@ -0,0 +1,335 @@
+import numpy as np
+
+# Constantes das fórmulas usadas no caminho Earth Engine
+S2_SCALE = 0.0001                 # Reflectância Sentinel-2 SR
+QA60_CLOUD_BIT = 1 << 10          # Nuvens opacas
+QA60_CIRRUS_BIT = 1 << 11         # Cirrus
+ET_VEG_SLOPE, ET_VEG_OFFSET = 1.2, 0.1
+ET_WATER_SLOPE, ET_WATER_OFFSET = 0.8, 1.0
+ET_BASE_MM = 3.5
+
+S2_BANDS = ('B3', 'B4', 'B8', 'B11', 'QA60')
+S2_OUTPUTS = ('NDWI', 'NDVI', 'NDMI', 'ET_daily', 'VEG_FACTOR', 'WATER_FACTOR')
+
+# Fatores de escala Landsat Collection 2 Level-2
+LANDSAT_OPTICAL_SCALE, LANDSAT_OPTICAL_OFFSET = 0.0000275, -0.2
+LANDSAT_THERMAL_SCALE, LANDSAT_THERMAL_OFFSET = 0.00341802, 149.0
+
+# Constantes do SEBAL simplificado (calculate_evapotranspiration_sebal)
+SEBAL_ALBEDO_COEFFICIENTS = (('SR_B2', 0.356), ('SR_B3', 0.130), ('SR_B4', 0.373),
+                             ('SR_B5', 0.085), ('SR_B6', 0.072), ('SR_B7', -0.0018))
+SEBAL_ALBEDO_OFFSET = -0.0016
+SEBAL_RS_IN = 25.0          # MJ/m²/dia
+SEBAL_RL_FACTOR = 0.01
+SEBAL_G_COEFFICIENTS = (0.0038, 0.0074, -0.0018, 0.0026)
+SEBAL_RHO_CP = 1200.0       # J/m³/K
+SEBAL_RAH = 50.0            # s/m
+SEBAL_LAMBDA = 2.45         # MJ/kg
+SEBAL_ACTIVE_HOURS = 8
+SEBAL_COLD_PERCENTILE = 10
+
+LANDSAT_SEBAL_BANDS = tuple(name for name, _ in SEBAL_ALBEDO_COEFFICIENTS) + ('ST_B10',)
+SEBAL_OUTPUTS = ('ALBEDO', 'RN', 'G', 'H', 'ET_INST', 'ET_DAILY')
+
+
+def partition_percentile(values, q):
+    """Percentil (interpolação linear) de um vetor via np.partition, sem ordenar"""
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.nan
+    position = q / 100 * (values.size - 1)
+    low, high = int(np.floor(position)), int(np.ceil(position))
+    partitioned = np.partition(values, (low, high))
+    return partitioned[low] + (partitioned[high] - partitioned[low]) * (position - low)
+
+
+def read_band(path, mmap=True):
+    """Lê uma banda local (.npy com memmap, ou GeoTIFF via rasterio)"""
+    if path.lower().endswith('.npy'):
+        return np.load(path, mmap_mode='r' if mmap else None)
+
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("rasterio é necessário para ler GeoTIFF: pip install rasterio")
+    with rasterio.open(path) as src:
+        return src.read(1)
+
+
+class NumpyBackend:
+    """Backend local: mesmas fórmulas do caminho ee.Image, em NumPy vetorizado
+
+    Pixels mascarados (nuvem, QA60) ou inválidos ficam como NaN, o
+    equivalente à máscara do Earth Engine. As entradas são arrays 2-D por
+    banda com os valores digitais originais (sem escala).
+    """
+
+    name = 'numpy'
+
+    def __init__(self, dtype=np.float32, chunk_rows=1024):
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+
+    def cloud_mask(self, qa60, out=None):
+        """Máscara QA60: True onde não há nuvem nem cirrus"""
+        return np.equal(np.bitwise_and(qa60, QA60_CLOUD_BIT | QA60_CIRRUS_BIT), 0, out=out)
+
+    def normalized_difference(self, first, second, out=None, denominator=None):
+        """(first - second) / (first + second), como ee.Image.normalizedDifference
+
+        Assim como no GEE, valores negativos em qualquer entrada mascaram o
+        pixel; divisão por zero também resulta em NaN.
+        """
+        first = np.asarray(first, dtype=self.dtype)
+        second = np.asarray(second, dtype=self.dtype)
+        if out is None:
+            out = np.empty(np.broadcast(first, second).shape, dtype=self.dtype)
+
+        denominator = np.add(first, second, out=denominator)
+        np.subtract(first, second, out=out)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(out, denominator, out=out)
+        out[(first < 0) | (second < 0) | (denominator == 0)] = np.nan
+        return out
+
+    def estimate_evapotranspiration(self, ndwi, ndvi, out=None):
+        """ET diária simplificada (mm/dia) a partir de NDWI e NDVI"""
+        if out is None:
+            out = {name: np.empty(np.shape(ndvi), dtype=self.dtype)
+                   for name in ('ET_daily', 'VEG_FACTOR', 'WATER_FACTOR')}
+
+        vegetation_factor = out['VEG_FACTOR']
+        water_factor = out['WATER_FACTOR']
+        np.multiply(ndvi, ET_VEG_SLOPE, out=vegetation_factor)
+        vegetation_factor += ET_VEG_OFFSET
+        np.multiply(ndwi, ET_WATER_SLOPE, out=water_factor)
+        water_factor += ET_WATER_OFFSET
+
+        np.multiply(vegetation_factor, water_factor, out=out['ET_daily'])
+        out['ET_daily'] *= ET_BASE_MM
+        return out
+
+    def allocate_scratch(self, shape):
+        """Buffers intermediários reutilizáveis para process_sentinel2"""
+        scratch = {name: np.empty(shape, dtype=self.dtype)
+                   for name in ('B3', 'B4', 'B8', 'B11', 'denominator')}
+        scratch['clear'] = np.empty(shape, dtype=bool)
+        return scratch
+
+    def process_sentinel2(self, bands, out=None, scratch=None):
+        """Máscara de nuvens, escala 0.0001, NDWI/NDVI/NDMI e ET de uma cena
+
+        As diferenças normalizadas não dependem da escala: NDWI/NDVI e a ET
+        são os mesmos de get_sentinel2_data (escala + normalizedDifference)
+        e de EVETMonitoringSystem.process_image (subtract/divide sobre os
+        valores digitais). A exceção são pixels com soma zero, NaN aqui e
+        0 em ee.Image.divide.
+
+        bands: dict com B3, B4, B8, B11 e QA60 (arrays de mesmo formato).
+        out/scratch: buffers pré-alocados (opcionais) para evitar alocações.
+        """
+        shape = np.shape(bands['B3'])
+        if out is None:
+            out = {name: np.empty(shape, dtype=self.dtype) for name in S2_OUTPUTS}
+        if scratch is None:
+            scratch = self.allocate_scratch(shape)
+
+        clear = self.cloud_mask(bands['QA60'], out=scratch['clear'])
+        green, red, nir, swir = (np.multiply(bands[name], S2_SCALE, out=scratch[name])
+                                 for name in ('B3', 'B4', 'B8', 'B11'))
+
+        denominator = scratch['denominator']
+        self.normalized_difference(green, nir, out=out['NDWI'], denominator=denominator)
+        self.normalized_difference(nir, red, out=out['NDVI'], denominator=denominator)
+        self.normalized_difference(nir, swir, out=out['NDMI'], denominator=denominator)
+        for name in ('NDWI', 'NDVI', 'NDMI'):
+            out[name][~clear] = np.nan
+
+        self.estimate_evapotranspiration(out['NDWI'], out['NDVI'], out=out)
+        return out
+
+    def process_sentinel2_chunked(self, bands, out=None):
+        """Processa a cena em blocos de chunk_rows linhas (memória limitada)
+
+        As entradas podem ser memmaps; apenas um bloco por vez é lido.
+        """
+        shape = np.shape(bands['B3'])
+        if out is None:
+            out = {name: np.empty(shape, dtype=self.dtype) for name in S2_OUTPUTS}
+
+        scratch = self.allocate_scratch((min(self.chunk_rows, shape[0]),) + tuple(shape[1:]))
+        for row in range(0, shape[0], self.chunk_rows):
+            block = slice(row, min(row + self.chunk_rows, shape[0]))
+            rows = block.stop - block.start
+            self.process_sentinel2({name: bands[name][block] for name in S2_BANDS},
+                                   out={name: out[name][block] for name in S2_OUTPUTS},
+                                   scratch={name: buffer[:rows] for name, buffer in scratch.items()})
+        return out
+
+    def scale_landsat(self, bands):
+        """Aplica os fatores de escala Landsat C2 L2 (como get_landsat_data)"""
+        scaled = {}
+        for name in LANDSAT_SEBAL_BANDS:
+            values = np.asarray(bands[name], dtype=self.dtype)
+            if name.startswith('ST_'):
+                scaled[name] = values * LANDSAT_THERMAL_SCALE + LANDSAT_THERMAL_OFFSET
+            else:
+                scaled[name] = values * LANDSAT_OPTICAL_SCALE + LANDSAT_OPTICAL_OFFSET
+        return scaled
+
+    def lst_percentile(self, lst, roi_mask=None, q=SEBAL_COLD_PERCENTILE):
+        """Percentil de LST na ROI, por cena (np.partition, sem ordenação completa)
+
+        lst: array 2-D (uma cena) ou 3-D (cenas, linhas, colunas).
+        Retorna escalar para 2-D ou um array (cenas,) para 3-D.
+        """
+        lst = np.asarray(lst)
+        stack = lst.reshape(-1, lst.shape[-2] * lst.shape[-1])
+        if roi_mask is not None:
+            stack = stack[:, np.asarray(roi_mask, dtype=bool).ravel()]
+
+        valid_counts = np.isfinite(stack).sum(axis=1)
+        if stack.size and (valid_counts == stack.shape[1]).all():
+            # Sem pixels mascarados: partição vetorizada de todas as cenas de uma vez
+            position = q / 100 * (stack.shape[1] - 1)
+            low, high = int(np.floor(position)), int(np.ceil(position))
+            partitioned = np.partition(stack, (low, high), axis=1)
+            result = partitioned[:, low] + (partitioned[:, high] - partitioned[:, low]) * (position - low)
+        else:
+            result = np.array([partition_percentile(row, q) for row in stack])
+
+        return float(result[0]) if lst.ndim == 2 else result
+
+    def calculate_evapotranspiration_sebal(self, bands, roi_mask=None, scaled=True, out=None):
+        """SEBAL simplificado em NumPy, mesmo modelo de calculate_evapotranspiration_sebal
+
+        bands: SR_B2..SR_B7 e ST_B10, arrays 2-D (uma cena) ou 3-D (pilha de
+        cenas). Com scaled=False, os fatores de escala Landsat são aplicados.
+        Os termos são calculados em operações in-place sobre os buffers de
+        saída, com um único buffer auxiliar.
+        """
+        if not scaled:
+            bands = self.scale_landsat(bands)
+
+        lst = np.asarray(bands['ST_B10'])
+        shape = lst.shape
+        if out is None:
+            out = {name: np.empty(shape, dtype=self.dtype) for name in SEBAL_OUTPUTS}
+        scratch = np.empty(shape, dtype=self.dtype)
+
+        # Albedo: combinação linear das bandas ópticas
+        albedo = out['ALBEDO']
+        albedo.fill(SEBAL_ALBEDO_OFFSET)
+        for name, coefficient in SEBAL_ALBEDO_COEFFICIENTS:
+            np.multiply(bands[name], coefficient, out=scratch)
+            albedo += scratch
+
+        # Rn = Rs * (1 - albedo) - 0.01 * LST
+        rn = out['RN']
+        np.multiply(albedo, -SEBAL_RS_IN, out=rn)
+        rn += SEBAL_RS_IN
+        np.multiply(lst, SEBAL_RL_FACTOR, out=scratch)
+        rn -= scratch
+
+        # G = Rn * polinômio(albedo), avaliado por Horner
+        g = out['G']
+        a3, a2, a1, a0 = SEBAL_G_COEFFICIENTS
+        np.multiply(albedo, a3, out=g)
+        g += a2
+        g *= albedo
+        g += a1
+        g *= albedo
+        g += a0
+        g *= rn
+
+        # H = (LST - LST_p10) * rho_cp / rah
+        cold = self.lst_percentile(lst, roi_mask)
+        if lst.ndim == 3:
+            cold = np.asarray(cold).reshape(-1, 1, 1)
+        h = out['H']
+        np.subtract(lst, cold, out=h)
+        h *= SEBAL_RHO_CP / SEBAL_RAH
+
+        # ET = (Rn - G - H) / lambda
+        et_inst = out['ET_INST']
+        np.subtract(rn, g, out=et_inst)
+        et_inst -= h
+        et_inst /= SEBAL_LAMBDA
+        np.multiply(et_inst, SEBAL_ACTIVE_HOURS, out=out['ET_DAILY'])
+        return out
+
+    def mean_indices(self, results, bands=('NDWI', 'NDVI', 'ET_daily')):
+        """Média dos pixels válidos, como reduceRegion(ee.Reducer.mean())"""
+        return {band: float(np.nanmean(results[band])) if np.isfinite(results[band]).any() else None
+                for band in bands}
+
+
+BACKENDS = {NumpyBackend.name: NumpyBackend}
+
+
+def get_backend(name='numpy', **kwargs):
+    """Instancia um backend de cálculo local pelo nome"""
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Backend desconhecido: {name}. Disponíveis: {sorted(BACKENDS)}")
+
+
+def sample_image_arrays(image, region, bands, scale=10, default_value=-9999):
+    """Baixa um recorte de ee.Image como arrays NumPy (sampleRectangle)
+
+    Usado na verificação de paridade entre os caminhos EE e NumPy; a
+    região deve ser pequena (limite de 262144 pixels do GEE).
+    """
+    sample = (image.select(list(bands))
+              .reproject(crs=image.select(bands[0]).projection(), scale=scale)
+              .sampleRectangle(region=region, defaultValue=default_value)
+              .getInfo())
+    arrays = {}
+    for band in bands:
+        values = np.array(sample['properties'][band], dtype=np.float64)
+        values[values == default_value] = np.nan
+        arrays[band] = values
+    return arrays
+
+
+def check_parity(raw_image, processed_image, region, backend=None, scale=10,
+                 bands=('NDWI', 'NDVI', 'NDMI', 'ET_daily')):
+    """Compara o backend NumPy com o resultado do Earth Engine no mesmo recorte
+
+    raw_image: imagem Sentinel-2 original (B3, B4, B8, B11, QA60).
+    processed_image: a mesma imagem processada pelo caminho EE, por
+    get_sentinel2_data (NDWI, NDVI, NDMI) ou por
+    EVETMonitoringSystem.process_image (NDWI, NDVI, ET_daily).
+    Retorna a maior diferença absoluta por banda (pixels válidos em ambos).
+    """
+    backend = backend or NumpyBackend(dtype=np.float64)
+    inputs = sample_image_arrays(raw_image, region, S2_BANDS, scale)
+    inputs['QA60'] = np.nan_to_num(inputs['QA60']).astype(np.uint16)
+    local = backend.process_sentinel2(inputs)
+    remote = sample_image_arrays(processed_image, region, bands, scale)
+
+    differences = {}
+    for band in bands:
+        valid = np.isfinite(local[band]) & np.isfinite(remote[band])
+        differences[band] = float(np.max(np.abs(local[band][valid] - remote[band][valid]))) if valid.any() else None
+    return differences
+
+
+def check_sebal_parity(processed_image, region, roi_mask=None, backend=None, scale=30):
+    """Compara o SEBAL NumPy com calculate_evapotranspiration_sebal no mesmo recorte
+
+    processed_image: imagem Landsat já escalada (get_landsat_data) e
+    processada pelo SEBAL do Earth Engine. Retorna a maior diferença
+    absoluta por banda de saída.
+    """
+    backend = backend or NumpyBackend(dtype=np.float64)
+    inputs = sample_image_arrays(processed_image, region, LANDSAT_SEBAL_BANDS, scale)
+    local = backend.calculate_evapotranspiration_sebal(inputs, roi_mask=roi_mask)
+    remote = sample_image_arrays(processed_image, region, SEBAL_OUTPUTS, scale)
+
+    differences = {}
+    for band in SEBAL_OUTPUTS:
+        valid = np.isfinite(local[band]) & np.isfinite(remote[band])
+        differences[band] = float(np.max(np.abs(local[band][valid] - remote[band][valid]))) if valid.any() else None
+    return differences
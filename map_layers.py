@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Validade dos map IDs: acompanha a do token de acesso do GEE (1 h), com margem
+MAP_ID_TTL = 55 * 60
+DEFAULT_TILE_DIR = 'data/tiles'
+
+
+def layer_key(scene_id, band, vis_params):
+    """Chave da camada: cena, banda e parâmetros de visualização"""
+    payload = json.dumps([scene_id, band, vis_params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def tile_url_format(map_id):
+    """Template {z}/{x}/{y} da resposta de getMapId"""
+    fetcher = map_id.get('tile_fetcher')
+    if fetcher is not None:
+        return fetcher.url_format
+    return map_id['url_format']
+
+
+class MapLayerCache:
+    """Cache de map IDs/URLs de tiles por (cena, banda, visualização)
+
+    Cada entrada expira após ttl segundos (map IDs do GEE deixam de valer
+    com o token) e o total é limitado a max_entries (LRU). Com tile_proxy,
+    as URLs devolvidas apontam para o proxy local com tiles em disco.
+    """
+
+    def __init__(self, max_entries=256, ttl=MAP_ID_TTL, tile_proxy=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tile_proxy = tile_proxy
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scene_id, band, vis_params, image_factory):
+        """URL de tiles da camada; chama getMapId só em falta ou expiração
+
+        image_factory: função sem argumentos que devolve a ee.Image da cena
+        (só é chamada quando o map ID precisa ser obtido).
+        """
+        key = layer_key(scene_id, band, vis_params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry['url']
+            self.misses += 1
+
+        image = image_factory()
+        if band is not None:
+            image = image.select(band)
+        url = tile_url_format(image.getMapId(vis_params))
+        if self.tile_proxy is not None:
+            url = self.tile_proxy.register(key, url)
+
+        with self._lock:
+            self._entries[key] = {'url': url, 'expires_at': now + self.ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return url
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class TileStore:
+    """Tiles PNG em disco, com limite de tamanho (remove os menos usados)"""
+
+    def __init__(self, tile_dir=DEFAULT_TILE_DIR, max_bytes=500 * 1024 ** 2):
+        self.tile_dir = tile_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(tile_dir, exist_ok=True)
+
+    def path(self, key, z, x, y):
+        return os.path.join(self.tile_dir, key, str(z), str(x), f'{y}.png')
+
+    def read(self, key, z, x, y):
+        path = self.path(key, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return data
+
+    def write(self, key, z, x, y, data):
+        """Grava o tile de forma atômica"""
+        path = self.path(key, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._evict()
+
+    def _evict(self):
+        tiles = []
+        for root, _, names in os.walk(self.tile_dir):
+            for name in names:
+                if name.endswith('.png'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    tiles.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in tiles)
+        for _, size, path in sorted(tiles):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+class TileProxy:
+    """Proxy HTTP local que serve tiles do TileStore e busca os ausentes no GEE
+
+    Os tiles são guardados pela chave da camada (não pelo map ID), então
+    continuam válidos quando o map ID expira e é renovado. O navegador
+    precisa acessar o host do proxy (uso local).
+    """
+
+    def __init__(self, store=None, host='127.0.0.1', port=0, timeout=30):
+        self.store = store or TileStore()
+        self.timeout = timeout
+        self._upstream = {}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def register(self, key, upstream_url):
+        """Associa a camada à URL do GEE e retorna o template local"""
+        self._upstream[key] = upstream_url
+        return f'http://{self.host}:{self.port}/{key}/{{z}}/{{x}}/{{y}}'
+
+    def fetch(self, key, z, x, y):
+        data = self.store.read(key, z, x, y)
+        if data is not None:
+            return data
+        upstream = self._upstream.get(key)
+        if upstream is None:
+            return None
+
+        response = requests.get(upstream.format(z=z, x=x, y=y), timeout=self.timeout)
+        response.raise_for_status()
+        self.store.write(key, z, x, y, response.content)
+        return response.content
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    key, z, x, y = self.path.split('?')[0].strip('/').split('/')
+                    data = proxy.fetch(key, int(z), int(x), int(y))
+                except Exception as e:
+                    self.send_error(502, str(e))
+                    return
+                if data is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Cache-Control', 'max-age=86400')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
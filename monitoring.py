@@ -0,0 +1,360 @@
+import ee
+import pandas as pd
+from datetime import datetime, timedelta
+import json
+
+import os
+
+from backfill import DEFAULT_BACKFILL_DIR, AdaptiveChunker, Backfill
+from data_processor import (SatelliteDataProcessor, extract_time_series_batched, extraction_version,
+                            reduce_collection, split_date_range)
+from field_state import FieldStateStore
+from reduction_plan import ReductionPlan
+from ts_cache import TimeSeriesCache, DEFAULT_CACHE_DIR, roi_hash
+from instrumentation import NULL_TRACER
+
+# Nomes das colunas da série usados na interface
+TIME_SERIES_COLUMNS = {'date': 'Data', 'ET_daily': 'ET_diaria'}
+
+# Metadados por cena extraídos junto com a série (índice de cenas)
+SCENE_PROPERTIES = {'CLOUDY_PIXEL_PERCENTAGE': 'cloud_pct', 'system:footprint': 'footprint'}
+
+# Extração progressiva: no máximo PROGRESSIVE_WINDOWS idas ao GEE, e
+# períodos de até PROGRESSIVE_MIN_DAYS dias saem em uma só
+PROGRESSIVE_WINDOWS = 4
+PROGRESSIVE_MIN_DAYS = 90
+
+
+def scene_index(df):
+    """Índice de cenas da série: data → system:index, % de nuvens e footprint
+
+    Ordenado por data e, na mesma data, pela menor cobertura de nuvens.
+    """
+    columns = [column for column in ['Data', 'scene_id', 'cloud_pct', 'footprint'] if column in df.columns]
+    index = df[columns].drop_duplicates('scene_id')
+    index = index.assign(Data=pd.to_datetime(index['Data']).dt.date)
+    order = ['Data', 'cloud_pct'] if 'cloud_pct' in index.columns else ['Data']
+    return index.sort_values(order).reset_index(drop=True)
+
+
+class EVETMonitoringSystem:
+    """Pipeline de monitoramento de ET/NDWI, independente da interface Streamlit"""
+
+    # Coleção consultada por get_satellite_data
+    COLLECTION_ID = 'COPERNICUS/S2_SR_HARMONIZED'
+
+    def __init__(self, cache=None, field_store=None, tracer=None, catalog=None):
+        # Cache em disco das séries extraídas; None desativa
+        self.cache = cache
+        # Estado dos talhões para atualização incremental
+        self.field_store = field_store
+        # Instrumentação (instrumentation.Tracer); o padrão é no-op
+        self.tracer = tracer or NULL_TRACER
+        # Catálogo de cenas por região (scene_catalog.SceneCatalog); None consulta a coleção
+        self.catalog = catalog
+
+    def initialize_ee(self, service_account_json=None):
+        """Inicializa o Google Earth Engine (service account opcional)"""
+        if service_account_json:
+            sa_info = json.loads(service_account_json)
+            credentials = ee.ServiceAccountCredentials(sa_info["client_email"], json.dumps(sa_info))
+            ee.Initialize(credentials)
+        else:
+            ee.Initialize()
+
+    def calculate_ndwi(self, image):
+        """Calcula o NDWI (Normalized Difference Water Index)"""
+        # NDWI = (GREEN - NIR) / (GREEN + NIR)
+        green = image.select('B3')  # Banda verde Sentinel-2
+        nir = image.select('B8')    # Banda NIR Sentinel-2
+        ndwi = green.subtract(nir).divide(green.add(nir)).rename('NDWI')
+        return image.addBands(ndwi)
+
+    def calculate_ndvi(self, image):
+        """Calcula o NDVI (Normalized Difference Vegetation Index)"""
+        # NDVI = (NIR - RED) / (NIR + RED)
+        nir = image.select('B8')    # Banda NIR
+        red = image.select('B4')    # Banda vermelha
+        ndvi = nir.subtract(red).divide(nir.add(red)).rename('NDVI')
+        return image.addBands(ndvi)
+
+    def estimate_evapotranspiration(self, image, ndwi, ndvi, temp=None):
+        """Estima evapotranspiração baseada em NDWI, NDVI e outros parâmetros"""
+        # Modelo simplificado de ET baseado em índices espectrais
+        # ET = f(NDVI, NDWI, temperatura, radiação)
+
+        # Fator de vegetação baseado em NDVI
+        vegetation_factor = ndvi.multiply(1.2).add(0.1)
+
+        # Fator de água baseado em NDWI
+        water_factor = ndwi.multiply(0.8).add(1.0)
+
+        # ET simplificada (mm/dia)
+        et_simple = vegetation_factor.multiply(water_factor).multiply(3.5).rename('ET_daily')
+
+        return image.addBands([et_simple, vegetation_factor.rename('VEG_FACTOR'), 
+                              water_factor.rename('WATER_FACTOR')])
+
+    def get_satellite_data(self, roi, start_date, end_date, cloud_threshold=20):
+        """Obtém dados de satélite Sentinel-2
+
+        Com catálogo, cloud_threshold é o % de nuvens sobre a ROI e a
+        coleção é montada pelos IDs das cenas selecionadas (já por data).
+        """
+        if self.catalog is not None:
+            collection = self.catalog.clear_collection(roi, start_date, end_date, cloud_threshold,
+                                                       self.COLLECTION_ID, tracer=self.tracer)
+        else:
+            collection = (ee.ImageCollection(self.COLLECTION_ID)
+                         .filterBounds(roi)
+                         .filterDate(start_date, end_date)
+                         .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_threshold))
+                         .sort('system:time_start'))
+
+        processed_collection = collection.map(self.process_image)
+        return processed_collection
+
+    def process_image(self, image):
+        """Aplica a máscara de nuvens e calcula NDWI, NDVI e ET de uma cena"""
+        # Máscara de nuvens
+        cloud_mask = image.select('QA60').bitwiseAnd(1024).eq(0).And(
+                    image.select('QA60').bitwiseAnd(2048).eq(0))
+
+        # Aplicar máscara e calcular índices
+        masked = image.updateMask(cloud_mask)
+        with_ndwi = self.calculate_ndwi(masked)
+        with_ndvi = self.calculate_ndvi(with_ndwi)
+        with_et = self.estimate_evapotranspiration(with_ndvi, 
+                                                 with_ndvi.select('NDWI'), 
+                                                 with_ndvi.select('NDVI'))
+
+        return with_et
+
+    def load_scene(self, scene_id):
+        """Carrega uma cena processada pelo system:index, sem consultar a coleção"""
+        return self.process_image(ee.Image(f'{self.COLLECTION_ID}/{scene_id}'))
+
+    def create_time_series(self, collection, roi):
+        """Cria série temporal dos índices"""
+        plan = ReductionPlan()
+        scale = plan.scale_for(roi)
+
+        def extract_values(image):
+            stats = image.select(['NDWI', 'NDVI', 'ET_daily']).reduceRegion(
+                reducer=ee.Reducer.mean(),
+                **plan.reduce_region_args(roi, scale)
+            )
+            return ee.Feature(None, stats.set('date', image.date().format('YYYY-MM-dd'))
+                              .set('scale', scale))
+
+        time_series = collection.map(extract_values)
+        return time_series
+
+    def formula_version(self):
+        """Versão das fórmulas, máscara de nuvem e redução usada para invalidar o cache"""
+        return extraction_version(self.get_satellite_data,
+                                  self.calculate_ndwi,
+                                  self.calculate_ndvi,
+                                  self.estimate_evapotranspiration,
+                                  self.process_image,
+                                  scene_properties=SCENE_PROPERTIES)
+
+    def extract_time_series(self, collection, roi, start_date, end_date, chunk_days=None,
+                            cloud_threshold=20):
+        """Extrai a série temporal com uma única redução batch no servidor
+
+        Com cache configurado, só as datas ausentes do disco são consultadas.
+        Cada linha traz também o índice da cena (scene_id, cloud_pct,
+        footprint), usado pelos mapas para carregar a mesma imagem.
+        """
+        bands = ['NDWI', 'NDVI', 'ET_daily']
+
+        def fetch(window_start, window_end):
+            return extract_time_series_batched(collection, roi, bands,
+                                               start_date=window_start,
+                                               end_date=window_end,
+                                               chunk_days=chunk_days,
+                                               properties=SCENE_PROPERTIES,
+                                               tracer=self.tracer)
+
+        with self.tracer.span('extract_time_series', cached=self.cache is not None):
+            if self.cache is not None:
+                version = self.formula_version()
+                sensor = 'S2_SR_HARMONIZED+catalog' if self.catalog is not None else 'S2_SR_HARMONIZED'
+                key = self.cache.make_key(roi, sensor, cloud_threshold, version, bands)
+                df = self.cache.get_or_fetch(key, start_date, end_date, fetch,
+                                             formula_version=version)
+            else:
+                df = fetch(start_date, end_date)
+            return df.rename(columns=TIME_SERIES_COLUMNS)
+
+    def extract_time_series_progressive(self, roi, start_date, end_date,
+                                        max_windows=PROGRESSIVE_WINDOWS, cloud_threshold=20,
+                                        progress=None):
+        """Extrai a série em poucas janelas, reportando cada janela concluída
+
+        O tamanho das janelas vem do período: até max_windows janelas de
+        no mínimo PROGRESSIVE_MIN_DAYS dias, cada uma em uma requisição
+        batch. progress(fração, mensagem, parcial) é chamado após cada
+        janela com o DataFrame da janela, para exibir resultados parciais
+        na interface.
+        """
+        days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+        chunk_days = max(-(-days // max_windows), PROGRESSIVE_MIN_DAYS)
+        windows = split_date_range(start_date, end_date, chunk_days)
+        frames = []
+        for i, (window_start, window_end) in enumerate(windows):
+            collection = self.get_satellite_data(roi, window_start, window_end, cloud_threshold)
+            df = self.extract_time_series(collection, roi, window_start, window_end,
+                                          cloud_threshold=cloud_threshold)
+            frames.append(df)
+            if progress is not None:
+                progress((i + 1) / len(windows), f"{window_start} a {window_end}", df)
+
+        non_empty = [frame for frame in frames if not frame.empty]
+        if non_empty:
+            return pd.concat(non_empty, ignore_index=True)
+        return frames[0] if frames else pd.DataFrame()
+
+    def backfill_time_series(self, roi, start_date, end_date, output_dir=None, chunk_days=90,
+                             max_workers=2, cloud_threshold=20, progress=None):
+        """Extração histórica de vários anos, em janelas adaptativas e retomável
+
+        Cada janela concluída vira um checkpoint em output_dir (por padrão
+        um diretório por ROI/limite de nuvens/fórmulas em data/backfill), e
+        uma execução interrompida continua de onde parou. O resultado
+        montado é gravado como Parquet particionado por ano em
+        output_dir/dataset.
+        """
+        bands = ['NDWI', 'NDVI', 'ET_daily']
+        if output_dir is None:
+            selection = f'{cloud_threshold}catalog' if self.catalog is not None else cloud_threshold
+            output_dir = os.path.join(DEFAULT_BACKFILL_DIR,
+                                      f'{roi_hash(roi)}_{selection}_{self.formula_version()}')
+
+        def fetch(window_start, window_end):
+            collection = self.get_satellite_data(roi, window_start, window_end, cloud_threshold)
+            return extract_time_series_batched(collection, roi, bands,
+                                               start_date=window_start,
+                                               end_date=window_end,
+                                               properties=SCENE_PROPERTIES,
+                                               tracer=self.tracer)
+
+        backfill = Backfill(fetch, output_dir, AdaptiveChunker(chunk_days),
+                            max_workers=max_workers, progress=progress)
+        with self.tracer.span('backfill', start=str(start_date), end=str(end_date)):
+            failures = backfill.run(start_date, end_date)
+            df = backfill.load(pd.Timestamp(start_date).strftime('%Y-%m-%d'),
+                               pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+            if not df.empty:
+                backfill.write_dataset(df)
+
+        if failures:
+            print(f"Backfill incompleto: {len(failures)} janela(s) com erro; "
+                  f"execute novamente para retomar")
+        return df.rename(columns=TIME_SERIES_COLUMNS)
+
+    def refresh_field(self, field_id, roi, lookback_days=90, reprocess_days=30,
+                      end_date=None, cloud_threshold=20):
+        """Atualiza a série de um talhão processando apenas cenas novas
+
+        Na primeira execução processa os últimos lookback_days. Nas seguintes,
+        lista os system:index a partir de (último system:time_start -
+        reprocess_days) e reduz somente as cenas ainda não vistas: as novas
+        aquisições e as reprocessadas (que recebem novo system:index). Linhas
+        de cenas que sumiram do catálogo nesse intervalo são descartadas.
+        """
+        if self.field_store is None:
+            self.field_store = FieldStateStore()
+
+        state, rows = self.field_store.load(field_id)
+        formula_version = self.formula_version()
+        if state.get('formula_version') != formula_version:
+            # Fórmulas mudaram: a série acumulada não é mais válida
+            state, rows = {'field_id': field_id, 'last_time_start': None, 'scene_ids': []}, pd.DataFrame()
+
+        end = pd.Timestamp(end_date) if end_date else pd.Timestamp(datetime.now().date()) + timedelta(days=1)
+        if state['last_time_start'] is None:
+            window_start = end - timedelta(days=lookback_days)
+        else:
+            last_processed = pd.to_datetime(state['last_time_start'], unit='ms').normalize()
+            window_start = last_processed - timedelta(days=reprocess_days)
+
+        window_start = window_start.strftime('%Y-%m-%d')
+        window_end = end.strftime('%Y-%m-%d')
+        collection = self.get_satellite_data(roi, window_start, window_end, cloud_threshold)
+
+        # Listagem leve (apenas metadados) das cenas da janela
+        listing = self.tracer.get_info(ee.Dictionary({
+            'index': collection.aggregate_array('system:index'),
+            'time': collection.aggregate_array('system:time_start')
+        }), 'list_scenes')
+
+        known = set(state['scene_ids'])
+        current = set(listing['index'])
+        new_ids = sorted(current - known)
+
+        if new_ids:
+            new_rows = reduce_collection(collection.filter(ee.Filter.inList('system:index', new_ids)),
+                                         roi, ['NDWI', 'NDVI', 'ET_daily'],
+                                         properties=SCENE_PROPERTIES, tracer=self.tracer)
+            new_rows = new_rows.rename(columns=TIME_SERIES_COLUMNS)
+        else:
+            new_rows = pd.DataFrame()
+
+        if not rows.empty:
+            # Cenas da janela que não existem mais foram reprocessadas ou removidas
+            in_window = rows['Data'] >= window_start
+            rows = rows[~in_window | rows['scene_id'].isin(current)]
+
+        frames = [frame for frame in (rows, new_rows) if not frame.empty]
+        if frames:
+            rows = pd.concat(frames, ignore_index=True).sort_values('Data').reset_index(drop=True)
+
+        times = listing['time'] + ([state['last_time_start']] if state['last_time_start'] else [])
+        state = {
+            'field_id': field_id,
+            'formula_version': formula_version,
+            'last_time_start': max(times) if times else state['last_time_start'],
+            # Cenas da janela totalmente mascaradas também contam como processadas
+            'scene_ids': sorted(current | (set(rows['scene_id']) if not rows.empty else set())),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'new_scenes': len(new_ids)
+        }
+        self.field_store.save(field_id, state, rows)
+        return rows
+
+    def download_time_series_data(self, time_series):
+        """Baixa dados da série temporal"""
+        try:
+            data = self.tracer.get_info(time_series, 'download_time_series_data')
+
+            with self.tracer.span('build_dataframe', rows=len(data['features'])):
+                records = []
+                for feature in data['features']:
+                    props = feature['properties']
+                    if all(k in props for k in ['date', 'NDWI', 'NDVI', 'ET_daily']):
+                        records.append({
+                            'Data': props['date'],
+                            'NDWI': props['NDWI'],
+                            'NDVI': props['NDVI'],
+                            'ET_diaria': props['ET_daily'],
+                            'scale': props.get('scale')
+                        })
+
+                return pd.DataFrame(records)
+        except Exception as e:
+            print(f"Erro ao baixar dados: {e}")
+            return pd.DataFrame()
+
+
+def open_cache(cache_dir=DEFAULT_CACHE_DIR, **options):
+    """Abre o cache de séries descartando as entradas de versões antigas do pipeline
+
+    O mesmo diretório pode guardar séries deste sistema e do
+    SatelliteDataProcessor; as duas versões atuais são mantidas.
+    """
+    cache = TimeSeriesCache(cache_dir, **options)
+    cache.purge_stale(EVETMonitoringSystem().formula_version(),
+                      SatelliteDataProcessor(initialize=False).formula_version())
+    return cache
@@ -0,0 +1,100 @@
+import math
+
+import ee
+
+# Escala mínima da redução: a resolução fixa de 30 m usada antes do plano,
+# para que ROIs pequenas não passem a ser reduzidas nos 10 m nativos
+MIN_SCALE = 30
+# Pixels por imagem visados na redução (~225 km² a 30 m)
+TARGET_PIXELS = 250_000
+MAX_TILE_SCALE = 16
+
+# Erros do GEE resolvidos com tiles menores ou resolução mais grossa; tempo
+# esgotado fica para a divisão em janelas (data_processor.EE_LIMIT_ERRORS)
+EE_PIXEL_ERRORS = (
+    'too many pixels',
+    'memory limit',
+    'user memory',
+)
+
+
+def is_pixel_error(error):
+    """Verifica se o erro do GEE foi causado por excesso de pixels/memória"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in EE_PIXEL_ERRORS)
+
+
+def target_pixels_for_error(error_budget, sigma=0.2):
+    """Pixels para o erro padrão da média ficar em error_budget
+
+    sigma é o desvio padrão esperado do índice dentro da ROI.
+    """
+    return math.ceil((sigma / error_budget) ** 2)
+
+
+class ReductionPlan:
+    """Parâmetros de reduceRegion (scale, tileScale, bestEffort) por ROI
+
+    Sem scale fixo, a escala é a menor (múltipla de 10 m, nunca abaixo de
+    min_scale) em que a ROI tem até target_pixels pixels. Ela é calculada no
+    servidor a partir de roi.area(), dentro da própria requisição da
+    redução, sem ida extra ao GEE. Em erro de memória/pixels, coarser()
+    devolve o próximo nível: tileScale maior e, por fim, metade da
+    resolução com bestEffort.
+    """
+
+    def __init__(self, target_pixels=TARGET_PIXELS, min_scale=MIN_SCALE, scale=None,
+                 tile_scale=1, best_effort=False, max_pixels=1e9, error_budget=None):
+        if error_budget is not None:
+            target_pixels = target_pixels_for_error(error_budget)
+        self.target_pixels = target_pixels
+        self.min_scale = min_scale
+        self.scale = scale
+        self.tile_scale = tile_scale
+        self.best_effort = best_effort
+        self.max_pixels = max_pixels
+
+    def scale_for(self, roi):
+        """Escala da redução: fixa ou ee.Number calculado pela área da ROI"""
+        if self.scale is not None:
+            return self.scale
+        return (ee.Number(roi.area(1)).divide(self.target_pixels).sqrt()
+                .max(self.min_scale).divide(10).ceil().multiply(10))
+
+    def reduce_region_args(self, roi, scale=None):
+        """Argumentos de reduceRegion (geometry, scale, maxPixels, tileScale, bestEffort)"""
+        args = {
+            'geometry': roi,
+            'scale': self.scale_for(roi) if scale is None else scale,
+            'maxPixels': self.max_pixels,
+            'tileScale': self.tile_scale,
+        }
+        if self.best_effort:
+            args['bestEffort'] = True
+        return args
+
+    def coarser(self):
+        """Próximo nível após erro de memória/pixels (None se não houver)"""
+        if self.tile_scale < MAX_TILE_SCALE:
+            return self._replace(tile_scale=min(self.tile_scale * 4, MAX_TILE_SCALE))
+        if not self.best_effort:
+            return self._replace(target_pixels=max(self.target_pixels // 4, 1),
+                                 scale=self.scale * 2 if self.scale is not None else None,
+                                 best_effort=True)
+        return None
+
+    def describe(self, scale=None):
+        """Configuração usada, para registro junto ao resultado"""
+        return {
+            'scale': self.scale if scale is None else scale,
+            'tile_scale': self.tile_scale,
+            'best_effort': self.best_effort,
+            'target_pixels': self.target_pixels,
+        }
+
+    def _replace(self, **changes):
+        options = {'target_pixels': self.target_pixels, 'min_scale': self.min_scale,
+                   'scale': self.scale, 'tile_scale': self.tile_scale,
+                   'best_effort': self.best_effort, 'max_pixels': self.max_pixels}
+        options.update(changes)
+        return ReductionPlan(**options)
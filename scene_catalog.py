@@ -0,0 +1,203 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta
+
+import ee
+import pandas as pd
+
+from data_processor import LANDSAT_COLLECTIONS, extract_time_series_batched
+from reduction_plan import ReductionPlan
+from ts_cache import merge_intervals, missing_intervals, roi_hash
+
+DEFAULT_CATALOG_PATH = os.path.join('data', 'scene_catalog.sqlite')
+
+S2_COLLECTION = 'COPERNICUS/S2_SR_HARMONIZED'
+
+# Sensor e propriedade de cobertura de nuvens (tile inteiro) por coleção
+SENSORS = {S2_COLLECTION: 'S2', **{collection_id: sensor
+                                   for sensor, collection_id in LANDSAT_COLLECTIONS.items()}}
+CLOUD_PROPERTIES = {S2_COLLECTION: 'CLOUDY_PIXEL_PERCENTAGE',
+                    **{collection_id: 'CLOUD_COVER'
+                       for collection_id in LANDSAT_COLLECTIONS.values()}}
+
+# Resolução da banda QA60; a fração de pixels limpos não precisa de mais
+CATALOG_SCALE = 60
+
+# Cenas recentes ainda podem chegar ou ser reprocessadas: não são dadas
+# como sincronizadas antes de SETTLE_DAYS
+SETTLE_DAYS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    region_id TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    scene_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    sensor TEXT NOT NULL,
+    tile_cloud_pct REAL,
+    roi_clear_fraction REAL,
+    footprint TEXT,
+    PRIMARY KEY (region_id, collection_id, scene_id)
+);
+CREATE INDEX IF NOT EXISTS scenes_by_region_date ON scenes (region_id, date);
+CREATE INDEX IF NOT EXISTS scenes_by_date ON scenes (date);
+CREATE TABLE IF NOT EXISTS synced (
+    region_id TEXT NOT NULL,
+    collection_id TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS synced_by_region ON synced (region_id, collection_id);
+"""
+
+CATALOG_COLUMNS = ['scene_id', 'date', 'sensor', 'tile_cloud_pct', 'roi_clear_fraction',
+                   'footprint']
+
+
+def clear_mask(image, collection_id):
+    """Imagem 1/0 de pixels sem nuvem/sombra segundo a banda de qualidade"""
+    if collection_id == S2_COLLECTION:
+        qa = image.select('QA60')
+        return qa.bitwiseAnd(1024).eq(0).And(qa.bitwiseAnd(2048).eq(0))
+    # QA_PIXEL: bits 1 (nuvem dilatada), 3 (nuvem) e 4 (sombra)
+    return image.select('QA_PIXEL').bitwiseAnd(0b11010).eq(0)
+
+
+def fetch_scenes(collection_id, roi, start_date, end_date, tracer=None):
+    """Cenas da coleção sobre a ROI com a fração de pixels limpos na ROI
+
+    Uma redução batch (toBands) da máscara de nuvens, sem filtro de
+    cobertura do tile. Cenas sem nenhum pixel válido na ROI são omitidas.
+    """
+    def add_clear(image):
+        return image.addBands(clear_mask(image, collection_id).rename('CLEAR'))
+
+    collection = ee.ImageCollection(collection_id).filterBounds(roi).map(add_clear)
+    df = extract_time_series_batched(
+        collection, roi, ['CLEAR'], start_date, end_date,
+        properties={CLOUD_PROPERTIES[collection_id]: 'tile_cloud_pct',
+                    'system:footprint': 'footprint'},
+        tracer=tracer, plan=ReductionPlan(min_scale=CATALOG_SCALE))
+    df = df.rename(columns={'CLEAR': 'roi_clear_fraction'})
+    df['sensor'] = SENSORS[collection_id]
+    return df[CATALOG_COLUMNS]
+
+
+def scene_collection(collection_id, scene_ids):
+    """ImageCollection montada diretamente pelos system:index, sem consultar o catálogo do GEE"""
+    return ee.ImageCollection.fromImages([ee.Image(f'{collection_id}/{scene_id}')
+                                          for scene_id in scene_ids])
+
+
+class SceneCatalog:
+    """Catálogo local (SQLite) das cenas de cada região monitorada
+
+    Guarda por cena: system:index, data, sensor, cobertura de nuvens do
+    tile, fração de pixels limpos na ROI e footprint, indexado por região
+    e data. O preenchimento é incremental: sync() consulta no GEE apenas
+    os trechos do período ainda não sincronizados para a região/coleção.
+    Com as cenas úteis selecionadas pelo catálogo, a coleção é montada por
+    ID e as cenas encobertas sobre a ROI nunca chegam à redução.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH, settle_days=SETTLE_DAYS, fetch=None):
+        self.path = path
+        self.settle_days = settle_days
+        # fetch(coleção, roi, início, fim, tracer=...) -> DataFrame com CATALOG_COLUMNS
+        self.fetch = fetch or fetch_scenes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def sync(self, roi, start_date, end_date, collection_id=S2_COLLECTION, region_id=None,
+             tracer=None):
+        """Cataloga as cenas ainda não vistas do período; retorna quantas foram gravadas"""
+        region_id = region_id or roi_hash(roi)
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+        settled = (datetime.now().date() - timedelta(days=self.settle_days)).strftime('%Y-%m-%d')
+
+        written = 0
+        for window_start, window_end in missing_intervals(
+                self.synced_intervals(region_id, collection_id), start_date, end_date):
+            df = self.fetch(collection_id, roi, window_start, window_end, tracer=tracer)
+            synced_end = min(window_end, settled)
+            rows = df.astype(object).where(df.notna(), None)
+            with self._lock, closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO scenes (region_id, collection_id, scene_id, date, '
+                    'sensor, tile_cloud_pct, roi_clear_fraction, footprint) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(region_id, collection_id, *row)
+                     for row in rows.itertuples(index=False, name=None)])
+                if window_start < synced_end:
+                    self._add_interval(conn, region_id, collection_id, window_start, synced_end)
+            written += len(df)
+        return written
+
+    def scenes(self, region_id, start_date=None, end_date=None, collection_id=None,
+               min_clear=None):
+        """Cenas catalogadas da região em [start_date, end_date), por data"""
+        query = ('SELECT collection_id, ' + ', '.join(CATALOG_COLUMNS)
+                 + ' FROM scenes WHERE region_id = ?')
+        params = [region_id]
+        if start_date is not None:
+            query += ' AND date >= ?'
+            params.append(pd.Timestamp(start_date).strftime('%Y-%m-%d'))
+        if end_date is not None:
+            query += ' AND date < ?'
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+        if collection_id is not None:
+            query += ' AND collection_id = ?'
+            params.append(collection_id)
+        if min_clear is not None:
+            query += ' AND roi_clear_fraction >= ?'
+            params.append(min_clear)
+        query += ' ORDER BY date, scene_id'
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def clear_collection(self, roi, start_date, end_date, cloud_threshold=20,
+                         collection_id=S2_COLLECTION, region_id=None, tracer=None):
+        """Coleção só com as cenas com até cloud_threshold % de nuvens sobre a ROI
+
+        O limite vale para a ROI, não para o tile inteiro como
+        CLOUDY_PIXEL_PERCENTAGE: um tile parcialmente nublado com a ROI
+        limpa é mantido, e o contrário é descartado.
+        """
+        region_id = region_id or roi_hash(roi)
+        self.sync(roi, start_date, end_date, collection_id, region_id, tracer=tracer)
+        scenes = self.scenes(region_id, start_date, end_date, collection_id,
+                             min_clear=1 - cloud_threshold / 100)
+        return scene_collection(collection_id, scenes['scene_id'])
+
+    def synced_intervals(self, region_id, collection_id=S2_COLLECTION):
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT start_date, end_date FROM synced '
+                                'WHERE region_id = ? AND collection_id = ?',
+                                (region_id, collection_id)).fetchall()
+
+    def regions(self):
+        """Regiões presentes no catálogo"""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute('SELECT DISTINCT region_id FROM scenes '
+                                                   'ORDER BY region_id')]
+
+    def _add_interval(self, conn, region_id, collection_id, start_date, end_date):
+        """Registra o intervalo sincronizado, mantendo os intervalos unidos"""
+        intervals = conn.execute('SELECT start_date, end_date FROM synced '
+                                 'WHERE region_id = ? AND collection_id = ?',
+                                 (region_id, collection_id)).fetchall()
+        conn.execute('DELETE FROM synced WHERE region_id = ? AND collection_id = ?',
+                     (region_id, collection_id))
+        conn.executemany('INSERT INTO synced VALUES (?, ?, ?, ?)',
+                         [(region_id, collection_id, start, end) for start, end in
+                          merge_intervals(intervals + [(start_date, end_date)])])
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
@@ -0,0 +1,138 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from local_backend import NumpyBackend, LANDSAT_SEBAL_BANDS, S2_BANDS
+
+# Índices agregados por cena (mesmo esquema de download_time_series_data)
+SCENE_INDICES = ('NDWI', 'NDVI', 'ET_daily')
+OUTPUT_COLUMNS = {'NDWI': 'NDWI', 'NDVI': 'NDVI', 'ET_daily': 'ET_diaria'}
+
+
+class SharedArray:
+    """Array em memória compartilhada, passado aos workers apenas pelo nome"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)[...] = array
+        self.spec = ('shm', self._shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+
+# Cache por processo worker: memmaps/segmentos abertos uma única vez
+_worker_arrays = {}
+
+
+def _open_band(spec):
+    """Abre uma banda a partir do caminho .npy (memmap) ou SharedArray.spec"""
+    key = spec if isinstance(spec, str) else spec[1]
+    if key not in _worker_arrays:
+        if isinstance(spec, str):
+            _worker_arrays[key] = (None, np.load(spec, mmap_mode='r'))
+        else:
+            _, name, shape, dtype = spec
+            # Workers do pool compartilham o resource_tracker do processo pai
+            shm = shared_memory.SharedMemory(name=name)
+            _worker_arrays[key] = (shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+    return _worker_arrays[key][1]
+
+
+def _band_spec(band):
+    return band.spec if isinstance(band, SharedArray) else band
+
+
+def _process_sentinel2_tile(task):
+    """Worker: processa um bloco de linhas e retorna somas/contagens parciais"""
+    scene_index, rows, band_specs, roi_spec = task
+    block = {name: _open_band(band_specs[name])[rows[0]:rows[1]] for name in S2_BANDS}
+    result = NumpyBackend(dtype=np.float32).process_sentinel2(block)
+    roi = _open_band(roi_spec)[rows[0]:rows[1]] if roi_spec is not None else None
+    return scene_index, _partial_sums(result, SCENE_INDICES, roi)
+
+
+def _process_landsat_scene(task):
+    """Worker: cena Landsat inteira (o SEBAL depende do percentil da cena)"""
+    scene_index, _, band_specs, roi_spec = task
+    backend = NumpyBackend(dtype=np.float32)
+    bands = backend.scale_landsat({name: _open_band(band_specs[name]) for name in LANDSAT_SEBAL_BANDS})
+    roi = _open_band(roi_spec) if roi_spec is not None else None
+
+    result = backend.calculate_evapotranspiration_sebal(bands, roi_mask=roi)
+    result['NDWI'] = backend.normalized_difference(bands['SR_B3'], bands['SR_B5'])
+    result['NDVI'] = backend.normalized_difference(bands['SR_B5'], bands['SR_B4'])
+    result['ET_daily'] = result['ET_DAILY']
+    return scene_index, _partial_sums(result, SCENE_INDICES, roi)
+
+
+def _partial_sums(result, indices, roi=None):
+    partial = {}
+    for name in indices:
+        valid = np.isfinite(result[name])
+        if roi is not None:
+            valid &= np.asarray(roi, dtype=bool)
+        partial[name] = (float(result[name].sum(where=valid, dtype=np.float64)),
+                         int(np.count_nonzero(valid)))
+    return partial
+
+
+class SceneScheduler:
+    """Distribui cenas e blocos locais em um pool de processos
+
+    As bandas são passadas aos workers como caminhos .npy (memmap) ou
+    SharedArray, nunca como arrays serializados. Cada worker devolve somas e
+    contagens parciais, agregadas aqui nas médias por cena.
+    """
+
+    def __init__(self, max_workers=None, chunk_rows=1024, map_chunksize=4):
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_rows = chunk_rows
+        self.map_chunksize = map_chunksize
+
+    def run(self, scenes, sensor='sentinel2', roi_mask=None):
+        """Processa as cenas e retorna DataFrame (Data, NDWI, NDVI, ET_diaria, scene_id)
+
+        scenes: lista de dicts {'date', 'scene_id', 'bands': {banda: caminho .npy
+        ou SharedArray}}. roi_mask: caminho .npy ou SharedArray booleano
+        limitando os pixels da média (equivalente ao reduceRegion na ROI).
+        """
+        roi_spec = _band_spec(roi_mask) if roi_mask is not None else None
+        tasks = []
+        for scene_index, scene in enumerate(scenes):
+            band_specs = {name: _band_spec(band) for name, band in scene['bands'].items()}
+            if sensor == 'sentinel2':
+                height = self._height(band_specs['B3'])
+                for row in range(0, height, self.chunk_rows):
+                    tasks.append((scene_index, (row, min(row + self.chunk_rows, height)),
+                                  band_specs, roi_spec))
+            else:
+                tasks.append((scene_index, None, band_specs, roi_spec))
+
+        worker = _process_sentinel2_tile if sensor == 'sentinel2' else _process_landsat_scene
+        totals = [{name: [0.0, 0] for name in SCENE_INDICES} for _ in scenes]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for scene_index, partial in executor.map(worker, tasks, chunksize=self.map_chunksize):
+                for name, (total, count) in partial.items():
+                    totals[scene_index][name][0] += total
+                    totals[scene_index][name][1] += count
+
+        columns = {'Data': [scene['date'] for scene in scenes]}
+        for name in SCENE_INDICES:
+            columns[OUTPUT_COLUMNS[name]] = np.array(
+                [total / count if count else np.nan for total, count in (t[name] for t in totals)])
+        columns['scene_id'] = [scene.get('scene_id') for scene in scenes]
+
+        df = pd.DataFrame(columns).dropna(subset=['NDWI', 'NDVI'])
+        return df.sort_values('Data').reset_index(drop=True)
+
+    @staticmethod
+    def _height(spec):
+        if isinstance(spec, str):
+            return np.load(spec, mmap_mode='r').shape[0]
+        return spec[2][0]
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+
+def iter_chunks(df, chunk_rows=100_000):
+    """Divide um DataFrame em blocos de até chunk_rows linhas"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+class StreamingStats:
+    """Estatísticas de uma passada, combináveis entre blocos e workers
+
+    Para cada par de colunas (i, j) guarda, sobre as linhas em que ambas
+    são válidas: contagem, médias, somas de quadrados centradas (M2) e o
+    co-momento. Cada bloco é resumido de forma vetorizada e combinado com
+    a fórmula paralela de Chan (Welford generalizado), o que dá média,
+    desvio padrão, covariância e correlação par a par iguais às do pandas
+    sem manter a tabela em memória. A diagonal dá as estatísticas de cada
+    coluna; mínimo e máximo são acumulados à parte.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.rows = 0
+        self._n = np.zeros((k, k))
+        # _mean[i, j]: média de i nas linhas em que i e j são válidas
+        self._mean = np.zeros((k, k))
+        self._m2 = np.zeros((k, k))
+        self._comoment = np.zeros((k, k))
+        self._min = np.full(k, np.inf)
+        self._max = np.full(k, -np.inf)
+
+    @classmethod
+    def from_chunks(cls, chunks, columns):
+        """Acumula um iterável de DataFrames (ou um único DataFrame)"""
+        stats = cls(columns)
+        if isinstance(chunks, pd.DataFrame):
+            chunks = iter_chunks(chunks)
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    def update(self, chunk):
+        """Acrescenta um bloco (DataFrame com as colunas acompanhadas)"""
+        if len(chunk) == 0:
+            return self
+        values = chunk[self.columns].to_numpy(dtype='float64')
+        valid = ~np.isnan(values)
+        mask = valid.astype('float64')
+
+        # Centrar pela média do bloco não altera os momentos e evita cancelamento
+        center = np.nanmean(np.where(valid.any(axis=0), values, 0.0), axis=0)
+        x = np.where(valid, values - center, 0.0)
+
+        n = mask.T @ mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sums = x.T @ mask
+            mean = np.where(n > 0, sums / n, 0.0)
+            m2 = (x * x).T @ mask - mean * sums
+            comoment = x.T @ x - mean * sums.T
+
+        other = StreamingStats(self.columns)
+        other.rows = len(chunk)
+        other._n = n
+        other._mean = mean + center[:, None]
+        other._m2 = np.maximum(m2, 0.0)
+        other._comoment = comoment
+        other._min = np.where(valid, values, np.inf).min(axis=0)
+        other._max = np.where(valid, values, -np.inf).max(axis=0)
+        return self.merge(other)
+
+    def merge(self, other):
+        """Combina os agregados de outro StreamingStats (mesmas colunas)"""
+        if other.columns != self.columns:
+            raise ValueError("StreamingStats com colunas diferentes")
+        n = self._n + other._n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other._mean - self._mean
+            weight = np.where(n > 0, self._n * other._n / n, 0.0)
+            self._mean = np.where(n > 0, self._mean + delta * other._n / n, 0.0)
+        self._m2 = self._m2 + other._m2 + delta * delta * weight
+        self._comoment = self._comoment + other._comoment + delta * delta.T * weight
+        self._n = n
+        self._min = np.minimum(self._min, other._min)
+        self._max = np.maximum(self._max, other._max)
+        self.rows += other.rows
+        return self
+
+    def __add__(self, other):
+        merged = StreamingStats(self.columns).merge(self)
+        return merged.merge(other)
+
+    # Resultados por coluna
+    def count(self):
+        return pd.Series(np.diag(self._n), index=self.columns)
+
+    def mean(self):
+        counts = np.diag(self._n)
+        return pd.Series(np.where(counts > 0, np.diag(self._mean), np.nan), index=self.columns)
+
+    def sum(self):
+        return pd.Series(np.diag(self._mean) * np.diag(self._n), index=self.columns)
+
+    def var(self, ddof=1):
+        counts = np.diag(self._n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.where(counts > ddof, np.diag(self._m2) / (counts - ddof), np.nan)
+        return pd.Series(var, index=self.columns)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.var(ddof))
+
+    def min(self):
+        return pd.Series(np.where(np.isfinite(self._min), self._min, np.nan), index=self.columns)
+
+    def max(self):
+        return pd.Series(np.where(np.isfinite(self._max), self._max, np.nan), index=self.columns)
+
+    # Resultados por par de colunas
+    def cov(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self._n > ddof, self._comoment / (self._n - ddof), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """Correlação de Pearson par a par (como DataFrame.corr)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self._comoment / np.sqrt(self._m2 * self._m2.T)
+        corr = np.where(self._n > 1, np.clip(corr, -1.0, 1.0), np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def describe(self, quantiles=None):
+        """Resumo no formato de DataFrame.describe
+
+        Quantis não são calculáveis em uma passada; quantiles recebe os
+        quantis exatos já calculados (DataFrame.quantile) para completar o
+        resumo, como nas linhas '25%', '50%' e '75%' do pandas.
+        """
+        rows = {'count': self.count(), 'mean': self.mean(), 'std': self.std(), 'min': self.min()}
+        if quantiles is not None:
+            for q, values in quantiles[self.columns].iterrows():
+                rows[f'{q:.0%}'] = values
+        rows['max'] = self.max()
+        return pd.DataFrame(rows).T
@@ -1,12 +1,72 @@
 
+import contextlib
 import unittest
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from data_processor import SatelliteDataProcessor
+from data_processor import (SatelliteDataProcessor, split_date_range, is_limit_error,
+                            composite_periods, is_full_period, fill_gaps)
 import ee
+import numpy as np
 import pandas as pd
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from ts_cache import TimeSeriesCache, missing_intervals, merge_intervals
+from field_state import FieldStateStore
+from batch_processor import load_fields, is_rate_limit_error, field_area_km2
+from local_backend import NumpyBackend, check_parity, check_sebal_parity
+from tile_engine import TileEngine
+from scene_scheduler import SceneScheduler
+from zonal_stats import ZonalStatsEngine, rasterize_polygons
+from instrumentation import Tracer, NULL_TRACER
+from jobs import JobManager, DONE, ERROR
+from monitoring import EVETMonitoringSystem, scene_index
+from map_layers import MapLayerCache, TileProxy, TileStore
+from backfill import AdaptiveChunker, Backfill, completed_chunks
+from ts_store import TimeSeriesStore
+from streaming_stats import StreamingStats, iter_chunks
+from charts import downsample_indices, lttb_indices, minmax_indices, ols_fit
+from api_server import frame_etag, ndjson_chunks, response_format
+from reduction_plan import ReductionPlan, is_pixel_error, target_pixels_for_error
+from scene_catalog import SceneCatalog
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+@contextlib.contextmanager
+def fake_earth_engine(**config):
+    """Troca o ee pelo Earth Engine simulado (benchmarks/fake_ee) durante o bloco
+
+    Os módulos do projeto que já importaram o ee passam a enxergar o simulado
+    e voltam ao ee real na saída. A latência simulada começa em zero.
+    """
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+    try:
+        import fake_ee
+    finally:
+        sys.path.pop(0)
+    fake_ee.reset(**{'latency_base': 0, 'latency_per_kb': 0, 'latency_per_reduction': 0,
+                     **config})
+
+    def project_modules(current):
+        return [module for module in list(sys.modules.values())
+                if getattr(module, 'ee', None) is current
+                and os.path.dirname(os.path.abspath(getattr(module, '__file__', None) or '')) == ROOT]
+
+    real_ee = sys.modules['ee']
+    sys.modules['ee'] = fake_ee
+    for module in project_modules(real_ee):
+        module.ee = fake_ee
+    try:
+        yield fake_ee
+    finally:
+        sys.modules['ee'] = real_ee
+        for module in project_modules(fake_ee):
+            module.ee = real_ee
 
 class TestSatelliteDataProcessor(unittest.TestCase):
 
@@ -54,5 +114,1067 @@ class TestSatelliteDataProcessor(unittest.TestCase):
         self.assertIn('estatisticas', report)
         self.assertEqual(report['area_estudo_km2'], 100)
 
+class TestBatchedExtraction(unittest.TestCase):
+
+    def test_split_date_range(self):
+        """Testar divisão do período em janelas"""
+        windows = split_date_range('2023-01-01', '2023-03-01', 30)
+        self.assertEqual(windows, [('2023-01-01', '2023-01-31'),
+                                   ('2023-01-31', '2023-03-01')])
+
+    def test_limit_error_detection(self):
+        """Testar detecção de erros de limite do GEE"""
+        self.assertTrue(is_limit_error(ee.EEException('User memory limit exceeded.')))
+        self.assertTrue(is_limit_error(ee.EEException('Computation timed out.')))
+        self.assertFalse(is_limit_error(ee.EEException('Image.select: Pattern did not match')))
+        self.assertFalse(is_limit_error(ee.EEException('Too many concurrent aggregations.')))
+
+    def test_composite_periods(self):
+        """Testar períodos de composição (decêndios e meses do calendário)"""
+        self.assertEqual(composite_periods('2023-01-05', '2023-02-15', '10day'),
+                         [('2023-01-05', '2023-01-11'), ('2023-01-11', '2023-01-21'),
+                          ('2023-01-21', '2023-02-01'), ('2023-02-01', '2023-02-11'),
+                          ('2023-02-11', '2023-02-15')])
+        self.assertEqual(len(composite_periods('2023-01-01', '2024-01-01', 'monthly')), 12)
+        self.assertTrue(is_full_period('2023-01-11', '2023-01-21', '10day'))
+        self.assertFalse(is_full_period('2023-01-05', '2023-01-11', '10day'))
+        self.assertTrue(is_full_period('2023-02-01', '2023-03-01', 'monthly'))
+        self.assertFalse(is_full_period('2023-02-01', '2023-02-15', 'monthly'))
+
+    def test_fill_gaps(self):
+        """Testar preenchimento linear e harmônico de períodos vazios"""
+        periods = [d.strftime('%Y-%m-%d') for d in pd.date_range('2022-01-01', periods=52, freq='7D')]
+        days = np.arange(52) * 7.0
+        truth = 0.4 + 0.2 * np.sin(2 * np.pi * days / 365.25)
+        observed = pd.DataFrame({'date': periods, 'NDVI': truth}).drop(index=[10, 11, 30])
+
+        linear = fill_gaps(observed, periods, ['NDVI'], 'linear')
+        self.assertEqual(len(linear), 52)
+        self.assertEqual(list(linear.index[linear['filled']]), [10, 11, 30])
+        self.assertAlmostEqual(linear['NDVI'][10], truth[9] + (truth[12] - truth[9]) / 3)
+
+        harmonic = fill_gaps(observed, periods, ['NDVI'], 'harmonic')
+        np.testing.assert_allclose(harmonic['NDVI'], truth, atol=1e-6)
+
+    def test_export_sentinel2_with_fake_backend(self):
+        """Testar que as cenas de get_sentinel2_data chegam datadas à série"""
+        with fake_earth_engine(n_scenes=8, start='2023-01-01', end='2023-03-01') as fake_ee:
+            processor = SatelliteDataProcessor()
+            roi = fake_ee.Geometry.Point([-40.16, -11.08]).buffer(500)
+            s2 = processor.get_sentinel2_data(roi, '2023-01-01', '2023-03-01')
+            dates = {}
+            for name, options in [('batched', {}), ('legacy', {'batched': False}),
+                                  ('monthly', {'composite': 'monthly'})]:
+                df = processor.export_time_series(s2, roi, '2023-01-01', '2023-03-01',
+                                                  bands=('NDWI', 'NDVI', 'NDMI'), **options)
+                dates[name] = list(df['date'].astype(str))
+
+        self.assertGreater(len(dates['batched']), 0)
+        self.assertLessEqual(set(dates['batched']), set(dates['legacy']))
+        self.assertTrue(all(date.startswith('2023-0') for date in dates['batched']))
+        self.assertEqual([date[:7] for date in dates['monthly']], ['2023-01', '2023-02'])
+
+    def test_composite_export_windows_and_cache(self):
+        """Testar composições por janelas com cache só dos períodos inteiros"""
+        with fake_earth_engine(n_scenes=30, start='2023-01-01', end='2023-07-01') as fake_ee, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            processor = SatelliteDataProcessor(cache=TimeSeriesCache(cache_dir, recent_days=0))
+            roi = fake_ee.Geometry.Point([-40.16, -11.08]).buffer(500)
+            s2 = processor.get_sentinel2_data(roi, '2023-01-01', '2023-07-01')
+            runs = []
+            for _ in range(2):
+                fake_ee.stats.reset()
+                df = processor.export_time_series(s2, roi, '2023-01-15', '2023-05-10',
+                                                  bands=('NDWI', 'NDVI'), composite='monthly',
+                                                  chunk_days=31, cache_key='A')
+                runs.append((fake_ee.stats.round_trips, df))
+            quality = processor.export_time_series(s2, roi, '2023-02-01', '2023-04-01',
+                                                   bands=('NDWI',), composite='monthly',
+                                                   composite_method='quality')
+
+        (first_trips, first), (second_trips, second) = runs
+        self.assertEqual(list(first['date']), ['2023-01-15', '2023-02-01', '2023-03-01',
+                                               '2023-04-01', '2023-05-01'])
+        # Pontas cortadas (2) + fev-abr em janelas de 31 dias (3)
+        self.assertEqual(first_trips, 5)
+        self.assertEqual(len(first.attrs['reductions']), 5)
+        # Na repetição, só as pontas voltam ao GEE
+        self.assertEqual(second_trips, 2)
+        pd.testing.assert_frame_equal(second, first, check_like=True)
+        self.assertEqual(list(quality['date']), ['2023-02-01', '2023-03-01'])
+
+    def test_progressive_extraction_windows(self):
+        """Testar que a extração progressiva de um ano usa até 4 idas ao GEE"""
+        with fake_earth_engine(n_scenes=40, start='2023-01-01', end='2024-01-01') as fake_ee:
+            system = EVETMonitoringSystem()
+            roi = fake_ee.Geometry.Point([-40.16, -11.08]).buffer(500)
+            runs = {}
+            for name, end in [('year', '2024-01-01'), ('quarter', '2023-03-01')]:
+                fake_ee.stats.reset()
+                calls = []
+                df = system.extract_time_series_progressive(
+                    roi, '2023-01-01', end, progress=lambda f, m, d: calls.append((f, len(d))))
+                runs[name] = (fake_ee.stats.round_trips, calls, len(df))
+
+        round_trips, calls, rows = runs['year']
+        self.assertEqual(round_trips, 4)
+        self.assertEqual([fraction for fraction, _ in calls], [0.25, 0.5, 0.75, 1.0])
+        self.assertEqual(sum(n for _, n in calls), rows)
+        round_trips, calls, _ = runs['quarter']
+        self.assertEqual(round_trips, 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_scene_index(self):
+        """Testar índice de cenas (menor cobertura de nuvens primeiro na mesma data)"""
+        df = pd.DataFrame({'Data': ['2023-01-06', '2023-01-01', '2023-01-06'],
+                           'scene_id': ['B', 'A', 'C'], 'NDWI': [0.1, 0.2, 0.3],
+                           'cloud_pct': [12.0, 3.0, 1.5], 'footprint': ['{}', '{}', '{}']})
+        index = scene_index(df)
+        self.assertEqual(list(index['scene_id']), ['A', 'C', 'B'])
+        self.assertNotIn('NDWI', index.columns)
+
+class TestTimeSeriesCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TimeSeriesCache(tempfile.mkdtemp(), recent_days=0)
+        self.calls = []
+
+    def fetch(self, start, end):
+        self.calls.append((start, end))
+        dates = pd.date_range(start, end, freq='5D', inclusive='left').strftime('%Y-%m-%d')
+        return pd.DataFrame({'date': dates, 'scene_id': list(dates), 'NDWI': 0.1})
+
+    def test_missing_intervals(self):
+        """Testar cálculo dos trechos não cobertos"""
+        covered = [('2023-01-10', '2023-01-20')]
+        self.assertEqual(missing_intervals(covered, '2023-01-01', '2023-01-31'),
+                         [('2023-01-01', '2023-01-10'), ('2023-01-20', '2023-01-31')])
+
+    def test_open_cache_purges_stale_versions(self):
+        """Testar que a abertura do cache descarta versões antigas do pipeline"""
+        from monitoring import open_cache
+        current = EVETMonitoringSystem().formula_version()
+        processor = SatelliteDataProcessor(initialize=False).formula_version()
+        for key, version in [('atual', current), ('processor', processor), ('antiga', 'v0')]:
+            self.cache.get_or_fetch(key, '2023-01-01', '2023-01-11', self.fetch,
+                                    formula_version=version)
+        self.cache.flush()
+
+        cache = open_cache(self.cache.cache_dir, recent_days=0)
+        self.assertIsNotNone(cache.load('atual')[0])
+        self.assertIsNotNone(cache.load('processor')[0])
+        self.assertIsNone(cache.load('antiga')[0])
+
+    def test_version_covers_reduction_parameters(self):
+        """Testar que mudar a configuração da redução muda a versão do pipeline"""
+        from data_processor import extraction_version
+        version = EVETMonitoringSystem().formula_version()
+        self.assertEqual(EVETMonitoringSystem().formula_version(), version)
+        with mock.patch.object(ReductionPlan, 'describe', lambda self, scale=None: {'tile_scale': 2}):
+            self.assertNotEqual(EVETMonitoringSystem().formula_version(), version)
+        self.assertNotEqual(extraction_version(scene_properties={'a': 'b'}), extraction_version())
+
+    def test_fetches_only_missing_dates(self):
+        """Testar que períodos sobrepostos consultam apenas as datas ausentes"""
+        self.cache.get_or_fetch('roi', '2023-01-01', '2023-02-01', self.fetch)
+        df = self.cache.get_or_fetch('roi', '2023-01-15', '2023-03-01', self.fetch)
+
+        self.assertEqual(self.calls, [('2023-01-01', '2023-02-01'),
+                                      ('2023-02-01', '2023-03-01')])
+        self.assertTrue((df['date'] >= '2023-01-15').all())
+
+    def test_hits_do_not_rewrite_manifest(self):
+        """Testar que leituras atualizam last_access só em memória até flush/store"""
+        import json
+        manifest_path = os.path.join(self.cache.cache_dir, 'manifest.json')
+        self.cache.get_or_fetch('a', '2023-01-01', '2023-02-01', self.fetch)
+        with open(manifest_path) as f:
+            stored = json.load(f)['a']['last_access']
+
+        time.sleep(0.01)
+        self.cache.load('a')
+        with open(manifest_path) as f:
+            self.assertEqual(json.load(f)['a']['last_access'], stored)
+
+        self.cache.flush()
+        with open(manifest_path) as f:
+            self.assertGreater(json.load(f)['a']['last_access'], stored)
+
+    def test_size_eviction(self):
+        """Testar remoção LRU ao exceder o tamanho máximo"""
+        self.cache.max_entries = 1
+        self.cache.get_or_fetch('a', '2023-01-01', '2023-02-01', self.fetch)
+        self.cache.get_or_fetch('b', '2023-01-01', '2023-02-01', self.fetch)
+        self.assertIsNone(self.cache.load('a')[0])
+
+class TestTimeSeriesStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.store = TimeSeriesStore(self.store_dir)
+
+    def rows(self, start, end, value):
+        dates = pd.date_range(start, end, freq='5D', inclusive='left').strftime('%Y-%m-%d')
+        return pd.DataFrame({'date': dates, 'scene_id': [f'S_{d}' for d in dates],
+                             'NDVI': value, 'NDWI': 0.1})
+
+    def test_queries_by_field_and_date(self):
+        """Testar consultas por talhão/período e por data em partições por ano"""
+        self.store.append('A', self.rows('2022-11-02', '2023-03-01', 0.5))
+        self.store.append('B', self.rows('2023-01-01', '2023-02-01', 0.7))
+
+        df = self.store.read_field('A', '2023-01-01', '2023-02-01')
+        self.assertEqual(set(df['field_id']), {'A'})
+        self.assertTrue(df['date'].between('2023-01-01', '2023-01-31').all())
+
+        on_date = self.store.read_date('2023-01-11', columns=['NDVI'])
+        self.assertEqual(list(on_date['field_id']), ['A', 'B'])
+        self.assertEqual(list(on_date.columns), ['field_id', 'date', 'NDVI'])
+        self.assertTrue(os.path.isdir(os.path.join(self.store_dir, 'field=A', 'year=2022')))
+
+    def test_append_and_compact(self):
+        """Testar reingestão (última versão prevalece), compactação e reabertura"""
+        self.store.append('A', self.rows('2023-01-01', '2023-03-01', 0.5))
+        self.store.append('A', self.rows('2023-01-31', '2023-04-01', 0.9))
+        before = self.store.read_field('A')
+
+        self.assertEqual(self.store.compact(), 1)
+        reopened = TimeSeriesStore(self.store_dir)
+        after = reopened.read_field('A')
+        pd.testing.assert_frame_equal(before, after)
+        self.assertEqual(len(after), after['scene_id'].nunique())
+        self.assertEqual(after.set_index('date').loc['2023-02-25', 'NDVI'], 0.9)
+        self.assertEqual(len(os.listdir(os.path.join(self.store_dir, 'field=A', 'year=2023'))), 1)
+
+
+class TestSceneCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = []
+        self.catalog = SceneCatalog(os.path.join(self.tmp.name, 'scenes.sqlite'), fetch=self.fetch)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetch(self, collection_id, roi, start_date, end_date, tracer=None):
+        """Uma cena a cada 5 dias, com fração limpa alternando entre 0.1 e 0.9"""
+        self.calls.append((start_date, end_date))
+        dates = pd.date_range(start_date, end_date, freq='5D', inclusive='left')
+        return pd.DataFrame({
+            'scene_id': [f'S{d:%Y%m%d}' for d in dates],
+            'date': dates.strftime('%Y-%m-%d'),
+            'sensor': 'S2',
+            'tile_cloud_pct': 50.0,
+            'roi_clear_fraction': [0.9 if d.day % 2 else 0.1 for d in dates],
+            'footprint': None
+        })
+
+    def test_incremental_sync(self):
+        """Testar que só o trecho ainda não sincronizado é consultado"""
+        self.catalog.sync(None, '2023-01-01', '2023-03-01', region_id='F1')
+        self.catalog.sync(None, '2023-02-01', '2023-04-01', region_id='F1')
+        self.assertEqual(self.calls, [('2023-01-01', '2023-03-01'), ('2023-03-01', '2023-04-01')])
+        self.assertEqual(self.catalog.synced_intervals('F1'), [('2023-01-01', '2023-04-01')])
+        self.assertEqual(self.catalog.regions(), ['F1'])
+
+    def test_select_clear_scenes(self):
+        """Testar a seleção por período e fração limpa sobre a ROI"""
+        self.catalog.sync(None, '2023-01-01', '2023-02-01', region_id='F1')
+        scenes = self.catalog.scenes('F1', '2023-01-01', '2023-01-16')
+        self.assertEqual(list(scenes['scene_id']), ['S20230101', 'S20230106', 'S20230111'])
+        clear = self.catalog.scenes('F1', min_clear=0.8)
+        self.assertEqual(list(clear['scene_id']), [scene_id for scene_id in
+                                                   self.catalog.scenes('F1')['scene_id']
+                                                   if int(scene_id[-2:]) % 2])
+
+    def test_recent_window_not_synced(self):
+        """Testar que janelas recentes são consultadas de novo"""
+        end = (pd.Timestamp.now().normalize() + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        start = (pd.Timestamp(end) - pd.Timedelta(days=30)).strftime('%Y-%m-%d')
+        self.catalog.sync(None, start, end, region_id='F1')
+        self.catalog.sync(None, start, end, region_id='F1')
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.calls[1][1], end)
+        self.assertLess(self.calls[1][0], end)
+
+
+class TestFieldStateStore(unittest.TestCase):
+
+    def test_state_round_trip(self):
+        """Testar gravação e leitura do estado incremental de um talhão"""
+        store = FieldStateStore(tempfile.mkdtemp())
+        state, rows = store.load('talhao/1')
+        self.assertIsNone(state['last_time_start'])
+        self.assertTrue(rows.empty)
+
+        df = pd.DataFrame({'Data': ['2023-01-01'], 'scene_id': ['A'], 'NDWI': [0.1]})
+        store.save('talhao/1', {'last_time_start': 1672531200000, 'scene_ids': ['A']}, df)
+
+        state, rows = store.load('talhao/1')
+        self.assertEqual(state['scene_ids'], ['A'])
+        self.assertEqual(list(rows['scene_id']), ['A'])
+
+    def test_refresh_field_with_fake_backend(self):
+        """Testar que refresh_field reduz só cenas novas (Earth Engine simulado)"""
+        import monitoring
+        reduced = []
+        reduce_collection = monitoring.reduce_collection
+
+        def recording(collection, *args, **kwargs):
+            reduced.append(collection)
+            return reduce_collection(collection, *args, **kwargs)
+
+        runs = []
+        with fake_earth_engine(n_scenes=24, start='2023-01-01', end='2023-05-01') as fake_ee, \
+                tempfile.TemporaryDirectory() as state_dir, \
+                mock.patch.object(monitoring, 'reduce_collection', recording):
+            system = EVETMonitoringSystem(field_store=FieldStateStore(state_dir))
+            roi = fake_ee.Geometry.Point([-40.16, -11.08]).buffer(500)
+            for end in ['2023-03-01', '2023-03-01', '2023-04-15']:
+                known = system.field_store.load('A')[0]['scene_ids']
+                fake_ee.stats.reset()
+                reduced.clear()
+                rows = system.refresh_field('A', roi, end_date=end)
+                runs.append({'round_trips': fake_ee.stats.round_trips,
+                             'reductions': fake_ee.stats.reductions, 'known': known,
+                             'listed': system.field_store.load('A')[0]['scene_ids'],
+                             'rows': len(rows), 'reduced': [collection.aggregate_array(
+                                 'system:index').getInfo() for collection in reduced]})
+        first, repeated, later = runs
+
+        self.assertEqual(first['round_trips'], 2)
+        self.assertGreater(first['rows'], 0)
+        # Mesma data final: só a listagem, nenhuma redução
+        self.assertEqual(repeated['round_trips'], 1)
+        self.assertEqual(repeated['reductions'], 0)
+        self.assertEqual(repeated['reduced'], [])
+        self.assertEqual(repeated['rows'], first['rows'])
+        # Data final posterior: reduz apenas os system:index ainda não vistos
+        new_ids = sorted(set(later['listed']) - set(later['known']))
+        self.assertTrue(new_ids)
+        self.assertEqual(later['round_trips'], 2)
+        self.assertEqual(later['reduced'], [new_ids])
+
+class TestStreamingStats(unittest.TestCase):
+
+    def test_matches_pandas_across_chunks_and_workers(self):
+        """Testar estatísticas de uma passada contra o pandas (com NaN e blocos combinados)"""
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame(rng.normal(3.0, 0.5, (10_001, 3)), columns=['NDWI', 'NDVI', 'ET_diaria'])
+        df['NDVI'] += 0.8 * df['NDWI']
+        df.loc[rng.random(len(df)) < 0.2, 'NDWI'] = np.nan
+
+        # Dois "workers" com blocos diferentes, combinados no final
+        columns = list(df.columns)
+        first = StreamingStats.from_chunks(iter_chunks(df.iloc[:4000], 700), columns)
+        second = StreamingStats.from_chunks(iter_chunks(df.iloc[4000:], 1500), columns)
+        stats = first + second
+
+        expected = df.describe().loc[['count', 'mean', 'std', 'min', 'max']]
+        pd.testing.assert_frame_equal(stats.describe(), expected, check_exact=False, rtol=1e-10)
+        # Com os quartis exatos, o resumo fica igual ao describe() completo
+        quartiles = df.quantile([0.25, 0.5, 0.75])
+        pd.testing.assert_frame_equal(stats.describe(quartiles), df.describe(),
+                                      check_exact=False, rtol=1e-10)
+        pd.testing.assert_frame_equal(stats.corr(), df.corr(), check_exact=False, rtol=1e-10)
+        pd.testing.assert_frame_equal(stats.cov(), df.cov(), check_exact=False, rtol=1e-10)
+        self.assertAlmostEqual(stats.sum()['ET_diaria'], df['ET_diaria'].sum(), places=6)
+        self.assertEqual(stats.rows, len(df))
+
+
+class TestCharts(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.dates = pd.date_range('2015-01-01', periods=50_000, freq='h').to_numpy()
+        self.values = np.sin(np.arange(50_000) / 300) + rng.normal(0, 0.05, 50_000)
+        self.values[31_337], self.values[4_243] = 3.0, -3.0
+        self.values[::101] = np.nan
+
+    def test_downsampling_keeps_peaks(self):
+        """Testar LTTB e envelope mín/máx: orçamento de pontos, ordem e extremos"""
+        for method in ('lttb', 'minmax'):
+            idx = downsample_indices(self.dates, self.values, budget=1000, method=method)
+            self.assertLessEqual(len(idx), 1004)
+            self.assertTrue((np.diff(idx) > 0).all())
+            self.assertIn(31_337, idx)
+            self.assertIn(4_243, idx)
+            self.assertFalse(np.isnan(self.values[idx]).any())
+
+        self.assertEqual(list(lttb_indices(np.arange(10), np.arange(10.0), 5)), [0, 1, 3, 6, 9])
+        self.assertEqual(list(minmax_indices(np.array([3, 1, 2, 5, 4, 0, 9, 8.0]), 2)),
+                         [0, 1, 3, 5, 6, 7])
+
+    def test_ols_fit(self):
+        """Testar reta OLS em NumPy contra np.polyfit"""
+        x = np.linspace(0, 1, 200)
+        y = 2.5 * x - 0.3 + np.random.default_rng(1).normal(0, 0.1, 200)
+        y[7] = np.nan
+        fit = ols_fit(x, y)
+        valid = ~np.isnan(y)
+        slope, intercept = np.polyfit(x[valid], y[valid], 1)
+        self.assertAlmostEqual(fit['slope'], slope)
+        self.assertAlmostEqual(fit['intercept'], intercept)
+        self.assertEqual(fit['n'], 199)
+        self.assertIsNone(ols_fit([1.0, 1.0], [2.0, 3.0]))
+
+
+class TestReductionPlan(unittest.TestCase):
+
+    def test_coarser_levels(self):
+        """Testar a sequência tileScale 1 -> 4 -> 16 -> bestEffort com resolução menor"""
+        plan = ReductionPlan(scale=10)
+        levels = []
+        while plan is not None:
+            levels.append((plan.scale, plan.tile_scale, plan.best_effort))
+            plan = plan.coarser()
+        self.assertEqual(levels, [(10, 1, False), (10, 4, False), (10, 16, False), (20, 16, True)])
+
+    def test_reduce_region_args(self):
+        """Testar argumentos de reduceRegion com escala fixa e orçamento de erro"""
+        args = ReductionPlan(scale=30, tile_scale=4).reduce_region_args('roi')
+        self.assertEqual(args['scale'], 30)
+        self.assertEqual(args['tileScale'], 4)
+        self.assertNotIn('bestEffort', args)
+        self.assertEqual(target_pixels_for_error(0.01), 400)
+        self.assertEqual(ReductionPlan(error_budget=0.01).target_pixels, 400)
+
+    def test_pixel_errors(self):
+        """Testar a detecção de erros de pixels/memória do GEE"""
+        self.assertTrue(is_pixel_error(Exception("Too many pixels in the region")))
+        self.assertTrue(is_pixel_error(Exception("User memory limit exceeded.")))
+        self.assertFalse(is_pixel_error(Exception("Collection query aborted after accumulating over 5000 elements")))
+        # Tempo esgotado é resolvido pela divisão em janelas, não por resolução mais grossa
+        self.assertFalse(is_pixel_error(Exception("Computation timed out.")))
+
+    def test_scale_floor_and_retry_event(self):
+        """Testar escala mínima de 30 m e registro da nova tentativa no tracer"""
+        from data_processor import reduce_collection
+
+        class FlakyTracer(Tracer):
+            refused = False
+
+            def get_info(self, obj, name='getInfo'):
+                if not self.refused:
+                    self.refused = True
+                    raise fake_ee.EEException('User memory limit exceeded.')
+                return super().get_info(obj, name)
+
+        with fake_earth_engine(n_scenes=4, start='2023-01-01', end='2023-02-01') as fake_ee:
+            roi = fake_ee.Geometry.Point([-40.16, -11.08]).buffer(100)
+            s2 = SatelliteDataProcessor().get_sentinel2_data(roi, '2023-01-01', '2023-02-01')
+            tracer = FlakyTracer()
+            df = reduce_collection(s2, roi, ['NDVI'], tracer=tracer)
+            scale = ReductionPlan().scale_for(roi).getInfo()
+        retries = [span.as_dict() for span in tracer.spans if span.name == 'reduction_retry']
+
+        self.assertEqual(scale, 30)
+        self.assertEqual([entry['tile_scale'] for entry in df.attrs['reductions']], [4])
+        self.assertEqual(len(retries), 1)
+        self.assertEqual(retries[0]['tile_scale'], 4)
+        self.assertIn('memory limit', retries[0]['error'])
+
+class TestBatchFields(unittest.TestCase):
+
+    def test_load_fields_csv(self):
+        """Testar leitura de talhões em CSV"""
+        path = os.path.join(tempfile.mkdtemp(), 'talhoes.csv')
+        with open(path, 'w') as f:
+            f.write('field_id,lat,lon,buffer_m\nA,-11.08,-40.16,500\nB,-11.10,-40.20,\n')
+
+        fields = load_fields(path)
+        self.assertEqual([field['field_id'] for field in fields], ['A', 'B'])
+        self.assertEqual(fields[0]['geometry']['coordinates'], [-40.16, -11.08])
+        self.assertEqual(fields[1]['buffer_m'], 1000)
+
+    def test_rate_limit_detection(self):
+        """Testar detecção de erros de limite de taxa"""
+        self.assertTrue(is_rate_limit_error(ee.EEException('Too many concurrent aggregations.')))
+        self.assertFalse(is_rate_limit_error(ee.EEException('Invalid geometry')))
+        self.assertTrue(is_rate_limit_error(ee.EEException('HTTP 429: Too Many Requests')))
+        # Um 429 qualquer na mensagem (ids, coordenadas) não é limite de taxa
+        self.assertFalse(is_rate_limit_error(ee.EEException('Asset users/x/field_4291 not found.')))
+
+def synthetic_sentinel2(shape=(64, 48), seed=0):
+    """Bandas Sentinel-2 sintéticas (valores digitais) com nuvens no QA60"""
+    rng = np.random.default_rng(seed)
+    bands = {name: rng.integers(1, 6000, shape).astype(np.uint16) for name in ('B3', 'B4', 'B8', 'B11')}
+    bands['QA60'] = np.where(rng.random(shape) < 0.1, 1024, 0).astype(np.uint16)
+    return bands
+
+
+class TestNumpyBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = NumpyBackend(dtype=np.float64, chunk_rows=10)
+        self.bands = synthetic_sentinel2()
+
+    def test_formulas(self):
+        """Testar índices e ET contra as fórmulas do caminho EE"""
+        result = self.backend.process_sentinel2(self.bands)
+        green = self.bands['B3'] * 0.0001
+        nir = self.bands['B8'] * 0.0001
+        clear = self.bands['QA60'] == 0
+
+        ndwi = (green - nir) / (green + nir)
+        ndvi = (nir - self.bands['B4'] * 0.0001) / (nir + self.bands['B4'] * 0.0001)
+        et = (ndvi * 1.2 + 0.1) * (ndwi * 0.8 + 1.0) * 3.5
+
+        np.testing.assert_allclose(result['NDWI'][clear], ndwi[clear])
+        np.testing.assert_allclose(result['ET_daily'][clear], et[clear])
+        self.assertTrue(np.isnan(result['NDVI'][~clear]).all())
+
+    def test_matches_monitoring_formulas(self):
+        """Testar ET contra process_image (subtract/divide nos valores digitais, sem escala)"""
+        self.bands['B3'][0, :2] = 0
+        self.bands['B8'][0, :2] = 0
+        self.bands['QA60'][0, :2] = 0
+        result = self.backend.process_sentinel2(self.bands)
+        green, red, nir = (self.bands[name].astype(np.float64) for name in ('B3', 'B4', 'B8'))
+        clear = self.bands['QA60'] == 0
+
+        # ee.Image.divide devolve 0 na divisão por zero
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ndwi = np.nan_to_num((green - nir) / (green + nir))
+        ndvi = (nir - red) / (nir + red)
+        et = (ndvi * 1.2 + 0.1) * (ndwi * 0.8 + 1.0) * 3.5
+
+        defined = clear & (green + nir > 0)
+        np.testing.assert_allclose(result['NDVI'][clear], ndvi[clear])
+        np.testing.assert_allclose(result['ET_daily'][defined], et[defined])
+        # Diferença esperada: soma zero fica NaN no backend local
+        self.assertTrue(np.isnan(result['ET_daily'][0, :2]).all())
+
+    def test_chunked_matches_full(self):
+        """Testar que o processamento em blocos reproduz o processamento completo"""
+        full = self.backend.process_sentinel2(self.bands)
+        chunked = self.backend.process_sentinel2_chunked(self.bands)
+        for name in full:
+            np.testing.assert_array_equal(full[name], chunked[name])
+
+
+class TestNumpySebal(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        shape = (3, 40, 50)
+        self.bands = {name: rng.uniform(0.01, 0.4, shape)
+                      for name in ('SR_B2', 'SR_B3', 'SR_B4', 'SR_B5', 'SR_B6', 'SR_B7')}
+        self.bands['ST_B10'] = rng.uniform(290, 320, shape)
+        self.backend = NumpyBackend(dtype=np.float64)
+
+    def test_matches_reference_formula(self):
+        """Testar SEBAL vetorizado contra a fórmula termo a termo"""
+        b = {name: values[1] for name, values in self.bands.items()}
+        albedo = (0.356 * b['SR_B2'] + 0.130 * b['SR_B3'] + 0.373 * b['SR_B4'] + 0.085 * b['SR_B5']
+                  + 0.072 * b['SR_B6'] - 0.0018 * b['SR_B7'] - 0.0016)
+        rn = 25 * (1 - albedo) - 0.01 * b['ST_B10']
+        g = rn * (((albedo * 0.0038 + 0.0074) * albedo - 0.0018) * albedo + 0.0026)
+        h = (b['ST_B10'] - np.percentile(b['ST_B10'], 10)) * 1200 / 50
+        et_daily = (rn - g - h) / 2.45 * 8
+
+        result = self.backend.calculate_evapotranspiration_sebal(b)
+        np.testing.assert_allclose(result['ET_DAILY'], et_daily, rtol=1e-10)
+
+    def test_stack_matches_single_scenes(self):
+        """Testar que a pilha 3-D equivale ao processamento cena a cena"""
+        self.bands['ST_B10'][0, 0, 0] = np.nan
+        stack = self.backend.calculate_evapotranspiration_sebal(self.bands)
+        for i in range(3):
+            single = self.backend.calculate_evapotranspiration_sebal(
+                {name: values[i] for name, values in self.bands.items()})
+            np.testing.assert_allclose(stack['ET_DAILY'][i], single['ET_DAILY'])
+        self.assertAlmostEqual(self.backend.lst_percentile(self.bands['ST_B10'][0]),
+                               np.nanpercentile(self.bands['ST_B10'][0], 10))
+
+
+class TestTileEngine(unittest.TestCase):
+
+    def test_streaming_matches_in_memory(self):
+        """Testar processamento por blocos com memmap contra o cálculo em memória"""
+        directory = tempfile.mkdtemp()
+        bands = synthetic_sentinel2(shape=(130, 90))
+        paths = {}
+        for name, values in bands.items():
+            paths[name] = os.path.join(directory, f'{name}.npy')
+            np.save(paths[name], values)
+
+        result = TileEngine(block_rows=32, block_cols=40).process_scene(paths, os.path.join(directory, 'out'))
+        expected = NumpyBackend().process_sentinel2(bands)
+
+        for name, path in result['outputs'].items():
+            np.testing.assert_array_equal(np.load(path), expected[name])
+        self.assertAlmostEqual(result['means']['NDVI'], float(np.nanmean(expected['NDVI'])), places=5)
+
+
+class TestSceneScheduler(unittest.TestCase):
+
+    def test_scene_means(self):
+        """Testar médias por cena calculadas em blocos no pool de processos"""
+        directory = tempfile.mkdtemp()
+        scenes, expected = [], []
+        for i, date in enumerate(['2023-01-11', '2023-01-01']):
+            bands = synthetic_sentinel2(shape=(70, 40), seed=i)
+            expected.append(np.nanmean(NumpyBackend(dtype=np.float64).process_sentinel2(bands)['NDVI']))
+            paths = {}
+            for name, values in bands.items():
+                paths[name] = os.path.join(directory, f'{i}_{name}.npy')
+                np.save(paths[name], values)
+            scenes.append({'date': date, 'scene_id': str(i), 'bands': paths})
+
+        df = SceneScheduler(max_workers=2, chunk_rows=16).run(scenes)
+
+        self.assertEqual(list(df.columns), ['Data', 'NDWI', 'NDVI', 'ET_diaria', 'scene_id'])
+        self.assertEqual(list(df['scene_id']), ['1', '0'])
+        np.testing.assert_allclose(df['NDVI'], expected[::-1], rtol=1e-5)
+
+
+def square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+class TestZonalStats(unittest.TestCase):
+
+    def setUp(self):
+        self.transform = (10, 0, 1000, 0, -10, 2000)
+        self.zones = [
+            ('A', {'type': 'Polygon', 'coordinates': [square(1020, 1990, 1060, 1970)]}),
+            ('B', {'type': 'Polygon', 'coordinates': [square(1100, 1900, 1180, 1820),
+                                                      square(1120, 1880, 1160, 1840)]})
+        ]
+
+    def test_rasterize_with_hole(self):
+        """Testar rasterização de polígonos (incluindo furo)"""
+        labels = rasterize_polygons([geometry for _, geometry in self.zones], self.transform, (20, 20))
+        self.assertEqual(int((labels == 1).sum()), 8)
+        self.assertEqual(int((labels == 2).sum()), 64 - 16)
+
+    def test_statistics_per_zone(self):
+        """Testar estatísticas vetorizadas contra o cálculo zona a zona"""
+        values = np.random.default_rng(0).random((20, 20))
+        values[1, 2] = np.nan
+        engine = ZonalStatsEngine(self.zones, self.transform, (20, 20))
+        table = engine.compute([('2023-01-01', {'NDVI': values})])
+
+        zone_b = values[(engine.labels == 2) & np.isfinite(values)]
+        result = table[table['zone_id'] == 'B'].set_index('statistic')['value']
+        self.assertAlmostEqual(result['mean'], zone_b.mean())
+        self.assertAlmostEqual(result['std'], zone_b.std(ddof=1))
+        self.assertAlmostEqual(result['p90'], np.percentile(zone_b, 90))
+        self.assertEqual(table[(table['zone_id'] == 'A') & (table['statistic'] == 'count')]['value'].item(), 7)
+
+
+class TestNumpyBackendParity(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            ee.Initialize()
+            self.processor = SatelliteDataProcessor()
+        except Exception as e:
+            self.skipTest(f"Não foi possível inicializar GEE: {e}")
+
+    def test_parity_with_earth_engine(self):
+        """Testar paridade numérica entre o backend NumPy e o Earth Engine"""
+        region = ee.Geometry.Point([-40.1667, -11.0833]).buffer(300).bounds()
+        raw = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+               .filterBounds(region).filterDate('2023-06-01', '2023-07-01')
+               .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)).first())
+        processed = self.processor.get_sentinel2_data(region, '2023-06-01', '2023-07-01').first()
+
+        differences = check_parity(raw, processed, region, bands=('NDWI', 'NDVI', 'NDMI'))
+        for band, difference in differences.items():
+            if difference is not None:
+                self.assertLess(difference, 1e-4, band)
+
+        # ET: caminho do painel (process_image, sem escala de reflectância)
+        monitored = EVETMonitoringSystem().process_image(raw)
+        differences = check_parity(raw, monitored, region, bands=('NDWI', 'NDVI', 'ET_daily'))
+        for band, difference in differences.items():
+            if difference is not None:
+                self.assertLess(difference, 1e-3, band)
+
+    def test_sebal_parity_with_earth_engine(self):
+        """Testar paridade do SEBAL NumPy com o Earth Engine"""
+        region = ee.Geometry.Point([-40.1667, -11.0833]).buffer(1500).bounds()
+        landsat = self.processor.get_landsat_data(region, '2023-06-01', '2023-09-01').first()
+        processed = self.processor.calculate_evapotranspiration_sebal(landsat, region)
+
+        differences = check_sebal_parity(processed, region)
+        # O percentil do GEE é aproximado (histograma); tolerância em mm/dia
+        self.assertLess(differences['ALBEDO'], 1e-4)
+        self.assertLess(differences['ET_DAILY'], 1.0)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    class Payload:
+        def getInfo(self):
+            return {'values': list(range(100))}
+
+    def test_spans_and_round_trips(self):
+        """Testar spans aninhados e contabilidade de getInfo"""
+        tracer = Tracer()
+        with tracer.span('extract_time_series'):
+            result = tracer.get_info(self.Payload(), 'reduce_collection')
+        self.assertEqual(len(result['values']), 100)
+        self.assertEqual(tracer.round_trips, 1)
+
+        spans = {span['name']: span for span in tracer.to_dict()['spans']}
+        self.assertEqual(spans['reduce_collection']['depth'], 1)
+        self.assertEqual(spans['reduce_collection']['payload_bytes'], tracer.payload_bytes)
+        self.assertGreaterEqual(spans['extract_time_series']['duration_s'],
+                                spans['reduce_collection']['duration_s'])
+
+        events = tracer.to_chrome_trace()['traceEvents']
+        self.assertEqual({event['ph'] for event in events}, {'X'})
+
+    def test_events(self):
+        """Testar eventos pontuais (duração zero) no trace"""
+        tracer = Tracer()
+        with tracer.span('reduce'):
+            tracer.event('reduction_retry', tile_scale=4)
+        event = next(span for span in tracer.to_dict()['spans'] if span['name'] == 'reduction_retry')
+        self.assertEqual(event['category'], 'event')
+        self.assertEqual(event['depth'], 1)
+        self.assertEqual(event['tile_scale'], 4)
+
+    def test_noop_mode(self):
+        """Testar que o modo desativado não registra nada"""
+        with NULL_TRACER.span('etapa') as span:
+            span.set(rows=10)
+        NULL_TRACER.event('evento')
+        NULL_TRACER.get_info(self.Payload())
+        self.assertEqual(NULL_TRACER.spans, [])
+        self.assertEqual(NULL_TRACER.round_trips, 0)
+
+
+class TestJobManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = JobManager(max_workers=2)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def wait(self, job_id):
+        job = self.manager.get(job_id)
+        for _ in range(200):
+            if job.finished:
+                break
+            time.sleep(0.01)
+        return job
+
+    def test_deduplication_and_partials(self):
+        """Testar deduplicação de requisições iguais e resultados parciais"""
+        release = threading.Event()
+
+        def work(job, n):
+            for i in range(n):
+                job.report((i + 1) / n, partial=pd.DataFrame({'i': [i]}))
+            release.wait(5)
+            return job.partial_result()
+
+        first = self.manager.submit(work, 3, key='serie')
+        second = self.manager.submit(work, 3, key='serie')
+        self.assertEqual(first, second)
+
+        job = self.manager.get(first)
+        for _ in range(200):
+            if job.progress == 1.0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(job.partial_result()), 3)
+        self.assertFalse(job.finished)
+
+        release.set()
+        self.assertEqual(self.wait(first).status, DONE)
+        self.assertEqual(self.manager.submit(work, 3, key='serie'), first)
+
+    def test_failed_job_is_not_reused(self):
+        """Testar que jobs com erro não são reaproveitados"""
+        def fail(job):
+            raise ValueError('falha')
+
+        job_id = self.manager.submit(fail, key='falha')
+        job = self.wait(job_id)
+        self.assertEqual(job.status, ERROR)
+        self.assertIn('falha', job.error)
+        self.assertNotEqual(self.manager.submit(fail, key='falha'), job_id)
+
+    def test_clear_only_given_jobs(self):
+        """Testar que clear só descarta os jobs informados, sem sumir com eles"""
+        mine = self.wait(self.manager.submit(lambda job: 1, key='minha')).id
+        other = self.wait(self.manager.submit(lambda job: 2, key='outra')).id
+
+        self.manager.clear([mine])
+        # A outra sessão ainda consulta o seu job e o reaproveita
+        self.assertEqual(self.manager.get(other).result, 2)
+        self.assertEqual(self.manager.submit(lambda job: 2, key='outra'), other)
+        # O job limpo continua consultável, mas a mesma requisição roda de novo
+        self.assertEqual(self.manager.get(mine).result, 1)
+        self.assertNotEqual(self.manager.submit(lambda job: 1, key='minha'), mine)
+
+
+class TestMapLayerCache(unittest.TestCase):
+
+    class Image:
+        calls = 0
+
+        def select(self, band):
+            return self
+
+        def getMapId(self, vis_params):
+            type(self).calls += 1
+            return {'url_format': f'https://tiles/{type(self).calls}/{{z}}/{{x}}/{{y}}'}
+
+    def test_hits_and_expiry(self):
+        """Testar reaproveitamento de map IDs e expiração"""
+        cache = MapLayerCache(max_entries=2, ttl=60)
+        vis = {'min': 0, 'max': 1}
+        first = cache.get('S1', 'NDWI', vis, self.Image)
+        self.assertEqual(cache.get('S1', 'NDWI', dict(vis), self.Image), first)
+        self.assertEqual(self.Image.calls, 1)
+
+        cache.get('S1', 'NDVI', vis, self.Image)
+        cache.get('S2', 'NDWI', vis, self.Image)
+        self.assertNotEqual(cache.get('S1', 'NDWI', vis, self.Image), first)  # removida (LRU)
+
+        cache.ttl = -1
+        calls = self.Image.calls
+        cache.get('S9', 'NDWI', vis, self.Image)
+        cache.get('S9', 'NDWI', vis, self.Image)
+        self.assertEqual(self.Image.calls, calls + 2)
+
+    def test_tile_proxy_serves_stored_tiles(self):
+        """Testar o proxy local servindo tiles do disco"""
+        from urllib.request import urlopen
+        with tempfile.TemporaryDirectory() as tmp:
+            proxy = TileProxy(TileStore(tmp))
+            try:
+                template = proxy.register('camada', 'https://upstream/{z}/{x}/{y}')
+                proxy.store.write('camada', 3, 1, 2, b'png')
+                with urlopen(template.format(z=3, x=1, y=2)) as response:
+                    self.assertEqual(response.read(), b'png')
+            finally:
+                proxy.shutdown()
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.calls = []
+
+    def fetch(self, start, end):
+        self.calls.append((start, end))
+        if (pd.Timestamp(end) - pd.Timestamp(start)).days > 60:
+            raise ee.EEException('User memory limit exceeded.')
+        dates = pd.date_range(start, end, freq='5D', inclusive='left').strftime('%Y-%m-%d')
+        return pd.DataFrame({'date': dates, 'scene_id': list(dates), 'NDWI': 0.1})
+
+    def test_splits_on_limit_and_resumes(self):
+        """Testar redução da janela em erro de limite e retomada pelos checkpoints"""
+        chunker = AdaptiveChunker(initial_days=120, min_days=7)
+        backfill = Backfill(self.fetch, self.output_dir, chunker, max_workers=2,
+                            progress=lambda *args: None)
+        self.assertEqual(backfill.run('2023-01-01', '2024-01-01'), [])
+        df = backfill.load()
+        self.assertEqual(len(df), len(set(df['scene_id'])))
+        self.assertEqual(df['date'].min(), '2023-01-01')
+        self.assertLessEqual(chunker.days, 120)
+
+        # Execução interrompida: só a janela sem checkpoint é consultada de novo
+        removed = sorted(os.listdir(backfill.checkpoint_dir))[1]
+        os.remove(os.path.join(backfill.checkpoint_dir, removed))
+        self.calls.clear()
+        backfill.run('2023-01-01', '2024-01-01')
+        start, end = removed[len('chunk_'):-len('.csv')].split('_')
+        self.assertEqual(merge_intervals(self.calls), [(start, end)])
+
+    def test_recent_windows_are_not_checkpointed(self):
+        """Testar que janelas dos últimos settle_days dias são consultadas a cada execução"""
+        today = pd.Timestamp.today().normalize()
+        start = (today - pd.Timedelta(days=40)).strftime('%Y-%m-%d')
+        end = (today + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        backfill = Backfill(self.fetch, self.output_dir, AdaptiveChunker(initial_days=60),
+                            progress=lambda *args: None, settle_days=5)
+        settled = backfill.settled_date()
+        # Checkpoint de uma versão anterior, gravado antes de a janela assentar
+        with open(os.path.join(backfill.checkpoint_dir, f'chunk_{settled}_{end}.csv'), 'w') as f:
+            f.write('date,scene_id,NDWI\n')
+
+        self.assertEqual(backfill.run(start, end), [])
+        self.assertEqual(merge_intervals(self.calls), [(start, end)])
+        self.assertEqual(completed_chunks(backfill.checkpoint_dir), [(start, settled)])
+        self.assertEqual(backfill.load()['date'].max(), max(self.fetch(settled, end)['date']))
+
+        self.calls.clear()
+        backfill.run(start, end)
+        self.assertEqual(self.calls, [(settled, end)])
+
+    def test_concurrency_error_is_retried_not_split(self):
+        """Testar que limite de concorrência repete a mesma janela em vez de dividi-la"""
+        def fetch(start, end):
+            self.calls.append((start, end))
+            if len(self.calls) == 1:
+                raise ee.EEException('Too many concurrent requests.')
+            return pd.DataFrame({'date': [start], 'scene_id': [start], 'NDWI': [0.1]})
+
+        chunker = AdaptiveChunker(initial_days=60)
+        backfill = Backfill(fetch, self.output_dir, chunker, max_workers=1, base_delay=0,
+                            progress=lambda *args: None)
+        self.assertEqual(backfill.run('2023-01-01', '2023-03-01'), [])
+        self.assertEqual(self.calls, [('2023-01-01', '2023-03-01')] * 2)
+        self.assertGreaterEqual(chunker.days, 60)
+
+    def test_chunker_adapts_to_latency(self):
+        """Testar crescimento e redução da janela conforme o tempo de resposta"""
+        chunker = AdaptiveChunker(initial_days=30, target_seconds=10)
+        chunker.record(30, 1.0)
+        self.assertEqual(chunker.days, 60)
+        chunker.record(60, 20.0)
+        self.assertEqual(chunker.days, 30)
+        chunker.failed(30)
+        self.assertEqual(chunker.days, 15)
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.dirname(os.path.abspath(__file__))
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_import_is_lazy(self):
+        """Testar que importar a CLI não carrega ee/numpy/pandas"""
+        import subprocess
+        code = ("import sys, cli; "
+                "print(','.join(m for m in ('ee', 'numpy', 'pandas') if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], cwd=self.root, check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), '')
+
+    def test_field_area(self):
+        """Testar a área aproximada de pontos com buffer e polígonos"""
+        point = {'geometry': {'type': 'Point', 'coordinates': [-40.0, -11.0]}, 'buffer_m': 1000}
+        self.assertAlmostEqual(field_area_km2(point), np.pi, places=6)
+        # Quadrado de 0,01° a 11° S (~1,09 km x 1,11 km)
+        square = {'geometry': {'type': 'Polygon', 'coordinates': [[
+            [-40.0, -11.0], [-39.99, -11.0], [-39.99, -10.99], [-40.0, -10.99], [-40.0, -11.0]]]}}
+        self.assertAlmostEqual(field_area_km2(square), 1.2136, places=2)
+
+    def test_process_with_fake_backend(self):
+        """Testar o comando process com o Earth Engine simulado"""
+        import json
+        import cli
+        fields = os.path.join(self.tmp.name, 'fields.csv')
+        output = os.path.join(self.tmp.name, 'out')
+        with open(fields, 'w') as f:
+            f.write('field_id,lat,lon,buffer_m\nA,-11.08,-40.16,500\nB,-11.09,-40.17,800\n')
+        with fake_earth_engine():
+            code = cli.main(['process', fields, '--start', '2023-01-01', '--end', '2024-01-01',
+                             '-o', output, '--format', 'json'])
+        self.assertEqual(code, 0)
+
+        with open(os.path.join(output, 'summary.json')) as f:
+            summary = json.load(f)
+        self.assertEqual({entry['status'] for entry in summary['fields'].values()}, {'ok'})
+        with open(os.path.join(output, 'A.report.json')) as f:
+            report = json.load(f)
+        self.assertEqual(report['field_id'], 'A')
+        self.assertTrue(report['reductions'])
+        self.assertIn('evapotranspiracao', report['estatisticas'])
+
+
+class TestApiServer(unittest.TestCase):
+
+    def test_ndjson_and_etag(self):
+        """Testar NDJSON em blocos e ETag pelo conteúdo"""
+        import io
+        df = pd.DataFrame({'Data': ['2023-01-01', '2023-01-06', '2023-01-11', '2023-01-16'],
+                           'NDWI': [0.1, np.nan, 0.3, 0.4]})
+        chunks = list(ndjson_chunks(df, chunk_rows=3))
+        self.assertEqual(len(chunks), 2)
+        parsed = pd.read_json(io.BytesIO(b''.join(chunks)), lines=True, dtype={'Data': str})
+        pd.testing.assert_frame_equal(parsed, df)
+
+        self.assertEqual(frame_etag(df), frame_etag(df.copy()))
+        changed = df.copy()
+        changed.loc[0, 'NDWI'] = 0.2
+        self.assertNotEqual(frame_etag(df), frame_etag(changed))
+
+    def test_response_format(self):
+        """Testar a escolha do formato por parâmetro e por Accept"""
+        self.assertEqual(response_format(None, None), 'json')
+        self.assertEqual(response_format(None, 'application/x-ndjson'), 'ndjson')
+        self.assertEqual(response_format('arrow', 'application/json'), 'arrow')
+        with self.assertRaises(ValueError):
+            response_format('xml', None)
+
+    def test_coalesce_with_fake_backend(self):
+        """Testar que requisições iguais simultâneas fazem uma só extração"""
+        import asyncio
+        from api_server import FieldSeriesService
+        fields = [{'field_id': 'A', 'buffer_m': 500,
+                   'geometry': {'type': 'Point', 'coordinates': [-40.16, -11.08]}}]
+
+        async def run(service, fake_ee):
+            requests = [service.series('A', '2023-01-01', '2024-01-01') for _ in range(5)]
+            results = await asyncio.gather(*requests)
+            round_trips = fake_ee.stats.round_trips
+            _, etag = await service.series('A', '2023-01-01', '2024-01-01')
+            return results, round_trips, fake_ee.stats.round_trips, etag
+
+        with fake_earth_engine(latency_base=0.05) as fake_ee:
+            service = FieldSeriesService(fields, EVETMonitoringSystem(),
+                                         SatelliteDataProcessor(initialize=False))
+            results, round_trips, after_cache, etag = asyncio.run(run(service, fake_ee))
+            df = results[0][0]
+            report = service.report('A', df)
+            scenes = service.scenes(df)
+
+        self.assertEqual(round_trips, 1)
+        self.assertEqual(after_cache, 1)
+        self.assertEqual({tag for _, tag in results} | {etag}, {etag})
+        self.assertIn('ndwi', report['estatisticas'])
+        self.assertEqual(len(scenes), len(df))
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_benchmark_with_fake_backend(self):
+        """Testar o benchmark com o Earth Engine simulado (processo separado)"""
+        import json
+        import subprocess
+        root = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            subprocess.run([sys.executable, os.path.join(root, 'benchmarks', 'run_benchmarks.py'),
+                            '--scenes', '12', '--rois', '3', '--roi-scenes', '4',
+                            '--latency-scale', '0', '-o', output],
+                           check=True, capture_output=True)
+            with open(output) as f:
+                results = {(r['stage'], r['rois']): r for r in json.load(f)['results']}
+
+        self.assertNotIn('error', results[('extract_time_series', 1)])
+        self.assertEqual(results[('extract_time_series', 1)]['round_trips'], 1)
+        self.assertNotIn('error', results[('export_time_series_harmonized', 1)])
+        self.assertEqual(results[('export_time_series_harmonized', 1)]['round_trips'], 1)
+        self.assertNotIn('error', results[('extract_time_series_catalog', 1)])
+        self.assertEqual(results[('batch_threads', 3)]['round_trips'], 3)
+        self.assertEqual(results[('batch_reduce_regions', 3)]['round_trips'], 1)
+        # As cenas processadas mantêm a data: as séries não podem vir vazias
+        for stage in ('export_time_series_legacy', 'export_time_series_batched'):
+            self.assertNotIn('error', results[(stage, 1)])
+            self.assertEqual(results[(stage, 1)]['rows'], 12)
+        for stage in ('batch_threads', 'batch_reduce_regions'):
+            self.assertGreater(results[(stage, 3)]['rows'], 0)
+        # Um vetor por banda: o payload batch não pode passar o do modo por cena
+        self.assertLessEqual(results[('export_time_series_batched', 1)]['payload_bytes'],
+                             results[('export_time_series_legacy', 1)]['payload_bytes'])
+
 if __name__ == '__main__':
     unittest.main()
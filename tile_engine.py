@@ -0,0 +1,188 @@
+import os
+
+import numpy as np
+
+from local_backend import NumpyBackend, S2_BANDS
+
+# Índices gravados por padrão para cada cena
+TILE_OUTPUTS = ('NDWI', 'NDVI', 'NDMI', 'ET_daily')
+
+
+class NpyBand:
+    """Banda .npy lida/gravada por faixas de linhas com memmaps de curta duração
+
+    Cada faixa é mapeada apenas enquanto é processada e liberada em seguida,
+    de modo que as páginas mapeadas não se acumulam com o tamanho do tile.
+    """
+
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        with open(path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            self.offset = f.tell()
+        if fortran_order or len(shape) != 2:
+            raise ValueError(f"{path}: esperado array 2-D em ordem C")
+        self.shape = shape
+        self.dtype = dtype
+        self._strip = None
+        self._rows = None
+
+    @classmethod
+    def create(cls, path, shape, dtype=np.float32):
+        """Cria o arquivo .npy de saída (esparso) sem alocar memória"""
+        header_only = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        header_only.flush()
+        del header_only
+        return cls(path, mode='r+')
+
+    def read(self, rows, cols):
+        return self._map(rows)[:, cols]
+
+    def write(self, rows, cols, data):
+        self._map(rows)[:, cols] = data
+
+    def release(self):
+        """Libera a faixa mapeada (gravando-a em disco, se for saída)"""
+        if self._strip is not None:
+            if self.mode != 'r':
+                self._strip.flush()
+            # Sem outras referências, o mapeamento é desfeito aqui
+            self._strip = None
+            self._rows = None
+
+    def _map(self, rows):
+        if self._rows != (rows.start, rows.stop):
+            self.release()
+            row_bytes = self.shape[1] * self.dtype.itemsize
+            self._strip = np.memmap(self.path, dtype=self.dtype, mode=self.mode,
+                                    offset=self.offset + rows.start * row_bytes,
+                                    shape=(rows.stop - rows.start, self.shape[1]))
+            self._rows = (rows.start, rows.stop)
+        return self._strip
+
+
+class GeoTiffBand:
+    """Banda GeoTIFF lida/gravada por janelas (requer rasterio)"""
+
+    def __init__(self, path, mode='r', profile=None):
+        try:
+            import rasterio
+            from rasterio.windows import Window
+        except ImportError:
+            raise ImportError("rasterio é necessário para GeoTIFF: pip install rasterio")
+        self._window = Window
+        self.dataset = rasterio.open(path, mode, **(profile or {}))
+        self.shape = (self.dataset.height, self.dataset.width)
+        self.profile = self.dataset.profile
+
+    @classmethod
+    def create(cls, path, shape, dtype=np.float32, profile=None):
+        profile = dict(profile or {})
+        profile.update(driver='GTiff', height=shape[0], width=shape[1], count=1,
+                       dtype=np.dtype(dtype).name, nodata=float('nan'),
+                       tiled=True, blockxsize=256, blockysize=256, compress='deflate')
+        return cls(path, mode='w', profile=profile)
+
+    def read(self, rows, cols):
+        window = self._window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+        return self.dataset.read(1, window=window)
+
+    def write(self, rows, cols, data):
+        window = self._window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+        self.dataset.write(data, 1, window=window)
+
+    def release(self):
+        pass
+
+    def close(self):
+        self.dataset.close()
+
+
+def open_band(path):
+    """Abre uma banda de entrada (.npy ou GeoTIFF) para leitura por blocos"""
+    if path.lower().endswith('.npy'):
+        return NpyBand(path)
+    return GeoTiffBand(path)
+
+
+def iter_windows(shape, block_rows, block_cols):
+    """Itera sobre (linhas, colunas) dos blocos, faixa por faixa"""
+    for row in range(0, shape[0], block_rows):
+        rows = slice(row, min(row + block_rows, shape[0]))
+        for col in range(0, shape[1], block_cols):
+            yield rows, slice(col, min(col + block_cols, shape[1]))
+
+
+class TileEngine:
+    """Processamento em streaming de tiles locais grandes
+
+    As bandas de entrada são lidas bloco a bloco (memmap/janelas), os
+    índices são calculados em buffers float32 pré-alocados e gravados
+    diretamente nos arquivos de saída. A memória de pico depende apenas do
+    tamanho do bloco, não do tamanho do tile.
+    """
+
+    def __init__(self, backend=None, block_rows=512, block_cols=4096):
+        self.backend = backend or NumpyBackend(dtype=np.float32)
+        self.block_rows = block_rows
+        self.block_cols = block_cols
+
+    def process_scene(self, band_paths, output_dir, outputs=TILE_OUTPUTS, output_format='npy'):
+        """Processa uma cena Sentinel-2 local
+
+        band_paths: dict {B3, B4, B8, B11, QA60: caminho}.
+        Retorna {'outputs': {índice: caminho}, 'means': {índice: média}}.
+        """
+        inputs = {name: open_band(band_paths[name]) for name in S2_BANDS}
+        shape = inputs['B3'].shape
+        for name, band in inputs.items():
+            if band.shape != shape:
+                raise ValueError(f"Banda {name} com formato {band.shape}, esperado {shape}")
+
+        os.makedirs(output_dir, exist_ok=True)
+        extension = 'npy' if output_format == 'npy' else 'tif'
+        paths = {name: os.path.join(output_dir, f'{name}.{extension}') for name in outputs}
+        if output_format == 'npy':
+            writers = {name: NpyBand.create(paths[name], shape, self.backend.dtype) for name in outputs}
+        else:
+            profile = getattr(inputs['B3'], 'profile', None)
+            writers = {name: GeoTiffBand.create(paths[name], shape, self.backend.dtype, profile)
+                       for name in outputs}
+
+        # Buffers reaproveitados em todos os blocos
+        block_shape = (min(self.block_rows, shape[0]), min(self.block_cols, shape[1]))
+        buffers = {name: np.empty(block_shape, dtype=self.backend.dtype)
+                   for name in ('NDWI', 'NDVI', 'NDMI', 'ET_daily', 'VEG_FACTOR', 'WATER_FACTOR')}
+        scratch = self.backend.allocate_scratch(block_shape)
+        sums = dict.fromkeys(outputs, 0.0)
+        counts = dict.fromkeys(outputs, 0)
+
+        try:
+            # NpyBand troca (e libera) a faixa mapeada ao mudar de linhas
+            for rows, cols in iter_windows(shape, self.block_rows, self.block_cols):
+                view = (slice(0, rows.stop - rows.start), slice(0, cols.stop - cols.start))
+                block = {name: band.read(rows, cols) for name, band in inputs.items()}
+                result = self.backend.process_sentinel2(
+                    block,
+                    out={name: buffer[view] for name, buffer in buffers.items()},
+                    scratch={name: buffer[view] for name, buffer in scratch.items()}
+                )
+
+                for name in outputs:
+                    writers[name].write(rows, cols, result[name])
+                    valid = np.isfinite(result[name])
+                    counts[name] += int(np.count_nonzero(valid))
+                    sums[name] += float(result[name].sum(where=valid))
+        finally:
+            for band in list(inputs.values()) + list(writers.values()):
+                band.release()
+                if hasattr(band, 'close'):
+                    band.close()
+
+        means = {name: sums[name] / counts[name] if counts[name] else None for name in outputs}
+        return {'outputs': paths, 'means': means}
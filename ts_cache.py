@@ -0,0 +1,263 @@
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Incrementar quando a lógica de extração mudar sem alterar as fórmulas
+PIPELINE_VERSION = '2'
+
+DEFAULT_CACHE_DIR = os.path.join('data', 'cache')
+
+# Leituras só atualizam last_access em memória; o manifest é gravado em
+# store/remoções ou, no máximo, a cada MANIFEST_FLUSH_SECONDS
+MANIFEST_FLUSH_SECONDS = 60
+
+
+def pipeline_version(*functions, **params):
+    """Gera a versão do pipeline a partir do código-fonte e dos parâmetros
+
+    Qualquer alteração em estimate_evapotranspiration,
+    calculate_evapotranspiration_sebal (ou nas funções/classes informadas)
+    ou nos parâmetros (ex.: configuração da redução) muda a versão e,
+    portanto, invalida as entradas do cache.
+    """
+    digest = hashlib.sha256(PIPELINE_VERSION.encode())
+    for function in functions:
+        try:
+            source = inspect.getsource(function)
+        except (OSError, TypeError):
+            source = getattr(function, '__qualname__', repr(function))
+        digest.update(source.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:12]
+
+
+def roi_hash(roi):
+    """Hash estável da geometria (sem ida ao servidor)"""
+    if hasattr(roi, 'serialize'):
+        payload = roi.serialize()
+    else:
+        payload = json.dumps(roi, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def save_frame(path, df, **extra):
+    """Grava um DataFrame em NPZ colunar (escrita atômica, sem pickle)"""
+    arrays = {'columns': np.array(list(df.columns), dtype=str)}
+    for i, name in enumerate(df.columns):
+        column = df[name].to_numpy()
+        arrays[f'col_{i}'] = column.astype(str) if column.dtype == object else column
+    for name, values in extra.items():
+        arrays[f'extra_{name}'] = values
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_frame(path):
+    """Lê um NPZ gravado por save_frame, retornando (DataFrame, extras)"""
+    with np.load(path, allow_pickle=False) as data:
+        columns = [str(name) for name in data['columns']]
+        df = pd.DataFrame({name: data[f'col_{i}'] for i, name in enumerate(columns)})
+        extra = {name[len('extra_'):]: data[name] for name in data.files
+                 if name.startswith('extra_')}
+    return df, extra
+
+
+def merge_intervals(intervals):
+    """Une intervalos de datas [início, fim) sobrepostos ou contíguos"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def missing_intervals(covered, start_date, end_date):
+    """Retorna os trechos de [start_date, end_date) ainda não cobertos"""
+    missing = []
+    cursor = start_date
+    for start, end in merge_intervals(covered):
+        if end <= cursor:
+            continue
+        if start >= end_date:
+            break
+        if start > cursor:
+            missing.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < end_date:
+        missing.append((cursor, end_date))
+    return missing
+
+
+class TimeSeriesCache:
+    """Cache em disco das séries temporais extraídas (um arquivo NPZ por chave)
+
+    A chave combina hash da ROI, sensor, limite de nuvens, bandas e versão
+    das fórmulas. Cada entrada guarda as linhas por cena e os intervalos de
+    datas já consultados, de modo que novas requisições buscam apenas as
+    datas que faltam. O tamanho total é limitado com remoção LRU.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=200 * 1024 ** 2,
+                 max_entries=500, recent_days=5):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # Datas recentes podem ganhar cenas ainda não ingeridas pelo GEE
+        self.recent_days = recent_days
+        self._lock = threading.RLock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._manifest_path = os.path.join(self.cache_dir, 'manifest.json')
+        self._manifest = self._load_manifest()
+        self._manifest_saved = time.monotonic()
+        self._dirty = False
+
+    def make_key(self, roi, sensor, cloud_threshold, formula_version, bands):
+        """Monta a chave do cache"""
+        parts = [roi_hash(roi), sensor, str(cloud_threshold), formula_version, ','.join(bands)]
+        return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:24]
+
+    def load(self, key):
+        """Carrega (DataFrame, intervalos cobertos) de uma chave"""
+        with self._lock:
+            entry = self._manifest.get(key)
+            path = self._entry_path(key)
+            if entry is None or not os.path.exists(path):
+                return None, []
+
+            df, extra = load_frame(path)
+            intervals = [tuple(interval) for interval in extra['intervals'].tolist()]
+
+            entry['last_access'] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._manifest_saved >= MANIFEST_FLUSH_SECONDS:
+                self._save_manifest()
+            return df, intervals
+
+    def store(self, key, df, intervals, formula_version=None):
+        """Grava as linhas e os intervalos cobertos de uma chave"""
+        with self._lock:
+            save_frame(self._entry_path(key), df,
+                       intervals=np.array(merge_intervals(intervals), dtype=str).reshape(-1, 2))
+
+            self._manifest[key] = {
+                'size': os.path.getsize(self._entry_path(key)),
+                'last_access': time.time(),
+                'formula_version': formula_version
+            }
+            self._evict()
+            self._save_manifest()
+
+    def get_or_fetch(self, key, start_date, end_date, fetch, formula_version=None,
+                     date_column='date', id_column='scene_id'):
+        """Retorna a série de [start_date, end_date), buscando só as datas ausentes
+
+        fetch(inicio, fim) deve retornar um DataFrame com as linhas do trecho.
+        """
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d')
+
+        with self._lock:
+            cached, covered = self.load(key)
+
+        frames = [] if cached is None else [cached]
+        fetched = []
+        for window_start, window_end in missing_intervals(covered, start_date, end_date):
+            frames.append(fetch(window_start, window_end))
+            fetched.append((window_start, window_end))
+
+        if not frames:
+            return pd.DataFrame()
+
+        # Trechos vazios também são gravados como cobertos (sem cenas no período)
+        non_empty = [frame for frame in frames if not frame.empty]
+        df = pd.concat(non_empty, ignore_index=True) if non_empty else frames[0].copy()
+        # Metadados em listas (ex.: reduções usadas) dos trechos consultados agora
+        attrs = {}
+        for frame in frames[0 if cached is None else 1:]:
+            for name, values in frame.attrs.items():
+                attrs.setdefault(name, []).extend(values)
+        df.attrs = attrs
+        if fetched:
+            if id_column in df.columns:
+                df = df.drop_duplicates(subset=id_column, keep='last')
+            df = df.sort_values(date_column).reset_index(drop=True)
+
+            # Não considerar cobertos os dias recentes ainda sujeitos a ingestão
+            settled = (datetime.now() - timedelta(days=self.recent_days)).strftime('%Y-%m-%d')
+            covered = covered + [(a, min(b, settled)) for a, b in fetched if a < settled]
+            self.store(key, df, covered, formula_version)
+
+        mask = (df[date_column] >= start_date) & (df[date_column] < end_date)
+        return df[mask].reset_index(drop=True)
+
+    def invalidate(self, key=None):
+        """Remove uma chave do cache (ou todo o cache, sem argumentos)"""
+        with self._lock:
+            for entry_key in list(self._manifest):
+                if key is None or entry_key == key:
+                    self._remove(entry_key)
+            self._save_manifest()
+
+    def purge_stale(self, *formula_versions):
+        """Remove as entradas geradas com versões do pipeline fora das informadas"""
+        with self._lock:
+            for entry_key, entry in list(self._manifest.items()):
+                if entry.get('formula_version') not in formula_versions:
+                    self._remove(entry_key)
+            self._save_manifest()
+
+    def flush(self):
+        """Grava os horários de acesso ainda só em memória"""
+        with self._lock:
+            if self._dirty:
+                self._save_manifest()
+
+    def total_size(self):
+        """Tamanho total em bytes das entradas do cache"""
+        return sum(entry['size'] for entry in self._manifest.values())
+
+    def _evict(self):
+        """Remove as entradas menos usadas até respeitar os limites"""
+        by_access = sorted(self._manifest, key=lambda k: self._manifest[k]['last_access'])
+        while by_access and (self.total_size() > self.max_bytes
+                             or len(self._manifest) > self.max_entries):
+            self._remove(by_access.pop(0))
+
+    def _remove(self, key):
+        self._manifest.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+        self._manifest_saved = time.monotonic()
+        self._dirty = False
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ts_cache import save_frame
+
+DEFAULT_STORE_DIR = os.path.join('data', 'store')
+
+
+class TimeSeriesStore:
+    """Armazenamento colunar local das séries por talhão
+
+    As linhas são gravadas em partes NPZ colunares, particionadas por
+    talhão e ano (field=<id>/year=<ano>/part-<n>.npz) e ordenadas por data.
+    O índice guarda, por parte, talhão, ano, intervalo e datas presentes,
+    de modo que consultas por (field_id, data) abrem só as partes
+    necessárias. A ingestão apenas acrescenta partes (e linhas ao
+    index.jsonl); compact() funde as partes de cada partição, removendo
+    duplicatas (a parte mais recente prevalece).
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, date_column='date', id_column='scene_id',
+                 max_cached_parts=1024):
+        self.store_dir = store_dir
+        self.date_column = date_column
+        self.id_column = id_column
+        self.max_cached_parts = max_cached_parts
+        self._lock = threading.RLock()
+        # Partes são imutáveis: as colunas lidas podem ficar em memória
+        self._cached_parts = OrderedDict()
+        os.makedirs(self.store_dir, exist_ok=True)
+        self._index_path = os.path.join(self.store_dir, 'index.jsonl')
+        self._parts, self._next_seq = self._load_index()
+
+    def append(self, field_id, df):
+        """Acrescenta as linhas de um talhão (uma parte nova por ano)"""
+        if df.empty:
+            return 0
+        df = df.copy()
+        df[self.date_column] = pd.to_datetime(df[self.date_column]).dt.strftime('%Y-%m-%d')
+        df = df.sort_values(self.date_column, kind='stable').reset_index(drop=True)
+        years = df[self.date_column].str[:4]
+
+        with self._lock:
+            entries = [self._write_part(str(field_id), year, rows.reset_index(drop=True))
+                       for year, rows in df.groupby(years, sort=True)]
+            with open(self._index_path, 'a') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+        return len(df)
+
+    def query(self, field_ids=None, start_date=None, end_date=None, columns=None):
+        """Linhas de [start_date, end_date) dos talhões informados (todos se None)
+
+        columns restringe as colunas do resultado (data e talhão sempre vêm).
+        """
+        if isinstance(field_ids, str):
+            field_ids = [field_ids]
+        if field_ids is not None:
+            field_ids = {str(field_id) for field_id in field_ids}
+        start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d') if start_date else None
+        end_date = pd.Timestamp(end_date).strftime('%Y-%m-%d') if end_date else None
+
+        with self._lock:
+            parts = sorted((part for part in self._parts.values()
+                            if (field_ids is None or part['field_id'] in field_ids)
+                            and (start_date is None or part['max_date'] >= start_date)
+                            and (end_date is None or part['min_date'] < end_date)),
+                           key=lambda part: part['seq'])
+
+        chunks, owners = [], []
+        for part in parts:
+            arrays = self._read_part(part['name'])
+            dates = arrays[self.date_column]
+            # Partes ordenadas por data: o período é uma fatia por busca binária
+            low = np.searchsorted(dates, start_date, 'left') if start_date else 0
+            high = np.searchsorted(dates, end_date, 'left') if end_date else len(dates)
+            if high > low:
+                chunks.append({name: values[low:high] for name, values in arrays.items()})
+                owners.append(np.full(high - low, part['field_id'], dtype=object))
+        if not chunks:
+            return pd.DataFrame()
+
+        names = list(chunks[0])
+        if columns is not None:
+            names = [self.date_column] + [name for name in names
+                                          if name in columns and name != self.date_column]
+        df = pd.DataFrame({'field_id': np.concatenate(owners),
+                           **{name: np.concatenate([chunk[name] for chunk in chunks])
+                              for name in names}})
+
+        # Mais de uma parte na mesma partição: linhas repetidas antes do compact()
+        partitions = [(part['field_id'], part['year']) for part in parts]
+        if len(set(partitions)) < len(partitions):
+            key = self.id_column if self.id_column in df.columns else self.date_column
+            df = df.drop_duplicates(subset=['field_id', key], keep='last')
+        return df.sort_values(['field_id', self.date_column], kind='stable').reset_index(drop=True)
+
+    def read_field(self, field_id, start_date=None, end_date=None, columns=None):
+        """Série de um talhão no período"""
+        return self.query([field_id], start_date, end_date, columns)
+
+    def read_date(self, date, field_ids=None, columns=None):
+        """Linhas de todos os talhões (ou dos informados) em uma data"""
+        date = pd.Timestamp(date).strftime('%Y-%m-%d')
+        with self._lock:
+            candidates = {part['field_id'] for part in self._parts.values()
+                          if date in part['dates']}
+        if field_ids is not None:
+            candidates &= {str(field_id) for field_id in field_ids}
+        if not candidates:
+            return pd.DataFrame()
+        end = (pd.Timestamp(date) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        return self.query(candidates, date, end, columns)
+
+    def fields(self):
+        """Talhões presentes no armazenamento"""
+        with self._lock:
+            return sorted({part['field_id'] for part in self._parts.values()})
+
+    def compact(self, field_id=None):
+        """Funde as partes de cada partição (talhão, ano) em uma só
+
+        Retorna o número de partições compactadas. O índice é reescrito
+        de forma atômica antes da remoção das partes antigas.
+        """
+        with self._lock:
+            partitions = {}
+            for part in self._parts.values():
+                if field_id is None or part['field_id'] == str(field_id):
+                    partitions.setdefault((part['field_id'], part['year']), []).append(part)
+
+            replaced = []
+            for (part_field, year), parts in partitions.items():
+                if len(parts) < 2:
+                    continue
+                parts.sort(key=lambda part: part['seq'])
+                df = pd.concat([pd.DataFrame(self._read_part(part['name'])) for part in parts],
+                               ignore_index=True)
+                key = self.id_column if self.id_column in df.columns else self.date_column
+                df = (df.drop_duplicates(subset=key, keep='last')
+                      .sort_values(self.date_column, kind='stable').reset_index(drop=True))
+
+                self._write_part(part_field, year, df)
+                for part in parts:
+                    del self._parts[part['name']]
+                    replaced.append(part['name'])
+
+            if replaced:
+                self._save_index()
+                for name in replaced:
+                    self._cached_parts.pop(name, None)
+                    os.remove(os.path.join(self.store_dir, name))
+            return len([parts for parts in partitions.values() if len(parts) > 1])
+
+    def _write_part(self, field_id, year, df):
+        """Grava uma parte e a registra no índice em memória"""
+        seq = self._next_seq
+        self._next_seq += 1
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', field_id)
+        name = '/'.join([f'field={safe_id}', f'year={year}', f'part-{seq:08d}.npz'])
+        path = os.path.join(self.store_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_frame(path, df)
+
+        dates = df[self.date_column]
+        entry = {
+            'name': name,
+            'field_id': field_id,
+            'year': year,
+            'seq': seq,
+            'rows': len(df),
+            'min_date': dates.iloc[0],
+            'max_date': dates.iloc[-1],
+            'dates': sorted(set(dates)),
+        }
+        self._parts[name] = entry
+        return entry
+
+    def _read_part(self, name):
+        """Colunas de uma parte ({coluna: array}), com LRU em memória"""
+        with self._lock:
+            arrays = self._cached_parts.get(name)
+            if arrays is not None:
+                self._cached_parts.move_to_end(name)
+                return arrays
+
+        with np.load(os.path.join(self.store_dir, name), allow_pickle=False) as data:
+            arrays = {str(column): data[f'col_{i}'] for i, column in enumerate(data['columns'])}
+
+        with self._lock:
+            self._cached_parts[name] = arrays
+            while len(self._cached_parts) > self.max_cached_parts:
+                self._cached_parts.popitem(last=False)
+        return arrays
+
+    def _load_index(self):
+        """Reconstrói as partes vivas a partir do log index.jsonl"""
+        parts, next_seq = {}, 0
+        try:
+            with open(self._index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Linha incompleta de uma gravação interrompida
+                        continue
+                    parts[entry['name']] = entry
+                    next_seq = max(next_seq, entry['seq'] + 1)
+        except FileNotFoundError:
+            pass
+
+        return {name: entry for name, entry in parts.items()
+                if os.path.exists(os.path.join(self.store_dir, name))}, next_seq
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.jsonl')
+        with os.fdopen(fd, 'w') as f:
+            for entry in sorted(self._parts.values(), key=lambda entry: entry['seq']):
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, self._index_path)